@@ -186,6 +186,16 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# e-Fatura XSD validation (requires lxml)
+# Directory holding the DNRE XSD set (EnvelopedSignature.xsd, common/CV_EFatura_*_v1.0.xsd)
+EFATURA_XSD_DIR = BASE_DIR.parent.parent / '2024-05-27-XML-XSD'
+# 'off': skip, 'warn': log schema errors, 'strict': refuse to store/submit invalid documents
+# Off until the renderer conforms to the DNRE XSD: documents are still rejected for the Dfe Id
+# (IUD pattern), a series with a space ('FT A'), AddressCode length, non-numeric Telephone,
+# Payment/Software placement and the missing Transmission element. Run validate_efatura_xml
+# against stored documents to track progress, then switch to 'strict'.
+EFATURA_XSD_VALIDATION = 'off'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -0,0 +1,105 @@
+"""
+File download helpers for the Restaurant Management System.
+"""
+import os
+import re
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Bytes read per chunk when streaming part of a file
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header ("bytes=start-end", "bytes=start-", "bytes=-suffix").
+
+    Args:
+        header: Range header value
+        size: File size in bytes
+
+    Returns:
+        tuple: (start, end) inclusive byte positions, or None to serve the whole file
+               (no header, or a form this helper does not handle, such as multiple ranges)
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+def ranged_file_response(request, path, filename, content_type):
+    """
+    Serve a file as an attachment, honouring HTTP Range requests.
+
+    Lets clients resume an interrupted download of a large file.
+
+    Args:
+        request: The request (its Range header is read)
+        path: File path on disk
+        filename: Download file name
+        content_type: Response content type
+
+    Returns:
+        FileResponse (200), StreamingHttpResponse (206) or HttpResponse (416)
+    """
+    size = os.path.getsize(path)
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,109 @@
+"""
+Typed query parameter filters for the Restaurant Management System.
+
+Search views translate raw query parameters into exact/range lookups that can
+use the B-tree indexes on the filtered columns, instead of icontains lookups
+(which cast to text and force sequential scans).
+
+All helpers raise ValueError with a client-facing message on bad input, so
+views can turn them into 400 responses.
+"""
+from datetime import date, datetime, time, timedelta
+from django.utils import timezone
+
+
+def parse_choice(value, choices, param):
+    """
+    Resolve a query parameter to one of a field's choice values.
+
+    Matching is case-insensitive on either the stored value or its label,
+    e.g. "paid", "PAID" and "Paid" all resolve to 'PAID'.
+
+    Args:
+        value: Raw query parameter value
+        choices: Field choices as (value, label) pairs
+        param: Parameter name, used in the error message
+
+    Returns:
+        str: The stored choice value
+
+    Raises:
+        ValueError: If the value matches no choice
+    """
+    wanted = value.strip().upper()
+    for choice_value, label in choices:
+        if wanted in (str(choice_value).upper(), str(label).upper()):
+            return choice_value
+
+    valid = ', '.join(str(choice_value) for choice_value, _ in choices)
+    raise ValueError(f'Invalid {param}: {value}. Expected one of: {valid}')
+
+
+def parse_int(value, param):
+    """
+    Parse an integer query parameter (e.g. an ID).
+
+    Raises:
+        ValueError: If the value is not an integer
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {param}: {value}. Expected an integer')
+
+
+def parse_date(value, param):
+    """
+    Parse a YYYY-MM-DD query parameter.
+
+    Raises:
+        ValueError: If the value is not an ISO date
+    """
+    try:
+        return date.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid {param}: {value}. Expected a date (YYYY-MM-DD)')
+
+
+def _start_of_day(day):
+    """Aware datetime at midnight of day in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_range_filter(field, on=None, start=None, end=None):
+    """
+    Build half-open range lookups covering whole days on a datetime field.
+
+    Args:
+        field: Datetime field name (e.g. 'created_at')
+        on: Single day (YYYY-MM-DD)
+        start: First day included (YYYY-MM-DD)
+        end: Last day included (YYYY-MM-DD)
+
+    Returns:
+        dict: Lookups such as {'created_at__gte': ..., 'created_at__lt': ...}
+
+    Raises:
+        ValueError: If a date is malformed or start is after end
+    """
+    lookups = {}
+    start_day = parse_date(start, 'start_date') if start else None
+    end_day = parse_date(end, 'end_date') if end else None
+
+    if start_day and end_day and start_day > end_day:
+        raise ValueError('start_date must not be after end_date')
+
+    if on:
+        day = parse_date(on, 'date')
+        lookups[f'{field}__gte'] = _start_of_day(day)
+        lookups[f'{field}__lt'] = _start_of_day(day + timedelta(days=1))
+
+    if start_day:
+        start_at = _start_of_day(start_day)
+        lookups[f'{field}__gte'] = max(start_at, lookups.get(f'{field}__gte', start_at))
+
+    if end_day:
+        end_at = _start_of_day(end_day + timedelta(days=1))
+        lookups[f'{field}__lt'] = min(end_at, lookups.get(f'{field}__lt', end_at))
+
+    return lookups
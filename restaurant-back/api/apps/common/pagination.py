@@ -0,0 +1,94 @@
+"""
+Shared pagination helpers for the Restaurant Management System.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+
+class KeysetPagination:
+    """
+    Keyset (cursor) pagination over a descending (timestamp, primary key) ordering.
+
+    Unlike OFFSET pagination, each page is fetched with a range condition on an
+    indexed (timestamp, pk) pair, so the cost of a page does not grow with how
+    deep into the result set the client is.
+
+    Usage:
+        paginator = KeysetPagination('created_at', 'orderID')
+        page, next_cursor = paginator.paginate(queryset, cursor, page_size)
+    """
+
+    default_page_size = 50
+    max_page_size = 200
+
+    def __init__(self, timestamp_field, pk_field):
+        self.timestamp_field = timestamp_field
+        self.pk_field = pk_field
+
+    def get_page_size(self, value):
+        """
+        Parse the requested page size, clamped to max_page_size.
+
+        Raises:
+            ValueError: If the value is not a positive integer
+        """
+        if value in (None, ''):
+            return self.default_page_size
+
+        page_size = int(value)
+        if page_size <= 0:
+            raise ValueError('page_size must be a positive integer')
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        """Build the opaque cursor pointing just after obj (a model instance or a values() dict)."""
+        if isinstance(obj, dict):
+            timestamp, pk = obj[self.timestamp_field], obj[self.pk_field]
+        else:
+            timestamp, pk = getattr(obj, self.timestamp_field), getattr(obj, self.pk_field)
+        raw = f"{timestamp.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        """
+        Decode a cursor into its (timestamp, pk) position.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            timestamp_str, pk_str = raw.rsplit('|', 1)
+            return datetime.fromisoformat(timestamp_str), int(pk_str)
+        except (TypeError, UnicodeError, ValueError) as e:
+            raise ValueError(f'Invalid cursor: {cursor}') from e
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """
+        Return one page of the queryset and the cursor for the next page.
+
+        Args:
+            queryset: QuerySet to paginate
+            cursor: Opaque cursor returned by a previous call (None for the first page)
+            page_size: Maximum number of rows per page
+
+        Returns:
+            tuple: (list of objects, next cursor or None when this is the last page)
+        """
+        page_size = page_size or self.default_page_size
+        queryset = queryset.order_by(f'-{self.timestamp_field}', f'-{self.pk_field}')
+
+        if cursor:
+            timestamp, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.timestamp_field}__lt': timestamp}) |
+                Q(**{self.timestamp_field: timestamp, f'{self.pk_field}__lt': pk})
+            )
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, self.encode_cursor(rows[-1])
+        return rows, None
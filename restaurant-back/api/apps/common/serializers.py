@@ -5,6 +5,62 @@ from rest_framework import serializers
 from .models import CompanySettings, TaxRate
 
 
+def parse_fields_param(value):
+    """
+    Parse a ``fields=`` query parameter into a projection.
+
+    Top-level names map to None (keep the whole field); dotted names select
+    sub-fields of a nested serializer, e.g. "orderID,status,items.status"
+    gives {'orderID': None, 'status': None, 'items': {'status'}}.
+
+    Returns:
+        dict or None: Projection, or None when no fields were requested
+    """
+    if not value:
+        return None
+
+    projection = {}
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if '.' in name:
+            parent, child = name.split('.', 1)
+            if projection.get(parent, set()) is not None:
+                projection.setdefault(parent, set()).add(child)
+        else:
+            projection[name] = None
+    return projection or None
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin that restricts output to a projection.
+
+    Accepts a ``fields`` keyword argument as returned by parse_fields_param().
+    Nested list serializers are trimmed to the requested sub-fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        projection = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if projection is None:
+            return
+
+        for name in list(self.fields):
+            if name not in projection:
+                self.fields.pop(name)
+                continue
+
+            sub_fields = projection[name]
+            nested = getattr(self.fields[name], 'child', self.fields[name])
+            if sub_fields and isinstance(nested, serializers.Serializer):
+                for sub_name in list(nested.fields):
+                    if sub_name not in sub_fields:
+                        nested.fields.pop(sub_name)
+
+
 class CompanySettingsSerializer(serializers.ModelSerializer):
     """
     Serializer for CompanySettings (singleton configuration).
@@ -1,9 +1,10 @@
 """
 Shared utility functions for the Restaurant Management System.
 """
+from decimal import Decimal
 
 # IVA (Tax) rate - 15%
-IVA_RATE = 0.15
+IVA_RATE = Decimal('0.15')
 
 
 def calculate_iva(amount):
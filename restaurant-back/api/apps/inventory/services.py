@@ -3,6 +3,8 @@ Inventory Service Layer
 Handles business logic for stock management.
 """
 from decimal import Decimal
+from django.utils import timezone
+from apps.menu.models import MenuItem
 from .models import InventoryItem
 
 
@@ -45,6 +47,125 @@ class InventoryService:
         inventory_item.save()
         return True
     
+    @staticmethod
+    def _first_inventory_items(menu_item_ids):
+        """
+        Load the inventory row used for each menu item in one query.
+
+        Returns:
+            dict: menu_item_id -> InventoryItem (same row as menu_item.inventory_items.first())
+        """
+        inventory_items = {}
+        for inventory_item in InventoryItem.objects.filter(
+            menu_item_id__in=menu_item_ids
+        ).order_by('menu_item_id', 'itemName', 'pk'):
+            inventory_items.setdefault(inventory_item.menu_item_id, inventory_item)
+        return inventory_items
+
+    @staticmethod
+    def _bulk_save(inventory_items):
+        """
+        Persist stock changes with one bulk_update and mirror
+        InventoryItem.update_menu_item_availability() with one update per state.
+        """
+        if not inventory_items:
+            return
+
+        available, unavailable = [], []
+        now = timezone.now()
+        for inventory_item in inventory_items:
+            inventory_item.updated_at = now
+            if inventory_item.available_quantity > 0:
+                available.append(inventory_item.menu_item_id)
+            else:
+                unavailable.append(inventory_item.menu_item_id)
+
+        InventoryItem.objects.bulk_update(
+            inventory_items,
+            ['quantity', 'oversell_quantity', 'reserved_quantity', 'updated_at']
+        )
+
+        if available:
+            MenuItem.objects.filter(pk__in=available).update(availability=True)
+        if unavailable:
+            MenuItem.objects.filter(pk__in=unavailable).update(availability=False)
+
+    @staticmethod
+    def reserve_stock_batch(quantities):
+        """
+        Reserve stock for several menu items at once (e.g., a new order).
+
+        Applies the same rules as reserve_stock() with one read and one
+        bulk write for the inventory rows, instead of a save() per line.
+
+        Args:
+            quantities: Dict of menu_item_id -> quantity to reserve
+                        (only quantifiable menu items)
+        """
+        if not quantities:
+            return
+
+        inventory_items = InventoryService._first_inventory_items(quantities.keys())
+        for menu_item_id, inventory_item in inventory_items.items():
+            quantity = quantities[menu_item_id]
+
+            if inventory_item.quantity < quantity:
+                # Handle overselling
+                inventory_item.oversell_quantity += quantity - inventory_item.quantity
+                inventory_item.quantity = 0
+            else:
+                inventory_item.quantity -= quantity
+
+            inventory_item.reserved_quantity += quantity
+
+        InventoryService._bulk_save(list(inventory_items.values()))
+
+    @staticmethod
+    def shift_reserved_stock_batch(quantity_changes):
+        """
+        Move stock between available and reserved for several menu items
+        (e.g., when order lines are edited). Positive changes reserve stock,
+        negative changes give it back.
+
+        Args:
+            quantity_changes: Dict of menu_item_id -> quantity change
+                              (only quantifiable menu items)
+        """
+        quantity_changes = {k: v for k, v in quantity_changes.items() if v}
+        if not quantity_changes:
+            return
+
+        inventory_items = InventoryService._first_inventory_items(quantity_changes.keys())
+        for menu_item_id, inventory_item in inventory_items.items():
+            inventory_item.reserved_quantity += quantity_changes[menu_item_id]
+            inventory_item.quantity -= quantity_changes[menu_item_id]
+
+        InventoryService._bulk_save(list(inventory_items.values()))
+
+    @staticmethod
+    def release_reserved_stock_batch(quantities):
+        """
+        Release reserved stock for several menu items at once (e.g., a paid order).
+
+        Applies the same rules as release_reserved_stock() with one read and
+        one bulk write for the inventory rows.
+
+        Args:
+            quantities: Dict of menu_item_id -> quantity to release
+                        (only quantifiable menu items)
+        """
+        if not quantities:
+            return
+
+        inventory_items = InventoryService._first_inventory_items(quantities.keys())
+        released = []
+        for menu_item_id, inventory_item in inventory_items.items():
+            if inventory_item.reserved_quantity >= quantities[menu_item_id]:
+                inventory_item.reserved_quantity -= quantities[menu_item_id]
+                released.append(inventory_item)
+
+        InventoryService._bulk_save(released)
+
     @staticmethod
     def release_reserved_stock(menu_item, quantity):
         """
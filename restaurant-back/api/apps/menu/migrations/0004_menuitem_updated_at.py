@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0003_remove_menucategory_status_remove_menuitem_status_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
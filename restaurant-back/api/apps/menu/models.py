@@ -39,6 +39,8 @@ class MenuItem(models.Model):
     availability = models.BooleanField(default=True)
     categoryID = models.ForeignKey(MenuCategory, on_delete=models.CASCADE, related_name='items')
     is_quantifiable = models.BooleanField(default=True)
+    # Watermark for the SAF-T product master file cache
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -0,0 +1,47 @@
+"""
+Repair job: rebuild or verify the denormalized order paid state.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.models import Order
+from apps.orders.services import PaidStateService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify with --verify) Order.amount_paid and OrderItem.quantity_paid from payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'order_ids',
+            nargs='*',
+            type=int,
+            help='Order IDs to process (default: all orders)'
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report mismatches, do not modify data'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.all()
+        if options['order_ids']:
+            queryset = queryset.filter(pk__in=options['order_ids'])
+
+        if not options['verify']:
+            orders, items = PaidStateService.rebuild(queryset)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt paid state for {orders} order(s) and {items} order item(s).'
+            ))
+            return
+
+        mismatches = PaidStateService.verify(queryset)
+        for order_id, stored, actual in mismatches['orders']:
+            self.stdout.write(f'Order {order_id}: amount_paid={stored}, payments={actual}')
+        for item_id, stored, actual in mismatches['items']:
+            self.stdout.write(f'Order item {item_id}: quantity_paid={stored}, payments={actual}')
+
+        total = len(mismatches['orders']) + len(mismatches['items'])
+        if total:
+            raise CommandError(f'{total} paid state mismatch(es) found. Run without --verify to rebuild.')
+        self.stdout.write(self.style.SUCCESS('Paid state is consistent.'))
@@ -0,0 +1,27 @@
+"""
+Repair job: recompute order totals from their items.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.orders.models import Order
+from apps.orders.services import OrderTotalsService
+
+
+class Command(BaseCommand):
+    help = 'Recompute totalAmount, totalIva and grandTotal of orders from their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'order_ids',
+            nargs='*',
+            type=int,
+            help='Order IDs to recompute (default: all orders)'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.all()
+        if options['order_ids']:
+            queryset = queryset.filter(pk__in=options['order_ids'])
+
+        updated = OrderTotalsService.recalculate_queryset(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Recalculated totals for {updated} order(s).'))
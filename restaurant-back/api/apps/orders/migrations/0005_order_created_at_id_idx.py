@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0001_initial"),
+        ("orders", "0004_alter_order_customer"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at", "orderID"], name="order_created_at_id_idx"
+            ),
+        ),
+    ]
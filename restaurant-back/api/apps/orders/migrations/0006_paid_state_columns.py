@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:28
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import IntegerField, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_paid_state(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    Payment = apps.get_model("payments", "Payment")
+    PaymentItem = apps.get_model("payments", "PaymentItem")
+
+    paid_amount = (
+        Payment.objects.filter(order=OuterRef("pk"), payment_status="COMPLETED")
+        .order_by()
+        .values("order")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    Order.objects.update(
+        amount_paid=Coalesce(
+            Subquery(
+                paid_amount, output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+    paid_quantity = (
+        PaymentItem.objects.filter(
+            order_item=OuterRef("pk"), payment__payment_status="COMPLETED"
+        )
+        .order_by()
+        .values("order_item")
+        .annotate(total=Sum("quantity_paid"))
+        .values("total")
+    )
+    OrderItem.objects.update(
+        quantity_paid=Coalesce(
+            Subquery(paid_quantity, output_field=IntegerField()), Value(0)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_order_created_at_id_idx"),
+        ("payments", "0006_payment_customer"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="amount_paid",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=10
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="quantity_paid",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_paid_state, migrations.RunPython.noop),
+    ]
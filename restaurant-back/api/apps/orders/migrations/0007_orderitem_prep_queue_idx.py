@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0003_remove_menucategory_status_remove_menuitem_status_and_more"),
+        ("orders", "0006_paid_state_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                condition=models.Q(("status", "4"), _negated=True),
+                fields=["to_be_prepared_in", "status", "id"],
+                name="orderitem_prep_queue_idx",
+            ),
+        ),
+    ]
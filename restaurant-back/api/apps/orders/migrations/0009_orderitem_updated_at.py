@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0004_menuitem_updated_at"),
+        ("orders", "0008_order_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["to_be_prepared_in", "updated_at", "id"],
+                name="orderitem_prep_changes_idx",
+            ),
+        ),
+    ]
@@ -65,6 +65,8 @@ class Order(models.Model):
         choices=PAYMENT_STATUS_CHOICES,
         default='PENDING'
     )
+    # Sum of completed payments (credit notes included), maintained by PaidStateService
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     orderType = models.CharField(max_length=20, choices=ORDER_TYPE_CHOICES)
     last_updated_by = models.ForeignKey(
         User,
@@ -81,20 +83,12 @@ class Order(models.Model):
 
     def calculate_totals(self):
         """Calculate totalAmount, totalIva, and grandTotal from order items."""
-        from decimal import Decimal
+        from apps.common.utils import calculate_grand_total
 
-        total_amount = sum(
-            item.price * item.quantity
-            for item in self.items.all()
-        )
-
-        iva_percentage = Decimal('0.15')  # 15% IVA
-        total_iva = total_amount * iva_percentage
-        grand_total = total_amount + total_iva
-
-        self.totalAmount = total_amount
-        self.totalIva = total_iva
-        self.grandTotal = grand_total
+        self.totalAmount, self.totalIva, self.grandTotal = calculate_grand_total(sum(
+            (item.price * item.quantity for item in self.items.all()),
+            Decimal('0.00')
+        ))
 
     def save(self, *args, **kwargs):
         """Override save to ensure totals are set."""
@@ -109,20 +103,14 @@ class Order(models.Model):
         super().save(*args, **kwargs)
 
     def update_payment_status(self):
-        """Update payment status based on completed payments."""
-        if self.payments.filter(payment_status='COMPLETED').exists():
-            self.paymentStatus = 'PAID'
-        else:
-            self.paymentStatus = 'PENDING'
-        self.save()
+        """Update payment status from the amount paid (see PaidStateService.refresh_payment_status)."""
+        from .services import PaidStateService
+
+        PaidStateService.refresh_payment_status(self)
 
     def total_paid(self):
-        """Calculate the total amount already paid for this order."""
-        from decimal import Decimal
-        total = self.payments.filter(payment_status='COMPLETED').aggregate(
-            total=models.Sum('amount')
-        )['total']
-        return total or Decimal('0.00')
+        """Get the total amount already paid for this order."""
+        return self.amount_paid
 
     def remaining_amount(self):
         """Calculate the remaining unpaid amount for this order."""
@@ -133,6 +121,13 @@ class Order(models.Model):
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of order lists on (created_at, orderID)
+            models.Index(fields=['created_at', 'orderID'], name='order_created_at_id_idx'),
+            # Order search: status/payment status equality plus a created_at range
+            models.Index(fields=['paymentStatus', 'created_at'], name='order_paystatus_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -145,9 +140,37 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     to_be_prepared_in = models.CharField(max_length=1, default='3')
     status = models.CharField(max_length=1, choices=CHOICES_STATUS, default='1')
+    # Quantity covered by completed payments, maintained by PaidStateService
+    quantity_paid = models.PositiveIntegerField(default=0)
+    # Last line or status change (prep screens poll for changes since a cursor)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the persisted order/price/quantity so saves can apply total deltas."""
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if {'order_id', 'price', 'quantity'} <= loaded.keys():
+            instance._loaded_line = (loaded['order_id'], loaded['price'] * loaded['quantity'])
+        return instance
+
+    def _order_ref(self):
+        """The cached Order instance (so it is refreshed in place) or just its ID."""
+        return self.order if OrderItem.order.is_cached(self) else self.order_id
+
+    # Fields whose changes require the price/category lookups and a totals update
+    LINE_FIELDS = {'order', 'order_id', 'menu_item', 'menu_item_id', 'quantity', 'price', 'to_be_prepared_in'}
 
     def save(self, *args, **kwargs):
         """Auto-set price, preparation location from menu item category and update order totals."""
+        from .services import OrderTotalsService
+
+        # Fast path for partial saves that leave the line untouched (e.g. status changes)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not self.LINE_FIELDS.intersection(update_fields):
+            super().save(*args, **kwargs)
+            return
+
         # Auto-set price from menu item if not provided
         if self.menu_item and not self.price:
             self.price = self.menu_item.price
@@ -156,48 +179,51 @@ class OrderItem(models.Model):
         if self.menu_item and self.menu_item.categoryID:
             self.to_be_prepared_in = self.menu_item.categoryID.prepared_in
 
+        adding = self._state.adding
+        previous = getattr(self, '_loaded_line', None)
+
         super().save(*args, **kwargs)
 
-        # Recalculate order totals after saving item
-        if self.order:
-            self.order.calculate_totals()
-            self.order.save()
+        # Apply the change in line value to the order totals
+        line_value = self.price * self.quantity
+        if adding:
+            OrderTotalsService.apply_delta(self._order_ref(), line_value)
+        elif previous is None:
+            # Persisted values unknown (deferred load): fall back to a full recalculation
+            OrderTotalsService.recalculate(self._order_ref())
+        elif previous[0] != self.order_id:
+            # Item moved to another order
+            OrderTotalsService.apply_delta(previous[0], -previous[1])
+            OrderTotalsService.apply_delta(self._order_ref(), line_value)
+        else:
+            OrderTotalsService.apply_delta(self._order_ref(), line_value - previous[1])
+
+        self._loaded_line = (self.order_id, line_value)
 
     def delete(self, *args, **kwargs):
         """Update order totals after deleting item."""
-        order = self.order
-        super().delete(*args, **kwargs)
+        from .services import OrderTotalsService
+
+        order_id, line_value = getattr(self, '_loaded_line', (self.order_id, self.price * self.quantity))
+        order_ref = self._order_ref() if order_id == self.order_id else order_id
+        result = super().delete(*args, **kwargs)
 
-        # Recalculate order totals after deletion
-        if order:
-            order.calculate_totals()
-            order.save()
+        OrderTotalsService.apply_delta(order_ref, -line_value)
+        return result
 
     def is_paid(self):
         """
         Check if this order item has been fully paid for.
         Returns True if the total paid quantity equals or exceeds the order quantity.
         """
-        from django.db.models import Sum
-
-        total_paid = self.payments.filter(
-            payment__payment_status='COMPLETED'
-        ).aggregate(total=Sum('quantity_paid'))['total'] or 0
-
-        return total_paid >= self.quantity
+        return self.quantity_paid >= self.quantity
 
     def remaining_quantity(self):
         """
         Get the remaining unpaid quantity for this order item.
         Returns the number of items that haven't been paid for yet.
         """
-        from django.db.models import Sum
-
-        total_paid = self.payments.filter(
-            payment__payment_status='COMPLETED'
-        ).aggregate(total=Sum('quantity_paid'))['total'] or 0
-
-        return self.quantity - total_paid
+        return self.quantity - self.quantity_paid
 
     def __str__(self):
         return f"Order {self.order.orderID} - Item {self.menu_item.name}"
@@ -206,6 +232,16 @@ class OrderItem(models.Model):
         db_table = 'apps_orderitem'  # Use existing table
         verbose_name = 'Order Item'
         verbose_name_plural = 'Order Items'
+        indexes = [
+            # Kitchen/bar prep queues only ever read items that are not delivered yet
+            models.Index(
+                fields=['to_be_prepared_in', 'status', 'id'],
+                name='orderitem_prep_queue_idx',
+                condition=~models.Q(status='4'),
+            ),
+            # Prep screen deltas: items of a station changed since a (updated_at, id) cursor
+            models.Index(fields=['to_be_prepared_in', 'updated_at', 'id'], name='orderitem_prep_changes_idx'),
+        ]
 
 
 class OrderDetails(models.Model):
@@ -0,0 +1,795 @@
+"""
+Order Service Layer
+Handles query construction and business logic for orders.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderDetails
+from apps.common.feature_flags import FeatureFlags, Modules
+from apps.common.pagination import KeysetPagination
+from apps.common.utils import IVA_RATE, calculate_grand_total
+from apps.inventory.services import InventoryService
+from apps.menu.models import MenuItem
+from apps.payments.models import Payment, PaymentItem
+
+logger = logging.getLogger(__name__)
+
+
+class OrderTotalsService:
+    """
+    Maintains order totals (totalAmount, totalIva, grandTotal).
+
+    Item changes are applied as deltas (+qty*price / -qty*price) with a single
+    DB-side UPDATE; recalculate() re-sums all items for repair jobs.
+    """
+
+    TOTAL_FIELDS = ['totalAmount', 'totalIva', 'grandTotal', 'updated_at']
+
+    @staticmethod
+    def _totals_update(amount):
+        """Field values for an UPDATE setting totalAmount to the given expression."""
+        return {
+            'totalAmount': amount,
+            'totalIva': amount * Value(IVA_RATE),
+            'grandTotal': amount * Value(1 + IVA_RATE),
+            'updated_at': timezone.now(),
+        }
+
+    @staticmethod
+    def apply_delta(order, amount_delta):
+        """
+        Shift an order's totals by amount_delta in one UPDATE.
+
+        totalIva and grandTotal are derived from the new totalAmount in the
+        same statement, so rounding never drifts from a full recalculation.
+
+        Args:
+            order: Order instance (refreshed in place) or order ID
+            amount_delta: Decimal change in net amount (sum of qty*price)
+        """
+        if not amount_delta:
+            return
+
+        order_id = order.pk if isinstance(order, Order) else order
+        Order.objects.filter(pk=order_id).update(
+            **OrderTotalsService._totals_update(F('totalAmount') + Value(amount_delta))
+        )
+
+        if isinstance(order, Order):
+            order.refresh_from_db(fields=OrderTotalsService.TOTAL_FIELDS)
+
+    @staticmethod
+    def recalculate(order):
+        """
+        Recompute an order's totals from all of its items.
+        Intended for repair jobs; regular edits should use apply_delta().
+
+        Args:
+            order: Order instance (refreshed in place) or order ID
+        """
+        order_id = order.pk if isinstance(order, Order) else order
+        OrderTotalsService.recalculate_queryset(Order.objects.filter(pk=order_id))
+
+        if isinstance(order, Order):
+            order.refresh_from_db(fields=OrderTotalsService.TOTAL_FIELDS)
+
+    @staticmethod
+    def recalculate_queryset(queryset):
+        """
+        Recompute totals for every order in the queryset with one UPDATE.
+
+        Returns:
+            int: Number of orders updated
+        """
+        items_total = OrderItem.objects.filter(
+            order=OuterRef('pk')
+        ).order_by().values('order').annotate(
+            total=Sum(F('price') * F('quantity'))
+        ).values('total')
+
+        amount = Coalesce(
+            Subquery(items_total, output_field=DecimalField(max_digits=10, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+        return queryset.update(**OrderTotalsService._totals_update(amount))
+
+
+class PaidStateService:
+    """
+    Maintains the denormalized paid state: Order.amount_paid and OrderItem.quantity_paid.
+
+    Payment/PaymentItem saves and deletes apply deltas with DB-side F()
+    updates; rebuild() and verify() recompute them from the payment rows.
+    """
+
+    @staticmethod
+    def apply_amount_delta(order, amount_delta):
+        """
+        Shift an order's amount_paid.
+
+        Args:
+            order: Order instance (refreshed in place) or order ID
+            amount_delta: Decimal change in completed payments
+        """
+        if not amount_delta:
+            return
+
+        order_id = order.pk if isinstance(order, Order) else order
+        Order.objects.filter(pk=order_id).update(amount_paid=F('amount_paid') + Value(amount_delta))
+
+        if isinstance(order, Order):
+            order.refresh_from_db(fields=['amount_paid'])
+
+    @staticmethod
+    def apply_quantity_deltas(quantity_deltas):
+        """
+        Shift quantity_paid for several order items with one UPDATE.
+
+        Args:
+            quantity_deltas: Dict of order_item_id -> quantity change
+        """
+        quantity_deltas = {pk: delta for pk, delta in quantity_deltas.items() if delta}
+        if not quantity_deltas:
+            return
+
+        OrderItem.objects.filter(pk__in=quantity_deltas.keys()).update(
+            quantity_paid=F('quantity_paid') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in quantity_deltas.items()],
+                output_field=IntegerField()
+            )
+        )
+
+    # Remaining balance tolerated as rounding when deciding an order is paid
+    PAID_TOLERANCE = Decimal('0.01')
+
+    @staticmethod
+    def refresh_payment_status(orders):
+        """
+        Derive Order.paymentStatus from amount_paid vs grandTotal with one UPDATE.
+
+        Nothing paid is PENDING, a remaining balance within PAID_TOLERANCE is
+        PAID and anything in between is PARTIALLY_PAID. Only orders whose
+        status changes are written.
+
+        Args:
+            orders: Order instance (refreshed in place), order ID, or queryset/iterable of order IDs
+        """
+        if isinstance(orders, Order):
+            order_filter = Q(pk=orders.pk)
+        elif isinstance(orders, int):
+            order_filter = Q(pk=orders)
+        else:
+            order_filter = Q(pk__in=orders)
+
+        payment_status = Case(
+            When(amount_paid__lte=0, then=Value('PENDING')),
+            When(
+                amount_paid__gte=F('grandTotal') - Value(PaidStateService.PAID_TOLERANCE),
+                then=Value('PAID')
+            ),
+            default=Value('PARTIALLY_PAID'),
+        )
+        Order.objects.filter(order_filter).exclude(paymentStatus=payment_status).update(
+            paymentStatus=payment_status,
+            updated_at=timezone.now()
+        )
+
+        if isinstance(orders, Order):
+            orders.refresh_from_db(fields=['paymentStatus', 'updated_at'])
+
+    @staticmethod
+    def _actual_amount_paid():
+        paid = Payment.objects.filter(
+            order=OuterRef('pk'),
+            payment_status='COMPLETED'
+        ).order_by().values('order').annotate(total=Sum('amount')).values('total')
+        return Coalesce(
+            Subquery(paid, output_field=DecimalField(max_digits=10, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+
+    @staticmethod
+    def _actual_quantity_paid():
+        paid = PaymentItem.objects.filter(
+            order_item=OuterRef('pk'),
+            payment__payment_status='COMPLETED'
+        ).order_by().values('order_item').annotate(total=Sum('quantity_paid')).values('total')
+        return Coalesce(Subquery(paid, output_field=IntegerField()), Value(0))
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(order_queryset=None):
+        """
+        Recompute amount_paid and quantity_paid from the payment rows.
+
+        Args:
+            order_queryset: Orders to rebuild (default: all orders)
+
+        Returns:
+            tuple: (orders updated, order items updated)
+        """
+        if order_queryset is None:
+            order_queryset = Order.objects.all()
+
+        orders = order_queryset.update(amount_paid=PaidStateService._actual_amount_paid())
+        items = OrderItem.objects.filter(order__in=order_queryset.values('pk')).update(
+            quantity_paid=PaidStateService._actual_quantity_paid()
+        )
+        return orders, items
+
+    @staticmethod
+    def verify(order_queryset=None):
+        """
+        Find orders and order items whose stored paid state disagrees with the payment rows.
+
+        Returns:
+            dict: {"orders": [(orderID, stored, actual), ...], "items": [(id, stored, actual), ...]}
+        """
+        if order_queryset is None:
+            order_queryset = Order.objects.all()
+
+        orders = order_queryset.annotate(
+            actual=PaidStateService._actual_amount_paid()
+        ).filter(~Q(amount_paid=F('actual'))).values_list('orderID', 'amount_paid', 'actual')
+
+        items = OrderItem.objects.filter(order__in=order_queryset.values('pk')).annotate(
+            actual=PaidStateService._actual_quantity_paid()
+        ).filter(~Q(quantity_paid=F('actual'))).values_list('id', 'quantity_paid', 'actual')
+
+        return {'orders': list(orders), 'items': list(items)}
+
+
+class OrderService:
+    """
+    Service class for order operations.
+    """
+
+    @staticmethod
+    def with_serialization_data(queryset=None, fields=None):
+        """
+        Prepare an order queryset for OrderSerializer.
+
+        Loads details/table in the same query and prefetches items with their
+        menu items, so serializing a list costs a fixed number of queries
+        regardless of its size. Paid amounts/quantities are plain columns.
+        When a projection is given, only the relations needed by the
+        requested fields are loaded.
+
+        Args:
+            queryset: Base Order queryset (defaults to all orders)
+            fields: Projection from parse_fields_param() (None loads everything)
+
+        Returns:
+            QuerySet of Order
+        """
+        if queryset is None:
+            queryset = Order.objects.all()
+
+        def wanted(name, within=fields):
+            return within is None or name in within
+
+        if wanted('details'):
+            queryset = queryset.select_related('details__table')
+
+        if wanted('items'):
+            item_fields = fields['items'] if fields is not None else None
+            items = OrderItem.objects.order_by('id')
+
+            if wanted('name', item_fields):
+                items = items.select_related('menu_item')
+
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=items))
+
+        return queryset
+
+    @staticmethod
+    def get_for_serialization(pk, fields=None):
+        """
+        Fetch a single order prepared for OrderSerializer.
+
+        Raises:
+            Order.DoesNotExist: If the order does not exist
+        """
+        return OrderService.with_serialization_data(fields=fields).get(pk=pk)
+
+    @staticmethod
+    @transaction.atomic
+    def create_order(validated_data):
+        """
+        Create an order with its items, details and inventory reservations.
+
+        Items are inserted with a single bulk_create (bypassing the per-item
+        OrderItem.save() totals recalculation), totals are computed once and
+        inventory is reserved in one batch, all inside one transaction.
+
+        Args:
+            validated_data: OrderSerializer validated data (with 'items' and 'details')
+
+        Returns:
+            Order: The created order
+        """
+        order_items_data = validated_data.pop('items')
+        order_details_data = validated_data.pop('details')
+
+        total_amount, total_iva, grand_total = calculate_grand_total(
+            sum(item['menu_item'].price * item['quantity'] for item in order_items_data)
+        )
+        order = Order.objects.create(**validated_data, totalAmount=total_amount, totalIva=total_iva, grandTotal=grand_total)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                menu_item=item_data['menu_item'],
+                quantity=item_data['quantity'],
+                price=item_data['menu_item'].price,
+                # Same as OrderItem.save(): preparation location from the menu item category
+                to_be_prepared_in=item_data['menu_item'].categoryID.prepared_in,
+            )
+            for item_data in order_items_data
+        ])
+
+        # Only manage inventory if the inventory module is enabled (Premium feature)
+        if FeatureFlags.is_module_enabled(Modules.INVENTORY):
+            quantities = defaultdict(int)
+            for item_data in order_items_data:
+                if item_data['menu_item'].is_quantifiable:
+                    quantities[item_data['menu_item'].pk] += item_data['quantity']
+            InventoryService.reserve_stock_batch(quantities)
+
+        OrderDetails.objects.create(order=order, **order_details_data)
+
+        table = order_details_data.get('table')
+        if table:
+            table.status = 'OC'
+            table.save(update_fields=['status'])
+
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def apply_item_changes(order, items_data, manage_inventory=False):
+        """
+        Add, update or remove several order lines in one transaction.
+
+        All referenced menu items are loaded with one query, lines are written
+        with bulk_create/bulk_update/one DELETE and the totals are shifted
+        once, so the cost does not grow with the number of changed lines.
+
+        Args:
+            order: Order instance (locked, refreshed in place)
+            items_data: List of {"menu_item": id or MenuItem, "quantity": int};
+                        quantity 0 removes the line
+            manage_inventory: Also move stock between available and reserved
+
+        Returns:
+            Order: The updated order
+
+        Raises:
+            ValueError: If a menu item or quantity is invalid, or a quantity is
+                        below what was already paid for that menu item
+        """
+        # Serialize concurrent edits of the same order
+        list(Order.objects.select_for_update().filter(pk=order.pk).values_list('pk', flat=True))
+
+        # Desired quantity per menu item (the last entry wins)
+        wanted = {}
+        for item_data in items_data:
+            menu_item = item_data.get('menu_item')
+            try:
+                menu_item_id = int(getattr(menu_item, 'pk', menu_item))
+                quantity = int(item_data.get('quantity', 0))
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid item: {item_data}")
+            if quantity < 0:
+                raise ValueError(f"Invalid quantity for menu item {menu_item_id}: {quantity}")
+            wanted[menu_item_id] = quantity
+
+        menu_items = MenuItem.objects.select_related('categoryID').in_bulk(
+            [menu_item_id for menu_item_id, quantity in wanted.items() if quantity > 0]
+        )
+        missing = [menu_item_id for menu_item_id, quantity in wanted.items() if quantity > 0 and menu_item_id not in menu_items]
+        if missing:
+            raise ValueError(f"Menu item(s) not found: {', '.join(map(str, missing))}")
+
+        existing = defaultdict(list)
+        for order_item in order.items.filter(menu_item_id__in=wanted.keys()).order_by('id'):
+            existing[order_item.menu_item_id].append(order_item)
+
+        to_create, to_update, to_delete = [], [], []
+        amount_delta = Decimal('0.00')
+        # bulk_update skips auto_now, so changed lines are stamped here
+        now = timezone.now()
+        quantity_changes = defaultdict(int)
+
+        # Duplicate lines with payments (id -> line kept) and the paid quantity each kept line gains
+        paid_moves = {}
+        merged_paid = defaultdict(int)
+
+        for menu_item_id, quantity in wanted.items():
+            lines = existing.get(menu_item_id, [])
+
+            # Paid units cannot be removed: their payment items would be deleted with the line
+            quantity_paid = sum(order_item.quantity_paid for order_item in lines)
+            if quantity < quantity_paid:
+                raise ValueError(
+                    f"Invalid quantity for menu item {menu_item_id}: {quantity} "
+                    f"(already paid: {quantity_paid})"
+                )
+
+            # Duplicate lines for the same menu item collapse into the first one
+            keep = lines[0] if lines and quantity > 0 else None
+            for order_item in lines:
+                if order_item is not keep:
+                    to_delete.append(order_item.pk)
+                    amount_delta -= order_item.price * order_item.quantity
+                    quantity_changes[menu_item_id] -= order_item.quantity
+                    if order_item.quantity_paid:
+                        paid_moves[order_item.pk] = keep
+                        merged_paid[keep.pk] += order_item.quantity_paid
+            if keep is not None and len(lines) > 1:
+                logger.info(
+                    'Order %s: merged duplicate lines %s for menu item %s into line %s',
+                    order.pk, [order_item.pk for order_item in lines[1:]], menu_item_id, keep.pk
+                )
+
+            if quantity == 0:
+                continue
+
+            menu_item = menu_items[menu_item_id]
+            if keep is None:
+                to_create.append(OrderItem(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=quantity,
+                    price=menu_item.price,
+                    to_be_prepared_in=menu_item.categoryID.prepared_in,
+                ))
+            else:
+                amount_delta -= keep.price * keep.quantity
+                quantity_changes[menu_item_id] -= keep.quantity
+                keep.quantity = quantity
+                keep.price = menu_item.price
+                keep.updated_at = now
+                to_update.append(keep)
+
+            amount_delta += menu_item.price * quantity
+            quantity_changes[menu_item_id] += quantity
+
+        if to_create:
+            OrderItem.objects.bulk_create(to_create)
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ['quantity', 'price', 'updated_at'])
+        if paid_moves:
+            # Re-point the payment items before the duplicates (and their cascade) are deleted
+            for order_item_id, keep in paid_moves.items():
+                PaymentItem.objects.filter(order_item_id=order_item_id).update(order_item=keep)
+            PaidStateService.apply_quantity_deltas(merged_paid)
+        if to_delete:
+            OrderItem.objects.filter(pk__in=to_delete).delete()
+
+        # Only manage inventory if the inventory module is enabled (Premium feature)
+        if manage_inventory and FeatureFlags.is_module_enabled(Modules.INVENTORY):
+            quantifiable = set(MenuItem.objects.filter(
+                pk__in=quantity_changes.keys(),
+                is_quantifiable=True
+            ).values_list('pk', flat=True))
+            InventoryService.shift_reserved_stock_batch({
+                menu_item_id: change
+                for menu_item_id, change in quantity_changes.items()
+                if menu_item_id in quantifiable
+            })
+
+        OrderTotalsService.apply_delta(order.pk, amount_delta)
+        order.refresh_from_db(fields=OrderTotalsService.TOTAL_FIELDS)
+
+        # Cancel order if no items remain
+        if order.totalAmount == 0:
+            order.status = 'CANCELLED'
+            order.save(update_fields=['status', 'updated_at'])
+
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def transfer_items(source_order_id, target_order_id):
+        """
+        Move all items of the source order into the target order and delete the source.
+
+        Lines for menu items already on the target are merged into the target
+        line; the others are reassigned. Both orders are row-locked (in primary
+        key order) so concurrent transfers cannot interleave, and the work is
+        done with one bulk UPDATE plus a single totals update. The target's
+        paid state is then rebuilt, as the source's payments are deleted
+        with it.
+
+        Orders with signed invoices cannot be transferred: deleting them would
+        break the fiscal hash chain.
+
+        Returns:
+            Order: The target order
+
+        Raises:
+            Order.DoesNotExist: If either order does not exist
+            ValueError: If the source order has signed invoices
+        """
+        orders = {
+            order.pk: order
+            for order in Order.objects.select_for_update().filter(
+                pk__in=[source_order_id, target_order_id]
+            ).order_by('pk')
+        }
+        if source_order_id not in orders or target_order_id not in orders:
+            raise Order.DoesNotExist('One or both orders do not exist.')
+        source_order, target_order = orders[source_order_id], orders[target_order_id]
+
+        if source_order.payments.filter(is_signed=True).exists():
+            raise ValueError('The source order has signed invoices and cannot be transferred.')
+
+        source_items = list(source_order.items.order_by('id'))
+        target_lines = {}
+        for order_item in target_order.items.filter(
+            menu_item_id__in={item.menu_item_id for item in source_items}
+        ).order_by('id'):
+            target_lines.setdefault(order_item.menu_item_id, order_item)
+
+        changed = {}
+        amount_delta = Decimal('0.00')
+        now = timezone.now()
+        for item in source_items:
+            item.updated_at = now
+            existing_item = target_lines.get(item.menu_item_id)
+            if existing_item:
+                # Merge quantities if item already exists in target
+                existing_item.quantity += item.quantity
+                existing_item.updated_at = now
+                amount_delta += existing_item.price * item.quantity
+                changed[existing_item.pk] = existing_item
+            else:
+                # Move item to target order
+                item.order = target_order
+                amount_delta += item.price * item.quantity
+                target_lines[item.menu_item_id] = item
+                changed[item.pk] = item
+
+        if changed:
+            OrderItem.objects.bulk_update(list(changed.values()), ['order', 'quantity', 'updated_at'])
+
+        # Remaining (merged) source lines are removed with the source order
+        source_order.delete()
+
+        # The source order's payments went with it, so the paid quantities of
+        # moved lines are recomputed from the target's remaining payment rows
+        PaidStateService.rebuild(Order.objects.filter(pk=target_order.pk))
+
+        OrderTotalsService.apply_delta(target_order, amount_delta)
+        PaidStateService.refresh_payment_status(target_order)
+        target_order.refresh_from_db(fields=['amount_paid'])
+        return target_order
+
+    @staticmethod
+    def rollup_status(counts):
+        """
+        Derive the order status from per-status item counts.
+
+        Args:
+            counts: Dict with total, pending, preparing, ready and delivered item counts
+
+        Returns:
+            str or None: Order status, or None when the order has no items
+        """
+        total = counts['total']
+        if not total:
+            return None
+        # All items delivered (status '4')
+        if counts['delivered'] == total:
+            return 'DELIVERED'
+        # All items ready (status '3')
+        if counts['ready'] == total:
+            return 'READY'
+        # All items pending (status '1')
+        if counts['pending'] == total:
+            return 'PENDING'
+        # Any item preparing, or mixed statuses: work in progress
+        return 'PREPARING'
+
+    @staticmethod
+    @transaction.atomic
+    def update_item_status(order_item, new_status):
+        """
+        Set an item's status and roll the item statuses up into the order status.
+
+        Only the status column is written, the roll-up is one aggregate query and
+        the order is only updated when its status actually changes.
+
+        Args:
+            order_item: OrderItem instance
+            new_status: Item status code ('1'-'4')
+
+        Returns:
+            str or None: The order status after the roll-up (None when the order has no items)
+        """
+        order_item.status = new_status
+        order_item.save(update_fields=['status', 'updated_at'])
+
+        counts = OrderItem.objects.filter(order_id=order_item.order_id).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='1')),
+            preparing=Count('id', filter=Q(status='2')),
+            ready=Count('id', filter=Q(status='3')),
+            delivered=Count('id', filter=Q(status='4')),
+        )
+        order_status = OrderService.rollup_status(counts)
+
+        if order_status:
+            Order.objects.filter(pk=order_item.order_id).exclude(status=order_status).update(
+                status=order_status,
+                updated_at=timezone.now()
+            )
+        return order_status
+
+
+class PrepQueueService:
+    """
+    Open order items for the kitchen and bar screens.
+
+    Reads go through the partial index on (to_be_prepared_in, status, id)
+    that only covers items which are not yet delivered, so the cost depends
+    on the size of the open queue rather than on the item history.
+
+    Screens then poll changes(): the items whose updated_at moved past an
+    opaque (updated_at, id) cursor, delivered ones included. Lines deleted
+    from an order leave no row behind, so screens ask for the IDs still open
+    now and then (not on every poll) to drop them.
+    """
+
+    STATIONS = {
+        'kitchen': '1',
+        'bar': '2',
+    }
+    BOTH = '3'
+    DELIVERED = '4'
+    DEFAULT_LIMIT = 200
+    MAX_LIMIT = 500
+    # Cursors stay this far behind the clock, so a change committed late by a
+    # slower transaction (stamped before the cursor moved on) is still seen
+    SETTLE_TIME = timedelta(seconds=2)
+
+    CURSOR = KeysetPagination('updated_at', 'id')
+
+    FIELDS = ('id', 'order_id', 'menu_item_id', 'quantity', 'status', 'to_be_prepared_in', 'updated_at')
+    RELATED_FIELDS = {
+        'name': F('menu_item__name'),
+        'ordered_at': F('order__created_at'),
+        'table': F('order__details__table_id'),
+    }
+
+    @staticmethod
+    def station_code(station):
+        """
+        Resolve a station name ('kitchen', 'bar') or code ('1', '2') to its code.
+
+        Raises:
+            ValueError: If the station is unknown
+        """
+        station = str(station).lower()
+        if station in PrepQueueService.STATIONS:
+            return PrepQueueService.STATIONS[station]
+        if station in PrepQueueService.STATIONS.values():
+            return station
+        raise ValueError(f'Unknown station: {station}')
+
+    @staticmethod
+    def _limit(limit):
+        """Parse a limit (default: 200, max: 500)."""
+        limit = PrepQueueService.DEFAULT_LIMIT if limit in (None, '') else int(limit)
+        if limit <= 0:
+            raise ValueError('limit must be a positive integer')
+        return min(limit, PrepQueueService.MAX_LIMIT)
+
+    @staticmethod
+    def _station_items(code):
+        return OrderItem.objects.filter(to_be_prepared_in__in=[code, PrepQueueService.BOTH])
+
+    @staticmethod
+    def start_cursor():
+        """Cursor for a screen that has just read the whole open queue."""
+        settled = timezone.now() - PrepQueueService.SETTLE_TIME
+        return PrepQueueService.CURSOR.encode_cursor({'updated_at': settled, 'id': 0})
+
+    @staticmethod
+    def open_items(station, after_id=None, limit=None):
+        """
+        Open items for a station, oldest first.
+
+        Args:
+            station: Station name or code (see station_code)
+            after_id: Only return items with a greater ID (delta polling)
+            limit: Maximum number of items (default: 200, max: 500)
+
+        Returns:
+            list: One dict per item with FIELDS plus name, ordered_at and table
+
+        Raises:
+            ValueError: If the station, after_id or limit is invalid
+        """
+        code = PrepQueueService.station_code(station)
+        limit = PrepQueueService._limit(limit)
+
+        # Same predicate as the partial index condition so the planner can use it
+        queryset = PrepQueueService._station_items(code).exclude(status=PrepQueueService.DELIVERED)
+
+        if after_id not in (None, ''):
+            queryset = queryset.filter(id__gt=int(after_id))
+
+        return list(
+            queryset.order_by('id').values(
+                *PrepQueueService.FIELDS, **PrepQueueService.RELATED_FIELDS
+            )[:limit]
+        )
+
+    @staticmethod
+    def changes(station, since, limit=None, include_open_ids=False):
+        """
+        Items of a station changed since a cursor, in change order.
+
+        Delivered items are included (they left the queue). Lines deleted
+        from an order cannot be returned; include_open_ids adds the IDs of the
+        whole open queue (an index-only read of the partial index) so the
+        caller can drop them.
+
+        Args:
+            station: Station name or code (see station_code)
+            since: Cursor returned by start_cursor() or a previous call
+            limit: Maximum number of changed items (default: 200, max: 500)
+            include_open_ids: Also return the IDs of all open items
+
+        Returns:
+            dict: {"items": [...], "since": next cursor, "has_more": bool},
+                  plus "open_ids": [...] when requested
+
+        Raises:
+            ValueError: If the station, cursor or limit is invalid
+        """
+        code = PrepQueueService.station_code(station)
+        limit = PrepQueueService._limit(limit)
+        updated_at, item_id = PrepQueueService.CURSOR.decode_cursor(since)
+
+        items = list(
+            PrepQueueService._station_items(code).filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=item_id)
+            ).order_by('updated_at', 'id').values(
+                *PrepQueueService.FIELDS, **PrepQueueService.RELATED_FIELDS
+            )[:limit + 1]
+        )
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        # Never move the cursor into the settle window (those rows come again next poll)
+        settled = timezone.now() - PrepQueueService.SETTLE_TIME
+        position = (updated_at, item_id)
+        for item in items:
+            if item['updated_at'] > settled:
+                break
+            position = (item['updated_at'], item['id'])
+
+        result = {
+            'items': items,
+            'since': PrepQueueService.CURSOR.encode_cursor({'updated_at': position[0], 'id': position[1]}),
+            'has_more': has_more,
+        }
+        if include_open_ids:
+            result['open_ids'] = list(
+                PrepQueueService._station_items(code).exclude(
+                    status=PrepQueueService.DELIVERED
+                ).order_by('id').values_list('id', flat=True)
+            )
+        return result
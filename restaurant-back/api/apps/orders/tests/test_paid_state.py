@@ -0,0 +1,125 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from apps.cash_register.models import CashRegister
+from apps.menu.models import MenuCategory, MenuItem
+from apps.orders.models import Order, OrderItem
+from apps.orders.serializers import OrderSerializer
+from apps.orders.services import OrderService, PaidStateService
+from apps.payments.models import PaymentItem
+from apps.payments.services.fiscal_service import FiscalService
+from apps.payments.services.payment_service import PaymentService
+
+
+class PaidStateTestCase(TestCase):
+    """Orders with items, paid through PaymentService like the payment endpoints do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='waiter')
+        CashRegister.objects.create(user=cls.user, initial_amount=Decimal('0.00'))
+        category = MenuCategory.objects.create(name='Pratos', prepared_in='1')
+        cls.soup = MenuItem.objects.create(name='Sopa', description='', price=Decimal('3.00'), categoryID=category)
+        cls.steak = MenuItem.objects.create(name='Bife', description='', price=Decimal('12.00'), categoryID=category)
+
+    def create_order(self, *lines):
+        order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(order, [
+            {'menu_item': menu_item, 'quantity': quantity} for menu_item, quantity in lines
+        ])
+        return order
+
+    def pay(self, order, menu_item, quantity):
+        amount = menu_item.price * quantity
+        payment, _ = PaymentService.process_payment(
+            self.user, order.pk, amount, 'CASH',
+            selected_items=[{'menu_item_id': menu_item.pk, 'quantity': quantity}]
+        )
+        return payment
+
+    def assertNoDrift(self):
+        self.assertEqual(PaidStateService.verify(), {'orders': [], 'items': []})
+
+
+class OrderUpdateTests(PaidStateTestCase):
+
+    def test_update_keeps_payment_recorded_after_load(self):
+        order = self.create_order((self.soup, 2), (self.steak, 1))
+        instance = Order.objects.get(pk=order.pk)
+
+        # Paid while the instance being updated is already in hand
+        self.pay(order, self.soup, 1)
+
+        serializer = OrderSerializer(instance, data={'items': [{'menu_item': self.steak.pk, 'quantity': 2}]}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save(last_updated_by=self.user)
+
+        order.refresh_from_db()
+        self.assertEqual(order.amount_paid, Decimal('3.00'))
+        self.assertEqual(order.paymentStatus, 'PARTIALLY_PAID')
+        self.assertEqual(order.last_updated_by, self.user)
+        self.assertNoDrift()
+
+    def test_duplicate_lines_are_merged_with_their_payments(self):
+        order = self.create_order((self.soup, 2))
+        self.pay(order, self.soup, 1)
+        duplicate = OrderItem.objects.create(order=order, menu_item=self.soup, quantity=1, price=self.soup.price)
+        self.pay(order, self.soup, 2)
+
+        OrderService.apply_item_changes(order, [{'menu_item': self.soup, 'quantity': 4}])
+
+        self.assertFalse(OrderItem.objects.filter(pk=duplicate.pk).exists())
+        line = order.items.get()
+        self.assertEqual((line.quantity, line.quantity_paid), (4, 3))
+        self.assertEqual(PaymentItem.objects.filter(order_item__order=order).exclude(order_item=line).count(), 0)
+        self.assertNoDrift()
+
+    def test_quantity_below_paid_is_rejected(self):
+        order = self.create_order((self.soup, 3))
+        self.pay(order, self.soup, 2)
+
+        for quantity in [1, 0]:
+            with self.assertRaises(ValueError):
+                OrderService.apply_item_changes(order, [{'menu_item': self.soup, 'quantity': quantity}])
+
+        line = order.items.get()
+        self.assertEqual((line.quantity, line.quantity_paid), (3, 2))
+        self.assertNoDrift()
+
+
+class TransferItemsTests(PaidStateTestCase):
+
+    def test_transfer_from_partly_paid_order(self):
+        source = self.create_order((self.soup, 2), (self.steak, 1))
+        target = self.create_order((self.steak, 2))
+        self.pay(source, self.soup, 1)
+        self.pay(source, self.steak, 1)
+        self.pay(target, self.steak, 1)
+
+        target = OrderService.transfer_items(source.pk, target.pk)
+
+        self.assertFalse(Order.objects.filter(pk=source.pk).exists())
+        lines = {item.menu_item_id: item for item in target.items.all()}
+        # Moved line: its payment was deleted with the source order
+        self.assertEqual((lines[self.soup.pk].quantity, lines[self.soup.pk].quantity_paid), (2, 0))
+        # Merged line: keeps only the target's own payment
+        self.assertEqual((lines[self.steak.pk].quantity, lines[self.steak.pk].quantity_paid), (3, 1))
+        self.assertEqual(target.amount_paid, Decimal('12.00'))
+        self.assertEqual(target.paymentStatus, 'PARTIALLY_PAID')
+        self.assertNoDrift()
+
+    def test_transfer_from_order_with_signed_invoice_is_refused(self):
+        source = self.create_order((self.soup, 2))
+        target = self.create_order((self.steak, 1))
+        FiscalService.sign_invoice(self.pay(source, self.soup, 1))
+
+        with self.assertRaises(ValueError):
+            OrderService.transfer_items(source.pk, target.pk)
+
+        # Nothing moved and the signed invoice is still there
+        self.assertEqual(source.items.get().quantity_paid, 1)
+        self.assertEqual(source.payments.filter(is_signed=True).count(), 1)
+        self.assertEqual(target.items.count(), 1)
+        self.assertNoDrift()
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.menu.models import MenuCategory, MenuItem
+from apps.orders.models import Order
+from apps.orders.services import OrderService, PrepQueueService
+
+
+class PrepQueueChangesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook')
+        kitchen = MenuCategory.objects.create(name='Pratos', prepared_in='1')
+        cls.soup = MenuItem.objects.create(name='Sopa', description='', price=Decimal('3.00'), categoryID=kitchen)
+        cls.steak = MenuItem.objects.create(name='Bife', description='', price=Decimal('12.00'), categoryID=kitchen)
+        cls.fish = MenuItem.objects.create(name='Peixe', description='', price=Decimal('10.00'), categoryID=kitchen)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # No settle window: every change is past the cursor as soon as it is made
+        patcher = mock.patch.object(PrepQueueService, 'SETTLE_TIME', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(self.order, [
+            {'menu_item': self.soup, 'quantity': 1},
+            {'menu_item': self.steak, 'quantity': 1},
+        ])
+        self.lines = {item.menu_item_id: item for item in self.order.items.all()}
+
+    def poll(self, **params):
+        response = self.client.get('/api/prep-queue/kitchen/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_changes_since_full_read(self):
+        full = self.poll()
+        self.assertEqual(len(full['items']), 2)
+
+        OrderService.update_item_status(self.lines[self.soup.pk], '4')
+        OrderService.apply_item_changes(self.order, [
+            {'menu_item': self.steak, 'quantity': 0},
+            {'menu_item': self.fish, 'quantity': 2},
+        ])
+        fish_line = self.order.items.get(menu_item=self.fish)
+
+        delta = self.poll(since=full['since'])
+        self.assertEqual(
+            [(item['id'], item['status']) for item in delta['items']],
+            [(self.lines[self.soup.pk].pk, '4'), (fish_line.pk, '1')]
+        )
+        self.assertNotIn('open_ids', delta)
+        self.assertFalse(delta['has_more'])
+
+        # Delivered and deleted lines are no longer open
+        self.assertEqual(self.poll(since=full['since'], open_ids='true')['open_ids'], [fish_line.pk])
+
+        self.assertEqual(self.poll(since=delta['since'])['items'], [])
+
+    def test_quantity_change_is_reported(self):
+        full = self.poll()
+        OrderService.apply_item_changes(self.order, [{'menu_item': self.steak, 'quantity': 3}])
+
+        delta = self.poll(since=full['since'])
+        self.assertEqual([(item['id'], item['quantity']) for item in delta['items']], [(self.lines[self.steak.pk].pk, 3)])
+
+    def test_changes_are_paged(self):
+        full = self.poll()
+        for line in self.lines.values():
+            OrderService.update_item_status(line, '2')
+
+        first = self.poll(since=full['since'], limit=1)
+        self.assertTrue(first['has_more'])
+        second = self.poll(since=first['since'], limit=1)
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            {first['items'][0]['id'], second['items'][0]['id']},
+            {line.pk for line in self.lines.values()}
+        )
+
+    def test_recent_changes_are_returned_again_until_settled(self):
+        full = self.poll()
+        OrderService.update_item_status(self.lines[self.soup.pk], '2')
+
+        with mock.patch.object(PrepQueueService, 'SETTLE_TIME', timedelta(minutes=1)):
+            delta = self.poll(since=full['since'])
+            again = self.poll(since=delta['since'])
+        self.assertEqual(delta['since'], full['since'])
+        self.assertEqual([item['id'] for item in again['items']], [self.lines[self.soup.pk].pk])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/prep-queue/kitchen/', {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
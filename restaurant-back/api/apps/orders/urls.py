@@ -9,6 +9,7 @@ from .views import (
     UpdateOrderItemsView,
     UpdateOrderItemStatusView,
     TransferOrderItemsView,
+    PrepQueueView,
     DeleteOrderView
 )
 
@@ -34,6 +35,9 @@ urlpatterns = [
     # Transfer items between orders
     path('order/transfer/', TransferOrderItemsView.as_view(), name='transfer-order-items'),
 
+    # Open items for a preparation station (kitchen/bar)
+    path('prep-queue/<str:station>/', PrepQueueView.as_view(), name='prep-queue'),
+
     # Delete order
     path('order/<int:pk>/delete/', DeleteOrderView.as_view(), name='delete-order'),
 ]
@@ -8,15 +8,47 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.http import Http404
 from django.contrib.contenttypes.models import ContentType
-from decimal import Decimal
 
 from .models import Order, OrderItem
 from .serializers import OrderSerializer, OrderItemSerializer
+from .services import OrderService, PrepQueueService
 from apps.common.permissions import IsManager
-from apps.menu.models import MenuItem
+from apps.common.filters import date_range_filter, parse_choice, parse_int
+from apps.common.pagination import KeysetPagination
+from apps.common.serializers import parse_fields_param
 from apps.audit.models import OperationLog
 
 
+def is_paginated_request(request):
+    """Keyset pagination is opt-in so existing clients keep receiving plain lists."""
+    return 'cursor' in request.query_params or 'page_size' in request.query_params
+
+
+def paginated_orders_response(request, queryset, fields=None):
+    """
+    Serialize one keyset page of orders, newest first.
+
+    Returns:
+        Response: {"results": [...], "next_cursor": str | null, "page_size": int}
+    """
+    paginator = KeysetPagination('created_at', 'orderID')
+    try:
+        page_size = paginator.get_page_size(request.query_params.get('page_size'))
+        orders, next_cursor = paginator.paginate(
+            queryset,
+            request.query_params.get('cursor'),
+            page_size
+        )
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'results': OrderSerializer(orders, many=True, fields=fields).data,
+        'next_cursor': next_cursor,
+        'page_size': page_size,
+    })
+
+
 class ListOrdersView(APIView):
     """
     List all orders.
@@ -25,9 +57,25 @@ class ListOrdersView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
     def get(self, request):
-        """Get all orders ordered by ID."""
-        orders = Order.objects.all().order_by('orderID')
-        serializer = OrderSerializer(orders, many=True)
+        """
+        Get all orders: a plain list ordered by ID, or keyset pages newest first.
+
+        Query parameters:
+        - fields: Comma-separated fields to return (e.g. orderID,status,items.id,items.status)
+        - cursor: Cursor returned by the previous page
+        - page_size: Orders per page (default: 50, max: 200)
+
+        Passing cursor or page_size switches to keyset pagination, ordered by
+        created_at then orderID, newest first.
+        """
+        fields = parse_fields_param(request.query_params.get('fields'))
+
+        if is_paginated_request(request):
+            queryset = OrderService.with_serialization_data(fields=fields)
+            return paginated_orders_response(request, queryset, fields)
+
+        orders = OrderService.with_serialization_data(Order.objects.order_by('orderID'), fields)
+        serializer = OrderSerializer(orders, many=True, fields=fields)
         return Response(serializer.data)
 
 
@@ -43,50 +91,67 @@ class OrderDetailView(APIView):
         Get order by ID or search orders by filters.
 
         Query parameters:
-        - customer: Filter by customer username
-        - status: Filter by order status
-        - payment_status: Filter by payment status
-        - order_type: Filter by order type
+        - customer: Filter by customer ID
+        - status: Filter by order status (e.g. PENDING)
+        - payment_status: Filter by payment status (e.g. PAID)
+        - order_type: Filter by order type (RESTAURANT or ONLINE)
         - table: Filter by table ID (excludes PAID orders)
-        - data: Filter by creation date
+        - data: Filter by creation date (YYYY-MM-DD)
+        - start_date / end_date: Filter by creation date range, both days included (YYYY-MM-DD)
+        - fields: Comma-separated fields to return (e.g. orderID,status,items.id,items.status)
+        - cursor / page_size: Keyset pagination, newest first (see ListOrdersView)
         """
+        fields = parse_fields_param(request.query_params.get('fields'))
+
         if pk:
             # Get specific order by ID
             try:
-                order = Order.objects.get(pk=pk)
-                serializer = OrderSerializer(order)
+                order = OrderService.get_for_serialization(pk, fields)
+                serializer = OrderSerializer(order, fields=fields)
                 return Response(serializer.data)
             except Order.DoesNotExist:
                 raise Http404("Order not found")
         else:
             # Search orders by filters
-            customer = request.query_params.get('customer')
-            order_status = request.query_params.get('status')
-            payment_status = request.query_params.get('payment_status')
-            order_type = request.query_params.get('order_type')
-            table = request.query_params.get('table')
-            data = request.query_params.get('data')
-
-            queryset = Order.objects.all()
-
-            if customer:
-                queryset = queryset.filter(customer__username__icontains=customer)
-            if order_status:
-                queryset = queryset.filter(status__icontains=order_status)
-            if payment_status:
-                queryset = queryset.filter(paymentStatus__icontains=payment_status)
-            if order_type:
-                queryset = queryset.filter(orderType__icontains=order_type)
-            if table:
-                queryset = queryset.filter(details__table__tableid=table)
-                queryset = queryset.exclude(paymentStatus='PAID')  # Exclude PAID orders when searching by table
-            if data:
-                queryset = queryset.filter(created_at__icontains=data)
-
-            if not queryset.exists():
+            params = request.query_params
+            queryset = OrderService.with_serialization_data(fields=fields)
+
+            try:
+                if params.get('customer'):
+                    queryset = queryset.filter(customer_id=parse_int(params['customer'], 'customer'))
+                if params.get('status'):
+                    queryset = queryset.filter(
+                        status=parse_choice(params['status'], Order.ORDER_STATUS_CHOICES, 'status')
+                    )
+                if params.get('payment_status'):
+                    queryset = queryset.filter(paymentStatus=parse_choice(
+                        params['payment_status'], Order.PAYMENT_STATUS_CHOICES, 'payment_status'
+                    ))
+                if params.get('order_type'):
+                    queryset = queryset.filter(
+                        orderType=parse_choice(params['order_type'], Order.ORDER_TYPE_CHOICES, 'order_type')
+                    )
+                if params.get('table'):
+                    queryset = queryset.filter(details__table_id=parse_int(params['table'], 'table'))
+                    queryset = queryset.exclude(paymentStatus='PAID')  # Exclude PAID orders when searching by table
+                queryset = queryset.filter(**date_range_filter(
+                    'created_at',
+                    on=params.get('data'),
+                    start=params.get('start_date'),
+                    end=params.get('end_date')
+                ))
+            except ValueError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if is_paginated_request(request):
+                return paginated_orders_response(request, queryset, fields)
+
+            # Evaluate once instead of running exists() and then the full query
+            orders = list(queryset)
+            if not orders:
                 raise Http404("No orders found matching the criteria")
 
-            serializer = OrderSerializer(queryset, many=True)
+            serializer = OrderSerializer(orders, many=True, fields=fields)
             return Response(serializer.data)
 
 
@@ -123,7 +188,10 @@ class CreateOrderView(APIView):
             if hasattr(request, 'body_data'):
                 request.body_data['object_id'] = order.orderID
 
-            return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+            return Response(
+                OrderSerializer(OrderService.get_for_serialization(order.pk)).data,
+                status=status.HTTP_201_CREATED
+            )
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -143,7 +211,10 @@ class UpdateOrderItemsView(APIView):
         serializer = OrderSerializer(order, data=request.data, partial=True)
         if serializer.is_valid():
             order = serializer.save(last_updated_by=request.user)
-            return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
+            return Response(
+                OrderSerializer(OrderService.get_for_serialization(order.pk)).data,
+                status=status.HTTP_200_OK
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, pk, *args, **kwargs):
@@ -163,42 +234,23 @@ class UpdateOrderItemsView(APIView):
         order = get_object_or_404(Order, pk=pk)
         order_items_data = request.data.get('items', [])
 
-        for item_data in order_items_data:
-            menu_item_id = item_data.get('menu_item')
-            quantity = item_data.get('quantity', 0)
-
-            if quantity > 0:
-                # Add or update item
-                order_item, created = OrderItem.objects.get_or_create(
-                    order=order,
-                    menu_item_id=menu_item_id,
-                    defaults={'quantity': quantity, 'price': MenuItem.objects.get(pk=menu_item_id).price}
-                )
-                if not created:
-                    order_item.quantity = quantity
-                    order_item.price = order_item.menu_item.price
-                    order_item.save()
-            else:
-                # Remove item
-                OrderItem.objects.filter(order=order, menu_item_id=menu_item_id).delete()
-
-        # Recalculate totals
-        total_amount = sum(item.menu_item.price * item.quantity for item in order.items.all())
-        iva_percentage = Decimal('0.15')  # 15% IVA
-        total_iva = total_amount * iva_percentage
-        grand_total = total_amount + total_iva
-
-        order.totalAmount = total_amount
-        order.totalIva = total_iva
-        order.grandTotal = grand_total
-
-        # Cancel order if no items remain
-        if order.totalAmount == 0:
-            order.status = 'CANCELLED'
+        if not isinstance(order_items_data, list):
+            return Response({
+                'detail': 'items must be a list.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        order.save()
+        # All line changes are applied in one transaction with bulk writes
+        try:
+            order = OrderService.apply_item_changes(order, order_items_data)
+        except ValueError as e:
+            return Response({
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
+        return Response(
+            OrderSerializer(OrderService.get_for_serialization(order.pk)).data,
+            status=status.HTTP_200_OK
+        )
 
 
 class TransferOrderItemsView(APIView):
@@ -228,41 +280,32 @@ class TransferOrderItemsView(APIView):
                 'detail': 'source_order_id and target_order_id are required.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        if str(source_order_id) == str(target_order_id):
+            return Response({
+                'detail': 'source_order_id and target_order_id must be different.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            source_order_id, target_order_id = int(source_order_id), int(target_order_id)
+        except (TypeError, ValueError):
+            return Response({
+                'detail': 'One or both orders do not exist.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Set-based merge under row locks on both orders; the source order is deleted
         try:
-            source_order = Order.objects.get(pk=source_order_id)
-            target_order = Order.objects.get(pk=target_order_id)
+            target_order = OrderService.transfer_items(source_order_id, target_order_id)
         except Order.DoesNotExist:
             return Response({
                 'detail': 'One or both orders do not exist.'
             }, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            # The source order has signed invoices
+            return Response({
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Transfer items and merge quantities
-        for item in source_order.items.all():
-            existing_item = target_order.items.filter(menu_item=item.menu_item).first()
-            if existing_item:
-                # Merge quantities if item already exists in target
-                existing_item.quantity += item.quantity
-                existing_item.save()
-            else:
-                # Move item to target order
-                item.order = target_order
-                item.save()
-
-        # Delete source order
-        source_order.delete()
-
-        # Recalculate totals for target order
-        total_amount = sum(item.menu_item.price * item.quantity for item in target_order.items.all())
-        iva_percentage = Decimal('0.15')  # 15% IVA
-        total_iva = total_amount * iva_percentage
-        grand_total = total_amount + total_iva
-
-        target_order.totalAmount = total_amount
-        target_order.totalIva = total_iva
-        target_order.grandTotal = grand_total
-        target_order.save()
-
-        serializer = OrderSerializer(target_order)
+        serializer = OrderSerializer(OrderService.get_for_serialization(target_order.pk))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -287,8 +330,11 @@ class UpdateOrderItemStatusView(APIView):
         - 2: Preparing
         - 3: Ready
         - 4: Delivered/Cancelled
+
+        Query parameters:
+        - compact: When true, return only the item and order status instead of the full order
         """
-        order_item = get_object_or_404(OrderItem, pk=pk)
+        order_item = get_object_or_404(OrderItem.objects.only('id', 'order_id', 'status'), pk=pk)
         new_status = request.data.get('status')
 
         if not new_status:
@@ -301,37 +347,18 @@ class UpdateOrderItemStatusView(APIView):
                 'detail': 'Invalid status value. Must be 1, 2, 3, or 4.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update status
-        order_item.status = new_status
-        order_item.save()
-
-        # Auto-update order status based on all item statuses
-        order = order_item.order
-        all_items = order.items.all()
-
-        if all_items.exists():
-            item_statuses = set(all_items.values_list('status', flat=True))
-
-            # If all items are delivered (status '4'), mark order as DELIVERED
-            if item_statuses == {'4'}:
-                order.status = 'DELIVERED'
-            # If all items are ready (status '3'), mark order as READY
-            elif item_statuses == {'3'}:
-                order.status = 'READY'
-            # If any item is preparing (status '2'), mark order as PREPARING
-            elif '2' in item_statuses:
-                order.status = 'PREPARING'
-            # If all items are pending (status '1'), mark order as PENDING
-            elif item_statuses == {'1'}:
-                order.status = 'PENDING'
-            # Mixed statuses with no '2' - set to PREPARING to indicate work in progress
-            else:
-                order.status = 'PREPARING'
-
-            order.save()
+        # Update the item and auto-update the order status from all item statuses
+        order_status = OrderService.update_item_status(order_item, new_status)
+
+        if request.query_params.get('compact', '').lower() in ('1', 'true', 'yes'):
+            return Response({
+                'detail': 'Order item status updated successfully.',
+                'item': {'id': order_item.pk, 'status': order_item.status},
+                'order': {'orderID': order_item.order_id, 'status': order_status},
+            }, status=status.HTTP_200_OK)
 
         # Return the full order with updated items
-        serializer = OrderSerializer(order)
+        serializer = OrderSerializer(OrderService.get_for_serialization(order_item.order_id))
 
         return Response({
             'detail': 'Order item status updated successfully.',
@@ -339,6 +366,63 @@ class UpdateOrderItemStatusView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class PrepQueueView(APIView):
+    """
+    Open order items for a preparation station (kitchen or bar screen).
+    Requires: authentication
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, station, *args, **kwargs):
+        """
+        Get the items still to be delivered for a station, oldest first.
+
+        Query parameters:
+        - since: Cursor from the previous response; returns only what changed since
+        - open_ids: With since, "true" also returns the IDs of all open items
+        - after_id: Only return items created after this item ID (poll for new tickets)
+        - limit: Maximum number of items (default: 200, max: 500)
+
+        Items prepared in "Both" are included in the kitchen and the bar queues.
+        A full read returns a since cursor. Polling with it returns the items
+        added or changed since (delivered ones with status "4") and the next
+        cursor; has_more means another poll right away returns the rest.
+        Lines deleted from an order are not reported as changes: poll with
+        open_ids=true every so often and drop any item not in open_ids.
+        """
+        since = request.query_params.get('since')
+        after_id = request.query_params.get('after_id')
+        try:
+            if since:
+                return Response({
+                    'station': PrepQueueService.station_code(station),
+                    **PrepQueueService.changes(
+                        station,
+                        since,
+                        limit=request.query_params.get('limit'),
+                        include_open_ids=request.query_params.get('open_ids', '').lower() == 'true'
+                    ),
+                })
+
+            # Taken before the read, so nothing changed during it is skipped
+            start_cursor = PrepQueueService.start_cursor()
+            items = PrepQueueService.open_items(
+                station,
+                after_id=after_id,
+                limit=request.query_params.get('limit')
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        last_id = items[-1]['id'] if items else (int(after_id) if after_id else None)
+        return Response({
+            'station': PrepQueueService.station_code(station),
+            'items': items,
+            'last_id': last_id,
+            'since': start_cursor,
+        })
+
+
 class DeleteOrderView(APIView):
     """
     Delete an order.
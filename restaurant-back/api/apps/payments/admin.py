@@ -2,9 +2,12 @@
 Payment Processing Admin Interface
 """
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.db.models import Sum, Count
-from .models import Payment
+from apps.orders.models import Order
+from apps.orders.services import PaidStateService
+from .models import EFaturaSubmission, FiscalChain, FiscalSequence, Payment, SAFTExportJob
 
 
 @admin.register(Payment)
@@ -128,15 +131,28 @@ class PaymentAdmin(admin.ModelAdmin):
 
     actions = ['mark_as_completed', 'mark_as_failed']
 
+    def save_model(self, request, obj, form, change):
+        """Save the payment, then update its order's payment status."""
+        super().save_model(request, obj, form, change)
+        obj.order.update_payment_status()
+
+    def _refresh_orders(self, queryset):
+        """Bring the paid state of the affected orders in line after a bulk update."""
+        order_ids = list(queryset.values_list('order_id', flat=True).distinct())
+        PaidStateService.rebuild(Order.objects.filter(pk__in=order_ids))
+        PaidStateService.refresh_payment_status(order_ids)
+
     def mark_as_completed(self, request, queryset):
         """Mark selected payments as completed."""
         updated = queryset.update(payment_status='COMPLETED')
+        self._refresh_orders(queryset)
         self.message_user(request, f'{updated} payment(s) marked as completed.')
     mark_as_completed.short_description = "Mark as Completed"
 
     def mark_as_failed(self, request, queryset):
         """Mark selected payments as failed."""
         updated = queryset.update(payment_status='FAILED')
+        self._refresh_orders(queryset)
         self.message_user(request, f'{updated} payment(s) marked as failed.')
     mark_as_failed.short_description = "Mark as Failed"
 
@@ -177,3 +193,76 @@ class PaymentAdmin(admin.ModelAdmin):
         extra_context['status_totals'] = status_totals
 
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(FiscalSequence)
+class FiscalSequenceAdmin(admin.ModelAdmin):
+    """Read-only view of the invoice numbering sequences (advanced only by signing)."""
+
+    list_display = ['invoice_type', 'series', 'year', 'last_number', 'updated_at']
+    list_filter = ['invoice_type', 'year']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FiscalChain)
+class FiscalChainAdmin(admin.ModelAdmin):
+    """Read-only view of the hash chain heads (advanced only by signing)."""
+
+    list_display = ['invoice_type', 'last_hash', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SAFTExportJob)
+class SAFTExportJobAdmin(admin.ModelAdmin):
+    """Read-only view of background SAF-T exports."""
+
+    list_display = ['jobID', 'start_date', 'end_date', 'compress', 'status', 'rows_done', 'rows_total', 'created_at']
+    list_filter = ['status', 'compress']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EFaturaSubmission)
+class EFaturaSubmissionAdmin(admin.ModelAdmin):
+    """e-Fatura outbox: submission status per invoice, with manual retry."""
+
+    list_display = ['submissionID', 'payment', 'status', 'attempts', 'next_attempt_at', 'receipt', 'submitted_at']
+    list_filter = ['status']
+    search_fields = ['payment__invoice_no', 'receipt']
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def retry_now(self, request, queryset):
+        """Queue the selected failed/pending submissions for an immediate attempt."""
+        updated = queryset.filter(status__in=['PENDING', 'FAILED']).update(
+            status='PENDING',
+            attempts=0,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} submission(s) queued.')
+    retry_now.short_description = "Retry now"
@@ -0,0 +1,313 @@
+"""
+Benchmark e-Fatura XML rendering against the former ElementTree/minidom path.
+
+ReferenceRenderer is that former implementation. It only lives here, as the
+baseline EFaturaService.render_xml() must match byte for byte (checked by
+this command and by apps.payments.tests.test_efatura).
+"""
+import time
+from datetime import datetime
+from decimal import Decimal
+from xml.dom import minidom
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.models import Payment
+from apps.payments.services import efatura_service
+from apps.payments.services.efatura_service import EFaturaService
+
+
+class ReferenceRenderer:
+    """
+    e-Fatura XML built with ElementTree and pretty-printed by minidom.
+    """
+
+    def __init__(self, service: EFaturaService):
+        self.service = service
+        self.payment = service.payment
+        self.order = service.order
+        self.company = service.company
+
+    def render(self) -> str:
+        """
+        Generate the XML with ElementTree and minidom.
+
+        Returns:
+            str: XML string (UTF-8)
+        """
+        # Root element
+        dfe = Element('Dfe')
+        dfe.set('xmlns', 'urn:cv:efatura:xsd:v1.0')
+        dfe.set('Version', '1.0')
+        dfe.set('Id', self.service.generate_iud())
+        dfe.set('DocumentTypeCode', EFaturaService.DOCUMENT_TYPE_CODES.get(self.payment.invoice_type, '1'))
+        dfe.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
+        dfe.set('xsi:schemaLocation', 'urn:cv:efatura:xsd:v1.0 common/CV_EFatura_Invoice_v1.0.xsd')
+
+        # Specimen mode (test mode)
+        SubElement(dfe, 'IsSpecimen').text = 'true' if not efatura_service.DNRE_API_ENABLED else 'false'
+
+        # Invoice element
+        invoice = SubElement(dfe, 'Invoice')
+
+        # Document identification
+        SubElement(invoice, 'LedCode').text = '1'  # Ledger code (1 = normal)
+
+        # Extract serie from invoice_no
+        serie, doc_number = self.service._serie_and_number()
+
+        SubElement(invoice, 'Serie').text = serie
+        SubElement(invoice, 'DocumentNumber').text = doc_number
+
+        # Dates
+        issue_date = self.payment.invoice_date or datetime.now().date()
+        SubElement(invoice, 'IssueDate').text = issue_date.strftime('%Y-%m-%d')
+        SubElement(invoice, 'IssueTime').text = self.payment.created_at.strftime('%H:%M:%S')
+
+        # Due date (same as issue for immediate payment)
+        SubElement(invoice, 'DueDate').text = issue_date.strftime('%Y-%m-%d')
+
+        # Tax point date
+        SubElement(invoice, 'TaxPointDate').text = issue_date.strftime('%Y-%m-%d')
+
+        # Emitter (Company)
+        self._add_emitter_party(invoice)
+
+        # Receiver (Customer)
+        self._add_receiver_party(invoice)
+
+        # Lines (Order items)
+        self._add_lines(invoice)
+
+        # Totals
+        self._add_totals(invoice)
+
+        # Payments
+        self._add_payments(invoice)
+
+        # Software info
+        self._add_software(invoice)
+
+        # Convert to pretty XML string
+        return self._prettify_xml(dfe)
+
+    def _add_emitter_party(self, parent: Element):
+        """Add EmitterParty (company info)"""
+        emitter = SubElement(parent, 'EmitterParty')
+
+        # Tax ID
+        tax_id = SubElement(emitter, 'TaxId')
+        tax_id.set('CountryCode', 'CV')
+        tax_id.text = self.company.tax_registration_number
+
+        # Name
+        SubElement(emitter, 'Name').text = self.company.company_name
+
+        # Address
+        address = SubElement(emitter, 'Address')
+        address.set('CountryCode', 'CV')
+
+        # Address detail (concatenate street and number)
+        address_detail = f"{self.company.street_name}"
+        if self.company.building_number:
+            address_detail += f", {self.company.building_number}"
+        address_detail += f", {self.company.city}, {self.company.postal_code}"
+
+        SubElement(address, 'AddressDetail').text = address_detail
+        SubElement(address, 'AddressCode').text = f"CV{self.company.postal_code.replace('-', '')}"
+
+        # Contacts
+        contacts = SubElement(emitter, 'Contacts')
+        SubElement(contacts, 'Telephone').text = self.company.telephone
+        if self.company.email:
+            SubElement(contacts, 'Email').text = self.company.email
+        if self.company.website:
+            SubElement(contacts, 'Website').text = self.company.website
+
+    def _add_receiver_party(self, parent: Element):
+        """Add ReceiverParty (customer info)"""
+        receiver = SubElement(parent, 'ReceiverParty')
+
+        # Customer info
+        if self.payment.customer_tax_id and self.payment.customer_name:
+            # Real customer
+            tax_id = SubElement(receiver, 'TaxId')
+            tax_id.set('CountryCode', 'CV')
+            tax_id.text = self.payment.customer_tax_id
+            SubElement(receiver, 'Name').text = self.payment.customer_name
+        else:
+            # Consumidor Final
+            tax_id = SubElement(receiver, 'TaxId')
+            tax_id.set('CountryCode', 'CV')
+            tax_id.text = '999999999'
+            SubElement(receiver, 'Name').text = 'Consumidor Final'
+
+        # Address (minimal for consumer)
+        address = SubElement(receiver, 'Address')
+        address.set('CountryCode', 'CV')
+        SubElement(address, 'AddressDetail').text = 'N/A'
+        SubElement(address, 'AddressCode').text = 'CV0000000000'
+
+        # Contacts (minimal)
+        contacts = SubElement(receiver, 'Contacts')
+        SubElement(contacts, 'Telephone').text = 'N/A'
+
+    def _add_lines(self, parent: Element):
+        """Add Lines (order items)"""
+        lines = SubElement(parent, 'Lines')
+
+        for idx, item in enumerate(self.service._order_items(), start=1):
+            line = SubElement(lines, 'Line')
+            line.set('LineTypeCode', 'N')  # N = Normal line
+
+            # Line ID
+            SubElement(line, 'Id').text = str(idx)
+
+            # Quantity
+            quantity = SubElement(line, 'Quantity')
+            quantity.set('UnitCode', 'EA')  # EA = Each (standard unit code)
+            quantity.set('IsStandardUnitCode', 'true')
+            quantity.text = str(item.quantity)
+
+            # Price (unit price)
+            SubElement(line, 'Price').text = f"{float(item.price):.2f}"
+
+            # Price Extension (quantity * price) - Keep as Decimal for calculations
+            price_extension = item.price * item.quantity
+            SubElement(line, 'PriceExtension').text = f"{float(price_extension):.2f}"
+
+            # Discount (0 for now - TODO: implement discounts)
+            SubElement(line, 'Discount').text = '0'
+
+            # Net Total (price extension - discount)
+            SubElement(line, 'NetTotal').text = f"{float(price_extension):.2f}"
+
+            # Tax (IVA 15%)
+            tax = SubElement(line, 'Tax')
+            tax.set('TaxTypeCode', 'IVA')
+            SubElement(tax, 'TaxPercentage').text = '15.00'
+
+            # Calculate tax amount (keep as Decimal)
+            tax_amount = price_extension * Decimal('0.15')
+            SubElement(tax, 'TaxTotal').text = f"{float(tax_amount):.2f}"
+
+            # Item description
+            item_elem = SubElement(line, 'Item')
+            SubElement(item_elem, 'Description').text = item.menu_item.name
+            SubElement(item_elem, 'EmitterIdentification').text = str(item.menu_item.itemID)
+            SubElement(item_elem, 'HazardousRiskIndicator').text = 'false'
+
+    def _add_totals(self, parent: Element):
+        """Add Totals section (conforme SAF-T CV spec)"""
+        totals = SubElement(parent, 'Totals')
+
+        # Price Extension Total (sum of all line extensions before discount/tax)
+        SubElement(totals, 'PriceExtensionTotalAmount').text = f"{float(self.order.totalAmount):.2f}"
+
+        # Charge Total (encargos adicionais - 0 por defeito)
+        SubElement(totals, 'ChargeTotalAmount').text = '0.00'
+
+        # Discount Total (descontos - 0 por defeito)
+        SubElement(totals, 'DiscountTotalAmount').text = '0.00'
+
+        # Net Total (subtotal sem impostos, após descontos)
+        SubElement(totals, 'NetTotalAmount').text = f"{float(self.order.totalAmount):.2f}"
+
+        # Tax Total (IVA total)
+        SubElement(totals, 'TaxTotalAmount').text = f"{float(self.order.totalIva):.2f}"
+
+        # Payable Amount (total a pagar = net + tax)
+        SubElement(totals, 'PayableAmount').text = f"{float(self.order.grandTotal):.2f}"
+
+    def _add_payments(self, parent: Element):
+        """Add Payments section"""
+        payments = SubElement(parent, 'Payments')
+
+        payment_elem = SubElement(payments, 'Payment')
+
+        # Payment means code (conforme UNECE PaymentMeansCode)
+        means_code = EFaturaService.PAYMENT_MEANS_CODES.get(self.payment.payment_method, '10')
+        SubElement(payment_elem, 'PaymentMeansCode').text = means_code
+
+        # Payment reference (use payment ID)
+        SubElement(payment_elem, 'PaymentReference').text = str(self.payment.paymentID)
+
+        # Payment date (use created_at date)
+        payment_date = self.payment.created_at.date()
+        SubElement(payment_elem, 'PaymentDate').text = payment_date.strftime('%Y-%m-%d')
+
+        # Payment amount
+        SubElement(payment_elem, 'PaymentAmount').text = f"{float(self.payment.amount):.2f}"
+
+    def _add_software(self, parent: Element):
+        """Add Software information"""
+        software = SubElement(parent, 'Software')
+        SubElement(software, 'Code').text = self.company.software_certificate_number
+        SubElement(software, 'Name').text = 'Restaurant ERP'
+        SubElement(software, 'Version').text = self.company.software_version
+
+    def _prettify_xml(self, elem: Element) -> str:
+        """Return a pretty-printed XML string"""
+        rough_string = tostring(elem, encoding='utf-8')
+        reparsed = minidom.parseString(rough_string)
+        return reparsed.toprettyxml(indent="  ", encoding='UTF-8').decode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Compare e-Fatura XML rendering speed (render_xml vs the ElementTree/minidom reference)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invoices',
+            type=int,
+            default=50,
+            help='Number of signed invoices to render (most recent first)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Times each invoice is rendered per path'
+        )
+
+    def _time(self, render, services, repeat):
+        """Seconds per document for one rendering path."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for service in services:
+                render(service)
+        return (time.perf_counter() - start) / (repeat * len(services))
+
+    def handle(self, *args, **options):
+        payments = list(
+            Payment.objects.filter(is_signed=True)
+            .select_related('order')
+            .order_by('-paymentID')[:options['invoices']]
+        )
+        if not payments:
+            raise CommandError('No signed invoices to render.')
+
+        services = [EFaturaService(payment) for payment in payments]
+        # Lines are read once up front, so both paths time rendering only
+        for service in services:
+            items = list(service._order_items())
+            service._order_items = lambda items=items: items
+
+        mismatches = [
+            service.payment.invoice_no
+            for service in services
+            if service.render_xml() != ReferenceRenderer(service).render().encode('utf-8')
+        ]
+
+        reference = self._time(lambda service: ReferenceRenderer(service).render(), services, options['repeat'])
+        fast = self._time(EFaturaService.render_xml, services, options['repeat'])
+
+        self.stdout.write(f"Invoices: {len(services)}, {options['repeat']} renders each")
+        self.stdout.write(f"ElementTree + minidom: {reference * 1000:.3f} ms/document")
+        self.stdout.write(f"render_xml:            {fast * 1000:.3f} ms/document")
+        self.stdout.write(f"Speed-up:              {reference / fast:.1f}x")
+
+        if mismatches:
+            raise CommandError(f"Output differs for {len(mismatches)} invoice(s), e.g. {mismatches[0]}")
+        self.stdout.write(self.style.SUCCESS('Output is byte-identical.'))
@@ -0,0 +1,55 @@
+"""
+Export a SAF-T CV file for a date range to disk.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.services.saft_export_service import SAFTExportService
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date: {value}. Use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Export SAF-T CV (XML) for a date range to a file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start_date', help='Start date (YYYY-MM-DD)')
+        parser.add_argument('end_date', help='End date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--output',
+            help='Output file path (default: SAFT-CV_<start>_<end>.xml[.gz])'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Write a gzipped file'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Worker processes rendering invoices month by month (default: 0, serial)'
+        )
+
+    def handle(self, *args, **options):
+        start_date = _parse_date(options['start_date'])
+        end_date = _parse_date(options['end_date'])
+        if start_date > end_date:
+            raise CommandError('start_date must be before or equal to end_date')
+
+        file_path = options['output'] or f"SAFT-CV_{start_date}_{end_date}.xml{'.gz' if options['gzip'] else ''}"
+
+        SAFTExportService.export_to_file(
+            start_date,
+            end_date,
+            file_path,
+            compress=options['gzip'],
+            workers=options['workers']
+        )
+        self.stdout.write(self.style.SUCCESS(f'SAF-T exported to {file_path}'))
@@ -0,0 +1,84 @@
+"""
+Local stand-in for the DNRE e-Fatura API, for development and tests.
+
+Point EFATURA_DNRE_URL at it (e.g. http://127.0.0.1:8099) and run the
+process_efatura_queue worker against it.
+"""
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.etree.ElementTree import ParseError, fromstring
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.dnre_client import SUBMIT_PATH
+
+
+class Command(BaseCommand):
+    help = 'Run a fake DNRE e-Fatura API server (accepts submissions and returns receipts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.0,
+            help='Seconds to wait before answering each request'
+        )
+        parser.add_argument(
+            '--fail-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 503 (exercises retries)'
+        )
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+        fail_rate = options['fail_rate']
+        # Receipts by IUD: a resent document gets its original receipt back
+        receipts = {}
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != SUBMIT_PATH:
+                    return self._reply(404, {'error': 'Not found'})
+
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if latency:
+                    time.sleep(latency)
+                if random.random() < fail_rate:
+                    return self._reply(503, {'error': 'Service unavailable'})
+
+                try:
+                    iud = fromstring(body).get('Id')
+                except ParseError as e:
+                    return self._reply(400, {'error': f'Invalid XML: {e}'})
+                if not iud:
+                    return self._reply(400, {'error': 'Missing document Id (IUD)'})
+
+                receipt = receipts.setdefault(iud, f'DNRE-{uuid.uuid4().hex[:16].upper()}')
+                self._reply(200, {'status': 'ACCEPTED', 'iud': iud, 'receipt': receipt})
+
+            def log_message(self, format, *args):
+                stdout.write(f"{self.address_string()} {format % args}")
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"Fake DNRE listening on http://{options['host']}:{options['port']}{SUBMIT_PATH}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,60 @@
+"""
+Worker: submit queued e-Fatura documents to DNRE.
+
+Run one or more of these next to the web server; each claims its own
+batches (SKIP LOCKED), so workers can be added for more throughput.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.payments.services.efatura_submission_service import EFaturaSubmissionService
+
+
+class Command(BaseCommand):
+    help = 'Submit queued e-Fatura documents to DNRE (outbox worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=EFaturaSubmissionService.BATCH_SIZE,
+            help='Submissions claimed per batch'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=EFaturaSubmissionService.CONCURRENCY,
+            help='Submissions sent to DNRE at the same time'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the due submissions and exit'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            stats = EFaturaSubmissionService.process_batch(
+                batch_size=options['batch_size'],
+                concurrency=options['concurrency']
+            )
+
+            if stats['claimed']:
+                self.stdout.write(
+                    f"Claimed {stats['claimed']}: {stats['submitted']} submitted, {stats['failed']} failed, "
+                    f"{stats['expired']} lease(s) expired"
+                )
+                continue
+
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,47 @@
+"""
+Validate stored e-Fatura XML documents against the DNRE XSD schemas.
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.services.efatura_storage import EFATURA_STORAGE_DIR
+from apps.payments.services.efatura_validator import EFATURA_XSD_DIR, EFaturaValidator
+
+
+class Command(BaseCommand):
+    help = 'Validate e-Fatura XML files against the DNRE XSD schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'directory',
+            nargs='?',
+            default=EFATURA_STORAGE_DIR,
+            help='Directory with the XML files (default: EFATURA_STORAGE_DIR)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Worker processes (default: 0, validate in this process)'
+        )
+
+    def handle(self, *args, **options):
+        if not EFaturaValidator.is_available():
+            raise CommandError(f'XSD validation unavailable: install lxml and check EFATURA_XSD_DIR ({EFATURA_XSD_DIR})')
+        if not os.path.isdir(options['directory']):
+            raise CommandError(f"Directory not found: {options['directory']}")
+
+        checked = invalid = 0
+        for path, errors in EFaturaValidator.validate_directory(options['directory'], options['workers']):
+            checked += 1
+            if errors:
+                invalid += 1
+                self.stdout.write(self.style.ERROR(f'{path}: {len(errors)} error(s)'))
+                for error in errors:
+                    self.stdout.write(f'  {error}')
+
+        self.stdout.write(f'Documents checked: {checked}, invalid: {invalid}')
+        if invalid:
+            raise CommandError(f'{invalid} document(s) do not conform to the XSD')
+        self.stdout.write(self.style.SUCCESS('All documents are valid.'))
@@ -0,0 +1,55 @@
+"""
+Audit job: verify the full invoice hash chain of each document type.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.models import Payment
+from apps.payments.services.hash_chain_service import HashChainService
+
+
+class Command(BaseCommand):
+    help = 'Verify the SAF-T CV hash chain (hashes and links) of signed invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'invoice_types',
+            nargs='*',
+            choices=[code for code, _ in Payment.INVOICE_TYPE_CHOICES],
+            help='Document types to verify (default: all types with signed invoices)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=HashChainService.DEFAULT_CHUNK_SIZE,
+            help='Rows fetched and hashed per batch'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Worker processes for recomputing hashes (default: 0, hash in this process)'
+        )
+
+    def handle(self, *args, **options):
+        result = HashChainService.verify_chain(
+            invoice_types=options['invoice_types'] or None,
+            chunk_size=options['chunk_size'],
+            workers=options['workers']
+        )
+
+        for chain in result['chains']:
+            self.stdout.write(
+                f"{chain['invoice_type']}: {chain['invoices']} invoice(s) "
+                f"({chain['first_invoice_no']} .. {chain['last_invoice_no']}), "
+                f"{chain['hash_mismatches']} hash mismatch(es), {chain['broken_links']} broken link(s)"
+            )
+            broken = chain['first_broken']
+            if broken:
+                self.stdout.write(
+                    f"  First broken link: payment {broken['paymentID']} ({broken['invoice_no']}), "
+                    f"position {broken['position']}: {broken['reason']}"
+                )
+
+        if not result['is_valid']:
+            raise CommandError('Hash chain verification failed.')
+        self.stdout.write(self.style.SUCCESS('Hash chain is intact.'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0006_payment_customer"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
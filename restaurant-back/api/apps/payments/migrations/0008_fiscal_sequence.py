@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0007_payment_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FiscalSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("series", models.CharField(max_length=20)),
+                ("year", models.PositiveIntegerField()),
+                (
+                    "invoice_type",
+                    models.CharField(
+                        choices=[
+                            ("FT", "Fatura"),
+                            ("NC", "Nota de Crédito"),
+                            ("TV", "Talão de Venda"),
+                            ("FR", "Fatura Recibo"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("last_number", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Fiscal Sequence",
+                "verbose_name_plural": "Fiscal Sequences",
+                "db_table": "apps_fiscal_sequence",
+                "unique_together": {("series", "year", "invoice_type")},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:36
+
+from django.db import migrations, models
+
+
+def seed_chain_heads(apps, schema_editor):
+    """Point existing sequences at the last signed invoice of their document type."""
+    FiscalSequence = apps.get_model("payments", "FiscalSequence")
+    Payment = apps.get_model("payments", "Payment")
+
+    for invoice_type in FiscalSequence.objects.values_list(
+        "invoice_type", flat=True
+    ).distinct():
+        last_hash = (
+            Payment.objects.filter(
+                invoice_type=invoice_type, is_signed=True, invoice_hash__isnull=False
+            )
+            .order_by("-invoice_date", "-paymentID")
+            .values_list("invoice_hash", flat=True)
+            .first()
+        )
+        FiscalSequence.objects.filter(invoice_type=invoice_type).update(
+            last_hash=last_hash or ""
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0008_fiscal_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fiscalsequence",
+            name="last_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.RunPython(seed_chain_heads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cash_register", "0004_alter_cashregister_table"),
+        ("customers", "0001_initial"),
+        ("orders", "0008_order_search_indexes"),
+        ("payments", "0009_fiscal_sequence_last_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(("is_signed", True)),
+                fields=["invoice_type", "signed_at", "paymentID"],
+                name="payment_chain_order_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0011_saft_export_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EFaturaSubmission",
+            fields=[
+                ("submissionID", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("PROCESSING", "Processing"),
+                            ("SUBMITTED", "Submitted"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("receipt", models.CharField(blank=True, default="", max_length=100)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("submitted_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "payment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="efatura_submission",
+                        to="payments.payment",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "e-Fatura Submission",
+                "verbose_name_plural": "e-Fatura Submissions",
+                "db_table": "apps_efatura_submission",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"], name="efatura_queue_idx"
+                    )
+                ],
+            },
+        ),
+    ]
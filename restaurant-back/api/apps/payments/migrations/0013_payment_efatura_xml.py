@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0012_efatura_submission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="efatura_xml_path",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Caminho relativo a EFATURA_STORAGE_DIR",
+                max_length=255,
+                verbose_name="Ficheiro XML e-Fatura",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="efatura_xml_sha256",
+            field=models.CharField(
+                blank=True,
+                default="",
+                max_length=64,
+                verbose_name="SHA-256 do XML e-Fatura",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-16 18:16
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seed_chain_heads(apps, schema_editor):
+    """One chain head per document type: the hash of its last signed invoice, in chain order."""
+    FiscalChain = apps.get_model("payments", "FiscalChain")
+    Payment = apps.get_model("payments", "Payment")
+
+    signed = Payment.objects.filter(is_signed=True, invoice_hash__isnull=False)
+    for invoice_type in signed.order_by().values_list("invoice_type", flat=True).distinct():
+        last_hash = (
+            signed.filter(invoice_type=invoice_type)
+            .order_by(F("signed_at").desc(nulls_last=True), "-paymentID")
+            .values_list("invoice_hash", flat=True)
+            .first()
+        )
+        FiscalChain.objects.create(invoice_type=invoice_type, last_hash=last_hash or "")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0013_payment_efatura_xml"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FiscalChain",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "invoice_type",
+                    models.CharField(
+                        choices=[
+                            ("FT", "Fatura"),
+                            ("NC", "Nota de Crédito"),
+                            ("TV", "Talão de Venda"),
+                            ("FR", "Fatura Recibo"),
+                        ],
+                        max_length=2,
+                        unique=True,
+                    ),
+                ),
+                ("last_hash", models.CharField(blank=True, default="", max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Fiscal Chain",
+                "verbose_name_plural": "Fiscal Chains",
+                "db_table": "apps_fiscal_chain",
+            },
+        ),
+        migrations.RunPython(seed_chain_heads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="fiscalsequence",
+            name="last_hash",
+        ),
+    ]
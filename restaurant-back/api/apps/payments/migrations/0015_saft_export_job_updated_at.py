@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0014_fiscal_chain"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="saftexportjob",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
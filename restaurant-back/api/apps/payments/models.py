@@ -4,6 +4,7 @@ Payment Processing Models
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from apps.customers.models import Customer
 
 
@@ -48,6 +49,8 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='PENDING')
     transaction_id = models.CharField(max_length=255, blank=True, null=True)
+    # Client-supplied key so retried payment requests are not charged twice
+    idempotency_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     cash_register = models.ForeignKey(
@@ -137,6 +140,21 @@ class Payment(models.Model):
         verbose_name="Data de Assinatura"
     )
 
+    # Stored e-Fatura XML (see EFaturaStorage); written once, after signing
+    efatura_xml_path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name="Ficheiro XML e-Fatura",
+        help_text="Caminho relativo a EFATURA_STORAGE_DIR"
+    )
+    efatura_xml_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name="SHA-256 do XML e-Fatura"
+    )
+
     # Customer Info (for SAF-T Customer table)
     # ForeignKey to Customer model (nullable for anonymous sales)
     customer = models.ForeignKey(
@@ -190,9 +208,9 @@ class Payment(models.Model):
         """Validate model constraints."""
         super().clean()
 
-        # Validate Credit Note requirements
+        # Validate Credit Note requirements (by ID, so non-NC documents never load the reference)
         if self.invoice_type == 'NC':
-            if not self.referenced_document:
+            if not self.referenced_document_id:
                 raise ValidationError({
                     'referenced_document': 'Credit Notes must reference an original document'
                 })
@@ -206,37 +224,114 @@ class Payment(models.Model):
                 })
         else:
             # Non-NC documents should not have these fields set
-            if self.referenced_document:
+            if self.referenced_document_id:
                 raise ValidationError({
                     'referenced_document': 'Only Credit Notes can reference documents'
                 })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the persisted order/amount/status so saves can update the paid state."""
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if {'order_id', 'amount', 'payment_status'} <= loaded.keys():
+            instance._loaded_paid_state = (
+                loaded['order_id'],
+                loaded['amount'],
+                loaded['payment_status'] == 'COMPLETED',
+            )
+        return instance
+
+    def _order_ref(self):
+        """The cached Order instance (so it is refreshed in place) or just its ID."""
+        return self.order if Payment.order.is_cached(self) else self.order_id
+
+    def _paid_items_deltas(self, sign):
+        """quantity_paid deltas for all items of this payment."""
+        deltas = {}
+        for order_item_id, quantity in self.paid_items.values_list('order_item_id', 'quantity_paid'):
+            deltas[order_item_id] = deltas.get(order_item_id, 0) + sign * quantity
+        return deltas
+
+    def _apply_paid_state(self, previous):
+        """
+        Propagate this payment's change to Order.amount_paid and, when its
+        completed state flips, to the quantity_paid of the items it covers.
+        """
+        from apps.orders.services import PaidStateService
+
+        completed = self.payment_status == 'COMPLETED'
+        contribution = self.amount if completed else 0
+
+        if previous is None:
+            PaidStateService.apply_amount_delta(self._order_ref(), contribution)
+            return
+
+        previous_order_id, previous_amount, previous_completed = previous
+        previous_contribution = previous_amount if previous_completed else 0
+
+        if previous_order_id != self.order_id:
+            PaidStateService.apply_amount_delta(previous_order_id, -previous_contribution)
+            PaidStateService.apply_amount_delta(self._order_ref(), contribution)
+        else:
+            PaidStateService.apply_amount_delta(self._order_ref(), contribution - previous_contribution)
+
+        if completed != previous_completed:
+            PaidStateService.apply_quantity_deltas(self._paid_items_deltas(1 if completed else -1))
+
+    # Foreign keys are enforced by the database; validating them would cost a query each
+    UNVALIDATED_FIELDS = ['order', 'cash_register', 'processed_by', 'customer', 'referenced_document']
+
+    IMMUTABLE_MESSAGE = (
+        "Cannot modify a signed payment/invoice. "
+        "Signed fiscal documents are immutable. "
+        "To correct, issue a Credit Note (NC)."
+    )
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Only update rows that are not signed yet (UPDATE ... WHERE is_signed = false),
+        so the immutability check costs no extra read on the normal path.
+        """
+        updated = super()._do_update(
+            base_qs.filter(is_signed=False), using, pk_val, values, update_fields, forced_update
+        )
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            # The row exists, so it was skipped because it is signed
+            raise ValidationError(self.IMMUTABLE_MESSAGE)
+        return updated
+
     def save(self, *args, **kwargs):
         """
         Custom save with immutability check.
         Once a payment is signed (is_signed=True), it cannot be modified.
         This ensures fiscal compliance - signed invoices must be immutable.
+
+        The check is part of the UPDATE itself (see _do_update). Order.amount_paid
+        and the paid item quantities are kept in sync here; callers update the
+        order payment status (Order.update_payment_status()) once they are done.
         """
-        # Validate model constraints
-        self.full_clean()
-
-        # Check if this is an update to an existing signed payment
-        if self.pk:  # If this is an update (not a new record)
-            try:
-                old_instance = Payment.objects.get(pk=self.pk)
-                if old_instance.is_signed:
-                    # Signed payments cannot be modified
-                    raise ValidationError(
-                        "Cannot modify a signed payment/invoice. "
-                        "Signed fiscal documents are immutable. "
-                        "To correct, issue a Credit Note (NC)."
-                    )
-            except Payment.DoesNotExist:
-                # New payment, allow save
-                pass
+        # Validate model constraints. The unique checks only query for the unique
+        # fields that are set (idempotency_key, invoice_no, iud), so a duplicate is
+        # a ValidationError rather than an IntegrityError from the INSERT.
+        self.clean_fields(exclude=self.UNVALIDATED_FIELDS)
+        self.clean()
+        self.validate_unique(exclude=self.UNVALIDATED_FIELDS)
+
+        adding = self._state.adding
+        # Persisted paid-state contribution (None for a new record)
+        previous = None if adding else getattr(self, '_loaded_paid_state', None)
 
         super().save(*args, **kwargs)
-        self.order.update_payment_status()
+
+        if adding or previous is not None:
+            self._apply_paid_state(previous)
+        else:
+            # Persisted values unknown (instance not loaded from the DB): rebuild this order
+            from apps.orders.models import Order
+            from apps.orders.services import PaidStateService
+            PaidStateService.rebuild(Order.objects.filter(pk=self.order_id))
+        self._loaded_paid_state = (self.order_id, self.amount, self.payment_status == 'COMPLETED')
 
     def delete(self, *args, **kwargs):
         """
@@ -249,13 +344,34 @@ class Payment(models.Model):
                 "Signed fiscal documents are immutable. "
                 "To cancel, issue a Credit Note (NC)."
             )
-        super().delete(*args, **kwargs)
+
+        from apps.orders.services import PaidStateService
+
+        # Paid items are removed by cascade (without PaymentItem.delete()), so reverse them here
+        completed = self.payment_status == 'COMPLETED'
+        quantity_deltas = self._paid_items_deltas(-1) if completed else {}
+        order_ref = self._order_ref()
+
+        result = super().delete(*args, **kwargs)
+
+        if completed:
+            PaidStateService.apply_amount_delta(order_ref, -self.amount)
+            PaidStateService.apply_quantity_deltas(quantity_deltas)
+        return result
 
     class Meta:
         db_table = 'apps_payment'  # Use existing table
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
         ordering = ['-created_at']
+        indexes = [
+            # Hash chain walks: signed invoices of one type in signing order
+            models.Index(
+                fields=['invoice_type', 'signed_at', 'paymentID'],
+                name='payment_chain_order_idx',
+                condition=models.Q(is_signed=True),
+            ),
+        ]
 
 
 class PaymentItem(models.Model):
@@ -271,8 +387,198 @@ class PaymentItem(models.Model):
     def __str__(self):
         return f"Payment {self.payment.paymentID} - {self.quantity_paid}x {self.order_item.menu_item.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the persisted order item/quantity so saves can update OrderItem.quantity_paid."""
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if {'order_item_id', 'quantity_paid'} <= loaded.keys():
+            instance._loaded_paid_state = (loaded['order_item_id'], loaded['quantity_paid'])
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save and keep OrderItem.quantity_paid in sync (only completed payments count)."""
+        from apps.orders.services import PaidStateService
+
+        previous = getattr(self, '_loaded_paid_state', None)
+        super().save(*args, **kwargs)
+
+        if self.payment.payment_status == 'COMPLETED':
+            deltas = {self.order_item_id: self.quantity_paid}
+            if previous:
+                deltas[previous[0]] = deltas.get(previous[0], 0) - previous[1]
+            PaidStateService.apply_quantity_deltas(deltas)
+
+        self._loaded_paid_state = (self.order_item_id, self.quantity_paid)
+
+    def delete(self, *args, **kwargs):
+        """Delete and remove this row's quantity from OrderItem.quantity_paid."""
+        from apps.orders.services import PaidStateService
+
+        order_item_id, quantity = getattr(self, '_loaded_paid_state', (self.order_item_id, self.quantity_paid))
+        completed = self.payment.payment_status == 'COMPLETED'
+        result = super().delete(*args, **kwargs)
+
+        if completed:
+            PaidStateService.apply_quantity_deltas({order_item_id: -quantity})
+        return result
+
     class Meta:
         db_table = 'apps_payment_item'
         verbose_name = 'Payment Item'
         verbose_name_plural = 'Payment Items'
 
+
+
+class FiscalSequence(models.Model):
+    """
+    Last invoice number issued per series, year and document type.
+
+    FiscalService locks the row (SELECT ... FOR UPDATE) while it takes the
+    next number, so numbering is O(1), gap-free and safe with several
+    terminals signing at the same time.
+    """
+    series = models.CharField(max_length=20)
+    year = models.PositiveIntegerField()
+    invoice_type = models.CharField(max_length=2, choices=Payment.INVOICE_TYPE_CHOICES)
+    last_number = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.invoice_type} {self.series}/{self.year}: {self.last_number}"
+
+    class Meta:
+        db_table = 'apps_fiscal_sequence'
+        verbose_name = 'Fiscal Sequence'
+        verbose_name_plural = 'Fiscal Sequences'
+        unique_together = [['series', 'year', 'invoice_type']]
+
+
+class FiscalChain(models.Model):
+    """
+    Head of the hash chain of one document type.
+
+    The chain runs per document type across series and years, so there is a
+    single row per type; FiscalService locks it (SELECT ... FOR UPDATE) before
+    every signature and chains the new hash onto last_hash, which keeps the
+    chain linear whatever series or year the invoice is numbered in.
+    """
+    invoice_type = models.CharField(max_length=2, choices=Payment.INVOICE_TYPE_CHOICES, unique=True)
+    # Hash of the last signed document of this type
+    last_hash = models.CharField(max_length=64, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.invoice_type}: {self.last_hash[:12] or '(empty)'}"
+
+    class Meta:
+        db_table = 'apps_fiscal_chain'
+        verbose_name = 'Fiscal Chain'
+        verbose_name_plural = 'Fiscal Chains'
+
+
+class SAFTExportJob(models.Model):
+    """
+    A SAF-T CV export generated in the background.
+
+    SAFTExportJobService writes the file to disk in chunks and records
+    progress here; finished exports of a closed period are reused while
+    data_version still matches.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    jobID = models.AutoField(primary_key=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    compress = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    # Fingerprint of the exported data (SAFTExportService.data_version)
+    data_version = models.CharField(max_length=64, blank=True, default='')
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    file_size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='saft_export_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last status or progress change (a job that stops moving is stale)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"SAF-T {self.start_date} .. {self.end_date} ({self.status})"
+
+    @property
+    def filename(self):
+        """Download file name."""
+        extension = 'xml.gz' if self.compress else 'xml'
+        return f'SAFT-CV_{self.start_date}_{self.end_date}.{extension}'
+
+    class Meta:
+        db_table = 'apps_saft_export_job'
+        verbose_name = 'SAF-T Export Job'
+        verbose_name_plural = 'SAF-T Export Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['start_date', 'end_date', 'compress', 'data_version'],
+                name='saft_job_cache_idx'
+            ),
+        ]
+
+
+class EFaturaSubmission(models.Model):
+    """
+    Outbox row for submitting a signed invoice to the DNRE e-Fatura platform.
+
+    Created in the same transaction that signs the invoice, then picked up
+    by the process_efatura_queue worker, so the request that signs an
+    invoice never waits on the tax authority.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('SUBMITTED', 'Submitted'),
+        ('FAILED', 'Failed'),
+    ]
+
+    submissionID = models.AutoField(primary_key=True)
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='efatura_submission'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Lease held by the worker processing the row (expired leases are reclaimed)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # DNRE acknowledgement (receipt id) once submitted
+    receipt = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"e-Fatura payment #{self.payment_id} ({self.status})"
+
+    class Meta:
+        db_table = 'apps_efatura_submission'
+        verbose_name = 'e-Fatura Submission'
+        verbose_name_plural = 'e-Fatura Submissions'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='efatura_queue_idx'),
+        ]
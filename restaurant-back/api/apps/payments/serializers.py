@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Payment
+from .models import EFaturaSubmission, Payment, SAFTExportJob
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -68,7 +68,8 @@ class PaymentSerializer(serializers.ModelSerializer):
         payment = super().create(validated_data)
         order = payment.order
         order.paymentStatus = 'PAID'
-        order.save()
+        # Not a full save: amount_paid was just shifted in the DB by the payment
+        order.save(update_fields=['paymentStatus', 'updated_at'])
         return payment
 
 
@@ -127,3 +128,43 @@ class IssueCreditNoteSerializer(serializers.Serializer):
                 })
 
         return attrs
+
+
+class SAFTExportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background SAF-T export jobs (status and progress).
+    """
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SAFTExportJob
+        fields = [
+            'jobID', 'start_date', 'end_date', 'compress', 'status',
+            'rows_total', 'rows_done', 'progress', 'file_size', 'filename',
+            'error', 'requested_by', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        """Percentage of invoices written."""
+        if obj.status == 'DONE':
+            return 100
+        if not obj.rows_total:
+            return 0
+        return min(100, round(obj.rows_done * 100 / obj.rows_total))
+
+
+class EFaturaSubmissionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the e-Fatura submission status of an invoice.
+    """
+    invoice_no = serializers.CharField(source='payment.invoice_no', read_only=True)
+    iud = serializers.CharField(source='payment.iud', read_only=True)
+
+    class Meta:
+        model = EFaturaSubmission
+        fields = [
+            'submissionID', 'payment', 'invoice_no', 'iud', 'status', 'attempts',
+            'next_attempt_at', 'receipt', 'last_error', 'created_at', 'submitted_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,92 @@
+"""
+DNRE e-Fatura API client
+
+Posts e-Fatura XML documents to the DNRE platform (or to the local fake
+server started with `manage.py fake_dnre_server`).
+
+Configured through settings:
+- EFATURA_DNRE_URL: Base URL of the API (empty: simulation mode, no HTTP)
+- EFATURA_DNRE_TOKEN: Bearer token sent in the Authorization header
+- EFATURA_DNRE_TIMEOUT: Request timeout in seconds (default: 30)
+"""
+import json
+import urllib.error
+import urllib.request
+from django.conf import settings
+
+
+DNRE_API_URL = getattr(settings, 'EFATURA_DNRE_URL', '')
+DNRE_API_TOKEN = getattr(settings, 'EFATURA_DNRE_TOKEN', '')
+DNRE_API_TIMEOUT = getattr(settings, 'EFATURA_DNRE_TIMEOUT', 30)
+SUBMIT_PATH = '/v1/dfe/invoice/submit'
+
+
+class DNREError(Exception):
+    """
+    A submission DNRE did not accept.
+
+    Attributes:
+        retryable: False when resending the same document cannot succeed
+                   (e.g. the document was rejected as invalid)
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class DNREClient:
+    """
+    Client for the DNRE e-Fatura submission API.
+    """
+
+    def __init__(self, base_url=None, token=None, timeout=None):
+        self.base_url = (base_url or DNRE_API_URL).rstrip('/')
+        self.token = token if token is not None else DNRE_API_TOKEN
+        self.timeout = timeout or DNRE_API_TIMEOUT
+
+    def submit(self, xml_content: bytes, iud: str) -> dict:
+        """
+        Submit one e-Fatura document.
+
+        Args:
+            xml_content: e-Fatura XML document
+            iud: Document IUD (sent as the Idempotency-Key, so a resend after
+                 a lost response is not registered twice)
+
+        Returns:
+            dict: DNRE response body (includes the submission receipt)
+
+        Raises:
+            DNREError: If the document was not accepted
+        """
+        headers = {
+            'Content-Type': 'application/xml; charset=utf-8',
+            'Accept': 'application/json',
+            'Idempotency-Key': iud,
+        }
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        request = urllib.request.Request(
+            f'{self.base_url}{SUBMIT_PATH}',
+            data=xml_content,
+            headers=headers,
+            method='POST'
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', 'replace')[:500]
+            # Client errors mean the document itself was refused (except throttling/timeouts)
+            retryable = e.code >= 500 or e.code in (408, 429)
+            raise DNREError(f'DNRE returned HTTP {e.code}: {detail}', retryable=retryable)
+        except (urllib.error.URLError, TimeoutError, OSError) as e:
+            raise DNREError(f'DNRE unreachable: {e}')
+
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise DNREError('DNRE returned an invalid response')
@@ -4,22 +4,61 @@ e-Fatura CV Service
 Generates individual invoice XML for real-time submission to DNRE e-Fatura platform.
 Conforms to CV_EFatura_Invoice_v1.0.xsd schema.
 
-IMPORTANT: Currently in SIMULATION mode.
-When DNRE credentials are available, update DNRE_API_ENABLED to True.
+The XML is written directly as UTF-8 bytes: only the per-invoice parts are
+formatted for each document, while the EmitterParty and Software blocks are
+rendered once per CompanySettings version and reused.
+
+IMPORTANT: Currently in SIMULATION mode (documents are saved locally and
+marked IsSpecimen unless EFATURA_DNRE_URL is configured, see dnre_client.py).
 """
-import os
 from datetime import datetime
 from decimal import Decimal
-from xml.etree.ElementTree import Element, SubElement, tostring, ElementTree
-from xml.dom import minidom
-from django.conf import settings
 from apps.common.models import CompanySettings
 from apps.payments.models import Payment
+from .dnre_client import DNRE_API_URL, DNREClient
+from .efatura_storage import EFaturaStorage
+from .efatura_validator import EFaturaValidator
 
 
 # Configuration
-DNRE_API_ENABLED = False  # Set to True when DNRE credentials available
-EFATURA_STORAGE_DIR = os.path.join(settings.BASE_DIR, 'efatura_xml')
+# Real submission (and non-specimen documents) whenever a DNRE URL is configured
+DNRE_API_ENABLED = bool(DNRE_API_URL)
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+INDENT = '  '
+DFE_NAMESPACE = 'urn:cv:efatura:xsd:v1.0'
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+SCHEMA_LOCATION = 'urn:cv:efatura:xsd:v1.0 common/CV_EFatura_Invoice_v1.0.xsd'
+
+
+def _escape(value) -> str:
+    """Escape text or an attribute value (same entities as the former minidom output)."""
+    return (
+        str(value)
+        .replace('&', '&amp;')
+        .replace('<', '&lt;')
+        .replace('"', '&quot;')
+        .replace('>', '&gt;')
+    )
+
+
+def _attrs(**attributes) -> str:
+    return ''.join(f' {name}="{_escape(value)}"' for name, value in attributes.items())
+
+
+def _leaf(level: int, tag: str, text=None, attrs: str = '') -> str:
+    """One pretty-printed element holding only text (self-closing when empty)."""
+    if text is None or text == '':
+        return f'{INDENT * level}<{tag}{attrs}/>\n'
+    return f'{INDENT * level}<{tag}{attrs}>{_escape(text)}</{tag}>\n'
+
+
+def _open(level: int, tag: str, attrs: str = '') -> str:
+    return f'{INDENT * level}<{tag}{attrs}>\n'
+
+
+def _close(level: int, tag: str) -> str:
+    return f'{INDENT * level}</{tag}>\n'
 
 
 class EFaturaService:
@@ -35,6 +74,17 @@ class EFaturaService:
         'NC': '5',   # Nota de Crédito (Credit Note)
     }
 
+    # Payment means codes (UNECE PaymentMeansCode)
+    PAYMENT_MEANS_CODES = {
+        'CASH': '10',          # Cash
+        'CREDIT_CARD': '48',   # Bank card (credit)
+        'DEBIT_CARD': '49',    # Direct debit
+        'ONLINE': '30',        # Credit transfer
+    }
+
+    # Rendered company-dependent fragments: {name: ((company pk, updated_at), text)}
+    _static_fragments = {}
+
     def __init__(self, payment: Payment):
         """
         Initialize e-Fatura service for a payment/invoice.
@@ -49,9 +99,6 @@ class EFaturaService:
         self.order = payment.order
         self.company = CompanySettings.get_instance()
 
-        # Ensure storage directory exists
-        os.makedirs(EFATURA_STORAGE_DIR, exist_ok=True)
-
     def generate_iud(self) -> str:
         """
         Generate IUD (Identificador Único do Documento) - 45 characters.
@@ -99,25 +146,116 @@ class EFaturaService:
         Returns:
             str: XML string (UTF-8)
         """
-        # Root element
-        dfe = Element('Dfe')
-        dfe.set('xmlns', 'urn:cv:efatura:xsd:v1.0')
-        dfe.set('Version', '1.0')
-        dfe.set('Id', self.generate_iud())
-        dfe.set('DocumentTypeCode', self.DOCUMENT_TYPE_CODES.get(self.payment.invoice_type, '1'))
-        dfe.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-        dfe.set('xsi:schemaLocation', 'urn:cv:efatura:xsd:v1.0 common/CV_EFatura_Invoice_v1.0.xsd')
+        return self.render_xml().decode('utf-8')
 
-        # Specimen mode (test mode)
-        SubElement(dfe, 'IsSpecimen').text = 'true' if not DNRE_API_ENABLED else 'false'
+    def render_xml(self) -> bytes:
+        """
+        Render the e-Fatura XML document as UTF-8 bytes.
 
-        # Invoice element
-        invoice = SubElement(dfe, 'Invoice')
+        Returns:
+            bytes: XML document
+        """
+        payment = self.payment
+        order = self.order
+        serie, doc_number = self._serie_and_number()
+        issue_date = (payment.invoice_date or datetime.now().date()).strftime('%Y-%m-%d')
+
+        parts = [
+            XML_DECLARATION,
+            _open(0, 'Dfe', _attrs(**{
+                'xmlns': DFE_NAMESPACE,
+                'xmlns:xsi': XSI_NAMESPACE,
+                'Version': '1.0',
+                'Id': self.generate_iud(),
+                'DocumentTypeCode': self.DOCUMENT_TYPE_CODES.get(payment.invoice_type, '1'),
+                'xsi:schemaLocation': SCHEMA_LOCATION,
+            })),
+            _leaf(1, 'IsSpecimen', 'true' if not DNRE_API_ENABLED else 'false'),
+            _open(1, 'Invoice'),
+            _leaf(2, 'LedCode', '1'),
+            _leaf(2, 'Serie', serie),
+            _leaf(2, 'DocumentNumber', doc_number),
+            _leaf(2, 'IssueDate', issue_date),
+            _leaf(2, 'IssueTime', payment.created_at.strftime('%H:%M:%S')),
+            _leaf(2, 'DueDate', issue_date),
+            _leaf(2, 'TaxPointDate', issue_date),
+            self._static_fragment('emitter', self._render_emitter_party),
+        ]
 
-        # Document identification
-        SubElement(invoice, 'LedCode').text = '1'  # Ledger code (1 = normal)
+        # Receiver (Customer)
+        if payment.customer_tax_id and payment.customer_name:
+            receiver_tax_id, receiver_name = payment.customer_tax_id, payment.customer_name
+        else:
+            receiver_tax_id, receiver_name = '999999999', 'Consumidor Final'
+        parts += [
+            _open(2, 'ReceiverParty'),
+            _leaf(3, 'TaxId', receiver_tax_id, _attrs(CountryCode='CV')),
+            _leaf(3, 'Name', receiver_name),
+            _open(3, 'Address', _attrs(CountryCode='CV')),
+            _leaf(4, 'AddressDetail', 'N/A'),
+            _leaf(4, 'AddressCode', 'CV0000000000'),
+            _close(3, 'Address'),
+            _open(3, 'Contacts'),
+            _leaf(4, 'Telephone', 'N/A'),
+            _close(3, 'Contacts'),
+            _close(2, 'ReceiverParty'),
+        ]
 
-        # Extract serie from invoice_no
+        # Lines (Order items)
+        lines = []
+        for idx, item in enumerate(self._order_items(), start=1):
+            price_extension = item.price * item.quantity
+            lines += [
+                _open(3, 'Line', ' LineTypeCode="N"'),
+                _leaf(4, 'Id', idx),
+                _leaf(4, 'Quantity', item.quantity, ' UnitCode="EA" IsStandardUnitCode="true"'),
+                _leaf(4, 'Price', f"{float(item.price):.2f}"),
+                _leaf(4, 'PriceExtension', f"{float(price_extension):.2f}"),
+                _leaf(4, 'Discount', '0'),
+                _leaf(4, 'NetTotal', f"{float(price_extension):.2f}"),
+                _open(4, 'Tax', ' TaxTypeCode="IVA"'),
+                _leaf(5, 'TaxPercentage', '15.00'),
+                _leaf(5, 'TaxTotal', f"{float(price_extension * Decimal('0.15')):.2f}"),
+                _close(4, 'Tax'),
+                _open(4, 'Item'),
+                _leaf(5, 'Description', item.menu_item.name),
+                _leaf(5, 'EmitterIdentification', item.menu_item.itemID),
+                _leaf(5, 'HazardousRiskIndicator', 'false'),
+                _close(4, 'Item'),
+                _close(3, 'Line'),
+            ]
+        if lines:
+            parts += [_open(2, 'Lines'), *lines, _close(2, 'Lines')]
+        else:
+            parts.append(_leaf(2, 'Lines'))
+
+        # Totals and Payments
+        parts += [
+            _open(2, 'Totals'),
+            _leaf(3, 'PriceExtensionTotalAmount', f"{float(order.totalAmount):.2f}"),
+            _leaf(3, 'ChargeTotalAmount', '0.00'),
+            _leaf(3, 'DiscountTotalAmount', '0.00'),
+            _leaf(3, 'NetTotalAmount', f"{float(order.totalAmount):.2f}"),
+            _leaf(3, 'TaxTotalAmount', f"{float(order.totalIva):.2f}"),
+            _leaf(3, 'PayableAmount', f"{float(order.grandTotal):.2f}"),
+            _close(2, 'Totals'),
+            _open(2, 'Payments'),
+            _open(3, 'Payment'),
+            _leaf(4, 'PaymentMeansCode', self.PAYMENT_MEANS_CODES.get(payment.payment_method, '10')),
+            _leaf(4, 'PaymentReference', payment.paymentID),
+            _leaf(4, 'PaymentDate', payment.created_at.date().strftime('%Y-%m-%d')),
+            _leaf(4, 'PaymentAmount', f"{float(payment.amount):.2f}"),
+            _close(3, 'Payment'),
+            _close(2, 'Payments'),
+            self._static_fragment('software', self._render_software),
+            _close(1, 'Invoice'),
+            _close(0, 'Dfe'),
+        ]
+
+        return ''.join(parts).encode('utf-8')
+
+    def _serie_and_number(self):
+        """Serie and document number taken from invoice_no (e.g. "FT A/2025/00001")."""
         if self.payment.invoice_no:
             parts = self.payment.invoice_no.split('/')
             serie = parts[0].strip() if len(parts) >= 1 else 'FT A'
@@ -125,276 +263,187 @@ class EFaturaService:
         else:
             serie = 'FT A'
             doc_number = '00001'
+        return serie, doc_number
 
-        SubElement(invoice, 'Serie').text = serie
-        SubElement(invoice, 'DocumentNumber').text = doc_number
-
-        # Dates
-        issue_date = self.payment.invoice_date or datetime.now().date()
-        SubElement(invoice, 'IssueDate').text = issue_date.strftime('%Y-%m-%d')
-        SubElement(invoice, 'IssueTime').text = self.payment.created_at.strftime('%H:%M:%S')
-
-        # Due date (same as issue for immediate payment)
-        SubElement(invoice, 'DueDate').text = issue_date.strftime('%Y-%m-%d')
-
-        # Tax point date
-        SubElement(invoice, 'TaxPointDate').text = issue_date.strftime('%Y-%m-%d')
-
-        # Emitter (Company)
-        self._add_emitter_party(invoice)
-
-        # Receiver (Customer)
-        self._add_receiver_party(invoice)
-
-        # Lines (Order items)
-        self._add_lines(invoice)
-
-        # Totals
-        self._add_totals(invoice)
-
-        # Payments
-        self._add_payments(invoice)
-
-        # Software info
-        self._add_software(invoice)
+    def _order_items(self):
+        return self.order.items.select_related('menu_item').order_by('id')
 
-        # Convert to pretty XML string
-        return self._prettify_xml(dfe)
-
-    def _add_emitter_party(self, parent: Element):
-        """Add EmitterParty (company info)"""
-        emitter = SubElement(parent, 'EmitterParty')
+    def _static_fragment(self, name, render):
+        """
+        Rendered text of a block that depends only on CompanySettings.
 
-        # Tax ID
-        tax_id = SubElement(emitter, 'TaxId')
-        tax_id.set('CountryCode', 'CV')
-        tax_id.text = self.company.tax_registration_number
+        Kept per process and re-rendered when the settings are saved
+        (updated_at changes).
+        """
+        version = (self.company.pk, self.company.updated_at)
+        cached = self._static_fragments.get(name)
+        if cached and cached[0] == version:
+            return cached[1]
 
-        # Name
-        SubElement(emitter, 'Name').text = self.company.company_name
+        text = render()
+        EFaturaService._static_fragments[name] = (version, text)
+        return text
 
-        # Address
-        address = SubElement(emitter, 'Address')
-        address.set('CountryCode', 'CV')
+    def _render_emitter_party(self) -> str:
+        """EmitterParty block (company info)"""
+        company = self.company
 
         # Address detail (concatenate street and number)
-        address_detail = f"{self.company.street_name}"
-        if self.company.building_number:
-            address_detail += f", {self.company.building_number}"
-        address_detail += f", {self.company.city}, {self.company.postal_code}"
-
-        SubElement(address, 'AddressDetail').text = address_detail
-        SubElement(address, 'AddressCode').text = f"CV{self.company.postal_code.replace('-', '')}"
-
-        # Contacts
-        contacts = SubElement(emitter, 'Contacts')
-        SubElement(contacts, 'Telephone').text = self.company.telephone
-        if self.company.email:
-            SubElement(contacts, 'Email').text = self.company.email
-        if self.company.website:
-            SubElement(contacts, 'Website').text = self.company.website
-
-    def _add_receiver_party(self, parent: Element):
-        """Add ReceiverParty (customer info)"""
-        receiver = SubElement(parent, 'ReceiverParty')
-
-        # Customer info
-        if self.payment.customer_tax_id and self.payment.customer_name:
-            # Real customer
-            tax_id = SubElement(receiver, 'TaxId')
-            tax_id.set('CountryCode', 'CV')
-            tax_id.text = self.payment.customer_tax_id
-            SubElement(receiver, 'Name').text = self.payment.customer_name
-        else:
-            # Consumidor Final
-            tax_id = SubElement(receiver, 'TaxId')
-            tax_id.set('CountryCode', 'CV')
-            tax_id.text = '999999999'
-            SubElement(receiver, 'Name').text = 'Consumidor Final'
-
-        # Address (minimal for consumer)
-        address = SubElement(receiver, 'Address')
-        address.set('CountryCode', 'CV')
-        SubElement(address, 'AddressDetail').text = 'N/A'
-        SubElement(address, 'AddressCode').text = 'CV0000000000'
-
-        # Contacts (minimal)
-        contacts = SubElement(receiver, 'Contacts')
-        SubElement(contacts, 'Telephone').text = 'N/A'
-
-    def _add_lines(self, parent: Element):
-        """Add Lines (order items)"""
-        lines = SubElement(parent, 'Lines')
-
-        for idx, item in enumerate(self.order.items.all(), start=1):
-            line = SubElement(lines, 'Line')
-            line.set('LineTypeCode', 'N')  # N = Normal line
-
-            # Line ID
-            SubElement(line, 'Id').text = str(idx)
-
-            # Quantity
-            quantity = SubElement(line, 'Quantity')
-            quantity.set('UnitCode', 'EA')  # EA = Each (standard unit code)
-            quantity.set('IsStandardUnitCode', 'true')
-            quantity.text = str(item.quantity)
-
-            # Price (unit price)
-            SubElement(line, 'Price').text = f"{float(item.price):.2f}"
-
-            # Price Extension (quantity * price) - Keep as Decimal for calculations
-            price_extension = item.price * item.quantity
-            SubElement(line, 'PriceExtension').text = f"{float(price_extension):.2f}"
-
-            # Discount (0 for now - TODO: implement discounts)
-            SubElement(line, 'Discount').text = '0'
-
-            # Net Total (price extension - discount)
-            SubElement(line, 'NetTotal').text = f"{float(price_extension):.2f}"
-
-            # Tax (IVA 15%)
-            tax = SubElement(line, 'Tax')
-            tax.set('TaxTypeCode', 'IVA')
-            SubElement(tax, 'TaxPercentage').text = '15.00'
-
-            # Calculate tax amount (keep as Decimal)
-            tax_amount = price_extension * Decimal('0.15')
-            SubElement(tax, 'TaxTotal').text = f"{float(tax_amount):.2f}"
-
-            # Item description
-            item_elem = SubElement(line, 'Item')
-            SubElement(item_elem, 'Description').text = item.menu_item.name
-            SubElement(item_elem, 'EmitterIdentification').text = str(item.menu_item.itemID)
-            SubElement(item_elem, 'HazardousRiskIndicator').text = 'false'
-
-    def _add_totals(self, parent: Element):
-        """Add Totals section (conforme SAF-T CV spec)"""
-        totals = SubElement(parent, 'Totals')
-
-        # Price Extension Total (sum of all line extensions before discount/tax)
-        SubElement(totals, 'PriceExtensionTotalAmount').text = f"{float(self.order.totalAmount):.2f}"
-
-        # Charge Total (encargos adicionais - 0 por defeito)
-        SubElement(totals, 'ChargeTotalAmount').text = '0.00'
+        address_detail = f"{company.street_name}"
+        if company.building_number:
+            address_detail += f", {company.building_number}"
+        address_detail += f", {company.city}, {company.postal_code}"
+
+        parts = [
+            _open(2, 'EmitterParty'),
+            _leaf(3, 'TaxId', company.tax_registration_number, _attrs(CountryCode='CV')),
+            _leaf(3, 'Name', company.company_name),
+            _open(3, 'Address', _attrs(CountryCode='CV')),
+            _leaf(4, 'AddressDetail', address_detail),
+            _leaf(4, 'AddressCode', f"CV{company.postal_code.replace('-', '')}"),
+            _close(3, 'Address'),
+            _open(3, 'Contacts'),
+            _leaf(4, 'Telephone', company.telephone),
+        ]
+        if company.email:
+            parts.append(_leaf(4, 'Email', company.email))
+        if company.website:
+            parts.append(_leaf(4, 'Website', company.website))
+        parts += [
+            _close(3, 'Contacts'),
+            _close(2, 'EmitterParty'),
+        ]
+        return ''.join(parts)
+
+    def _render_software(self) -> str:
+        """Software block"""
+        return ''.join([
+            _open(2, 'Software'),
+            _leaf(3, 'Code', self.company.software_certificate_number),
+            _leaf(3, 'Name', 'Restaurant ERP'),
+            _leaf(3, 'Version', self.company.software_version),
+            _close(2, 'Software'),
+        ])
+
+    def render_validated_xml(self) -> bytes:
+        """
+        Render the XML document and check it against the XSD.
 
-        # Discount Total (descontos - 0 por defeito)
-        SubElement(totals, 'DiscountTotalAmount').text = '0.00'
+        Depending on EFATURA_XSD_VALIDATION, invalid documents are let through
+        ('off'), logged ('warn') or refused ('strict'); see EFaturaValidator.check.
 
-        # Net Total (subtotal sem impostos, após descontos)
-        SubElement(totals, 'NetTotalAmount').text = f"{float(self.order.totalAmount):.2f}"
+        Returns:
+            bytes: XML document
 
-        # Tax Total (IVA total)
-        SubElement(totals, 'TaxTotalAmount').text = f"{float(self.order.totalIva):.2f}"
+        Raises:
+            EFaturaValidationError: In strict mode, if the document is invalid
+        """
+        xml_content = self.render_xml()
+        EFaturaValidator.check(xml_content)
+        return xml_content
 
-        # Payable Amount (total a pagar = net + tax)
-        SubElement(totals, 'PayableAmount').text = f"{float(self.order.grandTotal):.2f}"
+    def save_xml(self, xml_content: bytes = None) -> str:
+        """
+        Store the invoice XML (see EFaturaStorage) and record it on the payment.
 
-    def _add_payments(self, parent: Element):
-        """Add Payments section"""
-        payments = SubElement(parent, 'Payments')
+        Args:
+            xml_content: Already rendered XML (rendered and validated here if omitted)
 
-        payment_elem = SubElement(payments, 'Payment')
+        Returns:
+            str: File path of the stored XML
+        """
+        if xml_content is None:
+            xml_content = self.render_validated_xml()
+        return EFaturaStorage.store(self.payment, xml_content)
 
-        # Payment means code (conforme UNECE PaymentMeansCode)
-        payment_means_map = {
-            'CASH': '10',          # Cash
-            'CREDIT_CARD': '48',   # Bank card (credit)
-            'DEBIT_CARD': '49',    # Direct debit
-            'ONLINE': '30',        # Credit transfer
-        }
-        means_code = payment_means_map.get(self.payment.payment_method, '10')
-        SubElement(payment_elem, 'PaymentMeansCode').text = means_code
+    def xml_file_path(self) -> str:
+        """Path of the stored XML (rendered and stored first if needed)."""
+        return EFaturaStorage.stored_path(self.payment) or self.save_xml()
 
-        # Payment reference (use payment ID)
-        SubElement(payment_elem, 'PaymentReference').text = str(self.payment.paymentID)
+    def document_xml(self) -> bytes:
+        """
+        XML of the signed invoice: the stored copy, or a new rendering that is then stored.
 
-        # Payment date (use created_at date)
-        payment_date = self.payment.created_at.date()
-        SubElement(payment_elem, 'PaymentDate').text = payment_date.strftime('%Y-%m-%d')
+        Signed documents are immutable, so retries and downloads reuse the
+        stored bytes instead of rendering the invoice again.
 
-        # Payment amount
-        SubElement(payment_elem, 'PaymentAmount').text = f"{float(self.payment.amount):.2f}"
+        Returns:
+            bytes: XML document
+        """
+        xml_content = EFaturaStorage.read(self.payment)
+        if xml_content is None:
+            xml_content = self.render_validated_xml()
+            self.save_xml(xml_content)
+        return xml_content
 
-    def _add_software(self, parent: Element):
-        """Add Software information"""
-        software = SubElement(parent, 'Software')
-        SubElement(software, 'Code').text = self.company.software_certificate_number
-        SubElement(software, 'Name').text = 'Restaurant ERP'
-        SubElement(software, 'Version').text = self.company.software_version
+    def send(self, xml_content: bytes) -> dict:
+        """
+        Deliver rendered XML to DNRE (or store it locally in simulation mode).
 
-    def _prettify_xml(self, elem: Element) -> str:
-        """Return a pretty-printed XML string"""
-        rough_string = tostring(elem, encoding='utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ", encoding='UTF-8').decode('utf-8')
+        Does not touch the database, so submissions can run on worker threads.
 
-    def save_xml(self) -> str:
-        """
-        Save XML to local storage (simulation mode).
+        Args:
+            xml_content: Rendered e-Fatura XML
 
         Returns:
-            str: File path where XML was saved
-        """
-        xml_content = self.generate_xml()
+            dict: Result with 'mode' and the submission 'receipt'
 
-        # Generate filename
-        filename = f"efatura_{self.payment.invoice_type}_{self.payment.invoice_no.replace('/', '_')}_{self.payment.invoice_date}.xml"
-        file_path = os.path.join(EFATURA_STORAGE_DIR, filename)
+        Raises:
+            DNREError: If DNRE did not accept the document
+        """
+        iud = self.generate_iud()
 
-        # Save to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(xml_content)
+        if not DNRE_API_ENABLED:
+            # Simulation mode - save locally (file only: no DB access here)
+            relative_path, _ = EFaturaStorage.write(self.payment, xml_content)
+            return {
+                'mode': 'simulation',
+                'receipt': f'SIM-{iud}',
+                'file_path': EFaturaStorage.full_path(relative_path),
+            }
 
-        return file_path
+        response = DNREClient().submit(xml_content, iud)
+        return {
+            'mode': 'dnre',
+            'receipt': response.get('receipt', ''),
+            'response': response,
+        }
 
     def submit_to_dnre(self) -> dict:
         """
-        Submit invoice XML to DNRE e-Fatura platform.
+        Submit invoice XML to DNRE e-Fatura platform, synchronously.
+
+        Signed invoices are normally submitted by the outbox worker (see
+        EFaturaSubmissionService); this direct path is kept for scripts.
 
-        SIMULATION MODE: Currently saves locally instead of sending.
-        When DNRE credentials are available, implement actual API call.
+        SIMULATION MODE (no EFATURA_DNRE_URL): saves locally instead of sending.
 
         Returns:
             dict: Response with status and details
         """
-        if not DNRE_API_ENABLED:
-            # Simulation mode - save locally
-            file_path = self.save_xml()
-
-            return {
-                'success': True,
-                'mode': 'simulation',
-                'message': 'XML saved locally (simulation mode)',
-                'file_path': file_path,
-                'invoice_no': self.payment.invoice_no,
-                'iud': self.generate_iud(),
-            }
-        else:
-            # TODO: Implement actual DNRE API call
-            # DNRE API endpoints:
-            # - POST /v1/dfe/invoice/submit
-            # - Headers: Authorization, Content-Type: application/xml
-            # - Body: XML string
-
-            raise NotImplementedError("DNRE API integration not yet implemented. Set credentials first.")
+        result = self.send(self.document_xml())
+
+        return {
+            'success': True,
+            'mode': result['mode'],
+            'message': 'XML saved locally (simulation mode)' if result['mode'] == 'simulation' else 'Submitted to DNRE',
+            'file_path': result.get('file_path'),
+            'receipt': result['receipt'],
+            'invoice_no': self.payment.invoice_no,
+            'iud': self.generate_iud(),
+        }
 
     @staticmethod
     def validate_xml(xml_string: str) -> bool:
         """
         Validate XML against XSD schema.
 
-        TODO: Implement XSD validation using lxml
-
         Args:
             xml_string: XML to validate
 
         Returns:
-            bool: True if valid
+            bool: True if valid (or if the schemas are unavailable)
         """
-        # TODO: Implement with lxml
-        # from lxml import etree
-        # schema = etree.XMLSchema(file='2024-05-27-XML-XSD/common/CV_EFatura_Invoice_v1.0.xsd')
-        # doc = etree.fromstring(xml_string.encode('utf-8'))
-        # return schema.validate(doc)
-
-        return True  # Placeholder
+        if not EFaturaValidator.is_available():
+            return True
+        return not EFaturaValidator.validate(xml_string)
@@ -0,0 +1,161 @@
+"""
+e-Fatura XML Storage
+
+Content-addressed store for the XML of signed invoices:
+- Files are sharded by series and month: <series>/<yyyy>/<mm>/<sha256>.xml,
+  so no directory grows with the whole invoice history
+- Writes go to a temporary file in the target directory and are renamed
+  into place, so readers never see a partial document
+- The path (relative to EFATURA_STORAGE_DIR) and the SHA-256 are recorded
+  on the payment once; signed documents are immutable, so the stored copy is
+  served and resubmitted instead of being rendered again
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime
+from django.conf import settings
+
+from apps.payments.models import Payment
+
+
+# Configuration
+EFATURA_STORAGE_DIR = str(getattr(settings, 'EFATURA_STORAGE_DIR', os.path.join(settings.BASE_DIR, 'efatura_xml')))
+
+UNSAFE_CHARS_RE = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+class EFaturaStorage:
+    """
+    Storage for rendered e-Fatura XML documents.
+    """
+
+    @staticmethod
+    def relative_path(payment, sha256):
+        """
+        Storage path of a document, relative to EFATURA_STORAGE_DIR.
+
+        Args:
+            payment: Signed Payment instance
+            sha256: Hex SHA-256 of the document
+
+        Returns:
+            str: e.g. "FTA/2025/03/<sha256>.xml"
+        """
+        serie = (payment.invoice_no or '').split('/')[0]
+        serie = UNSAFE_CHARS_RE.sub('', serie) or payment.invoice_type
+        issue_date = payment.invoice_date or datetime.now().date()
+        return os.path.join(
+            serie,
+            issue_date.strftime('%Y'),
+            issue_date.strftime('%m'),
+            f'{sha256}.xml'
+        )
+
+    @staticmethod
+    def full_path(relative_path):
+        """Absolute path of a stored document."""
+        return os.path.join(EFATURA_STORAGE_DIR, relative_path)
+
+    @staticmethod
+    def stored_path(payment):
+        """
+        Absolute path of the payment's stored document.
+
+        Returns:
+            str or None: None if nothing was stored or the file is missing
+        """
+        if not payment.efatura_xml_path:
+            return None
+        path = EFaturaStorage.full_path(payment.efatura_xml_path)
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def write(payment, xml_content: bytes):
+        """
+        Write a document to the store (filesystem only, no DB access).
+
+        The file name is the content hash, so an existing file already holds
+        these exact bytes and is left untouched.
+
+        Args:
+            payment: Signed Payment instance
+            xml_content: XML document
+
+        Returns:
+            tuple: (relative path, sha256)
+        """
+        sha256 = hashlib.sha256(xml_content).hexdigest()
+        relative_path = EFaturaStorage.relative_path(payment, sha256)
+        path = EFaturaStorage.full_path(relative_path)
+
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    # mkstemp creates the file owner-only; keep files readable like open() would
+                    os.fchmod(f.fileno(), 0o644)
+                    f.write(xml_content)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        return relative_path, sha256
+
+    @staticmethod
+    def store(payment, xml_content: bytes) -> str:
+        """
+        Store a payment's document and record it on the payment.
+
+        The first stored document is kept: once a payment has one, later
+        calls return it and do not write anything (a stored file that went
+        missing is replaced).
+
+        Args:
+            payment: Signed Payment instance (its efatura_xml_* fields are updated)
+            xml_content: XML document
+
+        Returns:
+            str: Absolute path of the payment's stored document
+        """
+        path = EFaturaStorage.stored_path(payment)
+        if path:
+            return path
+
+        relative_path, sha256 = EFaturaStorage.write(payment, xml_content)
+
+        # Queryset update (signed payments refuse Model.save()), only if no other
+        # process recorded a document since this instance was loaded
+        recorded = Payment.objects.filter(
+            pk=payment.pk,
+            efatura_xml_sha256=payment.efatura_xml_sha256
+        ).update(efatura_xml_path=relative_path, efatura_xml_sha256=sha256)
+
+        if not recorded:
+            # Another process stored a (different) rendering first: keep that one
+            payment.refresh_from_db(fields=['efatura_xml_path', 'efatura_xml_sha256'])
+            return EFaturaStorage.stored_path(payment) or EFaturaStorage.full_path(relative_path)
+
+        payment.efatura_xml_path = relative_path
+        payment.efatura_xml_sha256 = sha256
+        return EFaturaStorage.full_path(relative_path)
+
+    @staticmethod
+    def read(payment):
+        """
+        Bytes of the payment's stored document.
+
+        Returns:
+            bytes or None: None if nothing was stored or the file is missing
+        """
+        path = EFaturaStorage.stored_path(payment)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
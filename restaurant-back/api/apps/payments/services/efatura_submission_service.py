@@ -0,0 +1,239 @@
+"""
+e-Fatura Submission Service
+
+Outbox for sending signed invoices to DNRE:
+- Signing an invoice enqueues an EFaturaSubmission row in the same transaction
+- The process_efatura_queue worker claims due rows in batches (SKIP LOCKED,
+  so several workers never take the same row), renders the XML and submits
+  the batch with bounded concurrency
+- Failures are retried with exponential backoff; documents DNRE refuses, or
+  that keep failing, end up FAILED for manual follow-up
+"""
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.payments.models import EFaturaSubmission
+from .dnre_client import DNREError
+from .efatura_validator import EFaturaValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class EFaturaSubmissionService:
+    """
+    Service for the e-Fatura submission outbox.
+    """
+
+    BATCH_SIZE = 20
+    CONCURRENCY = 4
+    # Time a claimed row stays reserved for the worker processing it
+    LEASE = timedelta(minutes=5)
+    # Retry delays: 30s, 1m, 2m, ... capped at 1h
+    RETRY_BASE_DELAY = timedelta(seconds=30)
+    RETRY_MAX_DELAY = timedelta(hours=1)
+    MAX_ATTEMPTS = 10
+
+    @staticmethod
+    def enqueue(payments):
+        """
+        Queue signed invoices for submission.
+
+        Called inside the signing transaction, so an invoice is never signed
+        without its outbox row. Invoices already queued are left as they are.
+
+        Args:
+            payments: Iterable of signed Payment instances
+        """
+        EFaturaSubmission.objects.bulk_create(
+            [EFaturaSubmission(payment=payment) for payment in payments],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def requeue(payment):
+        """
+        Queue an invoice for (re)submission now.
+
+        Creates the outbox row if missing; a FAILED submission starts over.
+        Pending or already submitted invoices are not touched.
+
+        Returns:
+            EFaturaSubmission
+        """
+        submission, created = EFaturaSubmission.objects.get_or_create(payment=payment)
+        if not created and submission.status == 'FAILED':
+            EFaturaSubmission.objects.filter(pk=submission.pk, status='FAILED').update(
+                status='PENDING',
+                attempts=0,
+                next_attempt_at=timezone.now(),
+                last_error=''
+            )
+            submission.refresh_from_db()
+        return submission
+
+    @staticmethod
+    def retry_delay(attempts):
+        """Backoff before the next attempt (with up to 10% jitter, so retries spread out)."""
+        delay = min(
+            EFaturaSubmissionService.RETRY_BASE_DELAY * (2 ** (attempts - 1)),
+            EFaturaSubmissionService.RETRY_MAX_DELAY
+        )
+        return delay * (1 + random.random() / 10)
+
+    @staticmethod
+    @transaction.atomic
+    def claim_batch(batch_size=None):
+        """
+        Reserve the next due submissions for this worker.
+
+        Rows locked by another worker are skipped, and claimed rows get a
+        lease, so the HTTP calls happen outside any transaction. Rows whose
+        lease expired (worker crashed mid-batch) are claimed again.
+
+        Returns:
+            list: Claimed EFaturaSubmission instances (payment and order loaded)
+        """
+        now = timezone.now()
+        submissions = list(
+            EFaturaSubmission.objects.filter(
+                Q(status='PENDING', next_attempt_at__lte=now) |
+                Q(status='PROCESSING', locked_until__lt=now)
+            )
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('payment__order')
+            .order_by('next_attempt_at')[:batch_size or EFaturaSubmissionService.BATCH_SIZE]
+        )
+
+        locked_until = now + EFaturaSubmissionService.LEASE
+        EFaturaSubmission.objects.filter(pk__in=[s.pk for s in submissions]).update(
+            status='PROCESSING',
+            locked_until=locked_until,
+            updated_at=now
+        )
+        # The lease identifies this worker's claim when the result is recorded
+        for submission in submissions:
+            submission.status = 'PROCESSING'
+            submission.locked_until = locked_until
+        return submissions
+
+    @staticmethod
+    def _claimed(submission):
+        """The submission's row, as long as this worker's claim on it still holds."""
+        return EFaturaSubmission.objects.filter(
+            pk=submission.pk,
+            status='PROCESSING',
+            locked_until=submission.locked_until
+        )
+
+    @staticmethod
+    def record_success(submission, result):
+        """
+        Mark a submission as accepted by DNRE.
+
+        Returns:
+            bool: False if the lease expired and another worker reclaimed the row
+                  (nothing is written then)
+        """
+        now = timezone.now()
+        return bool(EFaturaSubmissionService._claimed(submission).update(
+            status='SUBMITTED',
+            attempts=submission.attempts + 1,
+            receipt=str(result.get('receipt', ''))[:100],
+            last_error='',
+            locked_until=None,
+            submitted_at=now,
+            updated_at=now
+        ))
+
+    @staticmethod
+    def record_failure(submission, error, retryable=True):
+        """
+        Schedule a retry, or give up on the submission.
+
+        Returns:
+            bool: False if the lease expired and another worker reclaimed the row
+                  (nothing is written then)
+        """
+        now = timezone.now()
+        attempts = submission.attempts + 1
+        give_up = not retryable or attempts >= EFaturaSubmissionService.MAX_ATTEMPTS
+
+        return bool(EFaturaSubmissionService._claimed(submission).update(
+            status='FAILED' if give_up else 'PENDING',
+            attempts=attempts,
+            last_error=str(error),
+            locked_until=None,
+            next_attempt_at=now if give_up else now + EFaturaSubmissionService.retry_delay(attempts),
+            updated_at=now
+        ))
+
+    @staticmethod
+    def process_batch(batch_size=None, concurrency=None):
+        """
+        Claim, render and submit one batch.
+
+        XML is loaded from the store, or rendered, checked against the XSD and
+        stored here (DB access stays on this thread); only the submissions run
+        on the thread pool. Documents refused by strict validation fail
+        without retries; other errors preparing a document are retried.
+
+        Returns:
+            dict: {"claimed": n, "submitted": n, "failed": n, "expired": n}
+        """
+        from .efatura_service import EFaturaService
+
+        submissions = EFaturaSubmissionService.claim_batch(batch_size)
+        stats = {'claimed': len(submissions), 'submitted': 0, 'failed': 0, 'expired': 0}
+        if not submissions:
+            return stats
+
+        def tally(submission, recorded, outcome):
+            if recorded:
+                stats[outcome] += 1
+            else:
+                # Lease expired mid-batch: the worker that reclaimed the row records the result
+                logger.warning('Lease on e-Fatura submission %s expired; result not recorded', submission.pk)
+                stats['expired'] += 1
+
+        jobs = []
+        for submission in submissions:
+            try:
+                service = EFaturaService(submission.payment)
+                jobs.append((submission, service, service.document_xml()))
+            except EFaturaValidationError as e:
+                # Rendering the same data again cannot make the document valid
+                logger.error('e-Fatura for payment %s refused by XSD validation: %s', submission.payment_id, e)
+                tally(submission, EFaturaSubmissionService.record_failure(submission, e, retryable=False), 'failed')
+            except Exception as e:
+                # DB or filesystem errors may be transient: retry with backoff
+                logger.exception('Could not render e-Fatura for payment %s', submission.payment_id)
+                tally(submission, EFaturaSubmissionService.record_failure(submission, e), 'failed')
+
+        def submit(job):
+            _, service, xml_content = job
+            try:
+                return service.send(xml_content), None
+            except DNREError as e:
+                return None, e
+            except Exception as e:
+                logger.exception('e-Fatura submission for payment %s failed', service.payment.paymentID)
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=concurrency or EFaturaSubmissionService.CONCURRENCY) as executor:
+            results = list(executor.map(submit, jobs))
+
+        for (submission, _, _), (result, error) in zip(jobs, results):
+            if error is None:
+                tally(submission, EFaturaSubmissionService.record_success(submission, result), 'submitted')
+            else:
+                recorded = EFaturaSubmissionService.record_failure(
+                    submission, error, retryable=getattr(error, 'retryable', True)
+                )
+                tally(submission, recorded, 'failed')
+
+        return stats
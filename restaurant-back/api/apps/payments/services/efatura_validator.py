@@ -0,0 +1,174 @@
+"""
+e-Fatura XSD Validator
+
+Validates e-Fatura documents against the DNRE XSD set (EFATURA_XSD_DIR).
+Each schema is compiled once per process (and thread) and reused, so
+validating a document only costs the in-memory validation itself.
+
+lxml is optional: without it validation is skipped with a warning.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+
+# Configuration
+EFATURA_XSD_DIR = str(getattr(settings, 'EFATURA_XSD_DIR', ''))
+EFATURA_XSD_VALIDATION = getattr(settings, 'EFATURA_XSD_VALIDATION', 'off')
+
+# Schemas declaring document roots other than the individual CV_EFatura_<Root>_v1.0.xsd files
+ROOT_SCHEMAS = {
+    'Dfe': 'EnvelopedSignature.xsd',
+    'Event': 'EnvelopedSignature.xsd',
+}
+
+# Compiled schemas, per thread (an XMLSchema keeps its error log on the instance)
+_compiled = threading.local()
+
+
+class EFaturaValidationError(ValueError):
+    """
+    An e-Fatura document that does not conform to the XSD.
+
+    Attributes:
+        errors: Schema error messages ("line N: message")
+    """
+
+    def __init__(self, errors):
+        super().__init__(f"e-Fatura XML does not conform to the XSD: {errors[0]}")
+        self.errors = errors
+
+
+def _schema_path(xsd_dir, root):
+    """XSD file declaring a document root element (e.g. 'Dfe', 'Invoice')."""
+    return os.path.join(xsd_dir, ROOT_SCHEMAS.get(root) or os.path.join('common', f'CV_EFatura_{root}_v1.0.xsd'))
+
+
+def _load_schema(path):
+    """Compiled XMLSchema for path (compiled on first use in this thread)."""
+    schemas = getattr(_compiled, 'schemas', None)
+    if schemas is None:
+        schemas = _compiled.schemas = {}
+
+    schema = schemas.get(path)
+    if schema is None:
+        schema = schemas[path] = etree.XMLSchema(etree.parse(path))
+    return schema
+
+
+def _validate_file(path, xsd_dir):
+    """Validate one stored document (top-level so worker processes can run it)."""
+    with open(path, 'rb') as f:
+        return path, EFaturaValidator.validate(f.read(), xsd_dir)
+
+
+class EFaturaValidator:
+    """
+    Validates e-Fatura XML documents against the DNRE schemas.
+    """
+
+    @staticmethod
+    def is_available():
+        """Whether lxml is installed and the XSD directory exists."""
+        return etree is not None and os.path.isdir(EFATURA_XSD_DIR)
+
+    @staticmethod
+    def validate(xml_content, xsd_dir=None):
+        """
+        Validate a document against the schema of its root element.
+
+        Args:
+            xml_content: XML document (bytes or str)
+            xsd_dir: XSD directory (default: EFATURA_XSD_DIR)
+
+        Returns:
+            list: Error messages ("line N: message"); empty when the document is valid
+        """
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode('utf-8')
+
+        try:
+            document = etree.fromstring(xml_content)
+        except etree.XMLSyntaxError as e:
+            return [f'line {e.lineno}: {e.msg}']
+
+        root = etree.QName(document).localname
+        path = _schema_path(xsd_dir or EFATURA_XSD_DIR, root)
+        if not os.path.exists(path):
+            return [f'line {document.sourceline}: no schema for root element {root}']
+
+        schema = _load_schema(path)
+        if schema.validate(document):
+            return []
+        return [f'line {error.line}: {error.message}' for error in schema.error_log]
+
+    @staticmethod
+    def check(xml_content, mode=None):
+        """
+        Apply the configured validation policy (EFATURA_XSD_VALIDATION) to a document.
+
+        Args:
+            xml_content: XML document
+            mode: 'off', 'warn' or 'strict' (default: EFATURA_XSD_VALIDATION)
+
+        Returns:
+            list: Schema errors found (empty when valid or not checked)
+
+        Raises:
+            EFaturaValidationError: In strict mode, if the document is invalid
+        """
+        mode = mode or EFATURA_XSD_VALIDATION
+        if mode == 'off':
+            return []
+
+        if not EFaturaValidator.is_available():
+            logger.warning('e-Fatura XSD validation skipped: lxml or EFATURA_XSD_DIR (%s) missing', EFATURA_XSD_DIR)
+            return []
+
+        errors = EFaturaValidator.validate(xml_content)
+        if errors:
+            if mode == 'strict':
+                raise EFaturaValidationError(errors)
+            logger.warning('e-Fatura XML does not conform to the XSD (%d error(s)): %s', len(errors), errors[0])
+        return errors
+
+    @staticmethod
+    def validate_directory(directory, workers=0):
+        """
+        Validate every stored .xml document under a directory.
+
+        Args:
+            directory: Directory to scan (recursively)
+            workers: Worker processes (0: validate in this process)
+
+        Yields:
+            tuple: (file path, list of errors) for each document
+        """
+        paths = sorted(
+            os.path.join(folder, name)
+            for folder, _, names in os.walk(directory)
+            for name in names
+            if name.endswith('.xml')
+        )
+
+        if not workers:
+            for path in paths:
+                yield _validate_file(path, EFATURA_XSD_DIR)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(
+                _validate_file,
+                paths,
+                [EFATURA_XSD_DIR] * len(paths),
+                chunksize=max(1, len(paths) // (workers * 4))
+            )
@@ -8,8 +8,9 @@ This service handles:
 - Digital signature
 """
 import hashlib
-from datetime import date, datetime
-from django.db import transaction
+from datetime import datetime
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from apps.common.models import CompanySettings
 
 
@@ -19,57 +20,127 @@ class FiscalService:
     """
 
     @staticmethod
-    def generate_invoice_number(invoice_type='FT'):
+    def get_series(invoice_type, company_settings=None):
         """
-        Generate sequential invoice number in format: SÉRIE/ANO/NÚMERO
-        Example: FT A/2025/00001
+        Get the document series configured for an invoice type.
 
         Args:
             invoice_type: Type of invoice ('FT', 'NC', 'TV', 'FR')
+            company_settings: CompanySettings instance (loaded when omitted)
 
         Returns:
-            str: Invoice number like "FT A/2025/00001"
+            str: Series like "FT A"
         """
-        from apps.payments.models import Payment
-
-        company_settings = CompanySettings.get_instance()
+        if company_settings is None:
+            company_settings = CompanySettings.get_instance()
 
-        # Get series based on invoice type
         series_map = {
             'FT': company_settings.invoice_series,
             'NC': company_settings.credit_note_series,
             'TV': company_settings.receipt_series,
             'FR': company_settings.invoice_series,  # Same as FT
         }
-        series = series_map.get(invoice_type, 'FT A')
+        return series_map.get(invoice_type, 'FT A')
 
-        # Get current year
-        current_year = date.today().year
+    @staticmethod
+    def _last_issued_number(series, year, invoice_type):
+        """
+        Highest number already issued for a series/year/type, from the invoices themselves.
+        Only used to seed a new FiscalSequence row.
+        """
+        from apps.payments.models import Payment
 
-        # Find last invoice number for this series/year
-        last_payment = Payment.objects.filter(
-            invoice_no__startswith=f"{series}/{current_year}/",
+        last_number = 0
+        for invoice_no in Payment.objects.filter(
+            invoice_no__startswith=f"{series}/{year}/",
             invoice_type=invoice_type
-        ).order_by('-invoice_no').first()
-
-        if last_payment and last_payment.invoice_no:
-            # Extract number from last invoice (e.g., "FT A/2025/00123" -> 123)
-            parts = last_payment.invoice_no.split('/')
-            if len(parts) == 3:
-                try:
-                    last_number = int(parts[2])
-                    next_number = last_number + 1
-                except ValueError:
-                    next_number = 1
-            else:
-                next_number = 1
-        else:
-            next_number = 1
-
-        # Format: SÉRIE/ANO/NÚMERO (5 digits, zero-padded)
-        invoice_no = f"{series}/{current_year}/{next_number:05d}"
-
-        return invoice_no
+        ).values_list('invoice_no', flat=True).iterator():
+            # Extract number from invoice (e.g., "FT A/2025/00123" -> 123)
+            parts = invoice_no.split('/')
+            if len(parts) == 3 and parts[2].isdigit():
+                last_number = max(last_number, int(parts[2]))
+        return last_number
+
+    @staticmethod
+    def lock_chain(invoice_type):
+        """
+        Get the FiscalChain row (hash chain head) of a document type, locked until the transaction ends.
+
+        Every signer locks it before the numbering sequence, so invoices of one
+        type are chained one at a time whatever series or year they belong to.
+        A missing row is created and seeded with the hash of the last signed invoice.
+
+        Returns:
+            FiscalChain: Locked chain head
+        """
+        from apps.payments.models import FiscalChain
+
+        chain = FiscalChain.objects.select_for_update().filter(invoice_type=invoice_type).first()
+        if chain:
+            return chain
+
+        try:
+            with transaction.atomic():
+                FiscalChain.objects.create(
+                    invoice_type=invoice_type,
+                    last_hash=FiscalService.get_previous_invoice_hash(invoice_type)
+                )
+        except IntegrityError:
+            # Created concurrently by another signer
+            pass
+        return FiscalChain.objects.select_for_update().get(invoice_type=invoice_type)
+
+    @staticmethod
+    def lock_sequence(series, year, invoice_type):
+        """
+        Get the FiscalSequence row for a series/year/type, locked until the transaction ends.
+
+        A missing row is created and seeded with the last number already issued.
+
+        Returns:
+            FiscalSequence: Locked sequence row
+        """
+        from apps.payments.models import FiscalSequence
+
+        lookup = {'series': series, 'year': year, 'invoice_type': invoice_type}
+        sequence = FiscalSequence.objects.select_for_update().filter(**lookup).first()
+        if sequence:
+            return sequence
+
+        try:
+            with transaction.atomic():
+                FiscalSequence.objects.create(
+                    last_number=FiscalService._last_issued_number(series, year, invoice_type),
+                    **lookup
+                )
+        except IntegrityError:
+            # Created concurrently by another signer
+            pass
+        return FiscalSequence.objects.select_for_update().get(**lookup)
+
+    @staticmethod
+    def format_invoice_number(series, year, number):
+        """Format: SÉRIE/ANO/NÚMERO (at least 5 digits, zero-padded)."""
+        return f"{series}/{year}/{number:05d}"
+
+    @staticmethod
+    def compute_hash(invoice_date, invoice_no, grand_total, previous_hash):
+        """
+        SHA-256 of invoice_date + invoice_no + grand_total + previous_hash.
+
+        Pure function over the stored values, so chain verification can hash
+        rows straight from a values_list() query.
+
+        Returns:
+            str: SHA-256 hash (64 characters)
+        """
+        invoice_date_str = invoice_date.strftime('%Y-%m-%d') if invoice_date else ''
+        grand_total_str = f"{float(grand_total):.2f}"
+
+        # Concatenate for hash (first invoice will have empty previous_hash)
+        hash_string = f"{invoice_date_str}{invoice_no or ''}{grand_total_str}{previous_hash or ''}"
+
+        return hashlib.sha256(hash_string.encode('utf-8')).hexdigest()
 
     @staticmethod
     def calculate_invoice_hash(payment):
@@ -85,25 +156,20 @@ class FiscalService:
         Returns:
             str: SHA-256 hash (64 characters)
         """
-        # Get data for hash calculation
-        invoice_date_str = payment.invoice_date.strftime('%Y-%m-%d') if payment.invoice_date else ''
-        invoice_no = payment.invoice_no or ''
-        grand_total_str = f"{float(payment.order.grandTotal):.2f}"
-        previous_hash = payment.previous_invoice_hash if payment.previous_invoice_hash else ''
-
-        # Concatenate for hash (first invoice will have empty previous_hash)
-        hash_string = f"{invoice_date_str}{invoice_no}{grand_total_str}{previous_hash}"
-
-        # Calculate SHA-256
-        hash_object = hashlib.sha256(hash_string.encode('utf-8'))
-        invoice_hash = hash_object.hexdigest()
-
-        return invoice_hash
+        return FiscalService.compute_hash(
+            payment.invoice_date,
+            payment.invoice_no,
+            payment.order.grandTotal,
+            payment.previous_invoice_hash
+        )
 
     @staticmethod
     def get_previous_invoice_hash(invoice_type='FT'):
         """
-        Get the hash of the previous invoice (for hash chaining).
+        Get the hash of the previous invoice (for hash chaining) from the invoices themselves.
+
+        Signing reads the chain head from FiscalChain.last_hash; this query is
+        only used to seed the chain row of a document type.
 
         For the FIRST invoice, returns empty string '' which is the standard
         for starting a hash chain in SAF-T CV.
@@ -114,34 +180,34 @@ class FiscalService:
         Returns:
             str: Previous invoice hash, or empty string for first invoice
         """
-        from apps.payments.models import Payment
+        from apps.payments.services.hash_chain_service import HashChainService
 
-        # Find last signed invoice of this type
-        last_payment = Payment.objects.filter(
-            invoice_type=invoice_type,
-            is_signed=True,
+        # Find last signed invoice of this type (in the order it was chained)
+        last_hash = HashChainService.signed_invoices(invoice_type).filter(
             invoice_hash__isnull=False
-        ).order_by('-invoice_date', '-paymentID').first()
+        ).reverse().values_list('invoice_hash', flat=True).first()
 
-        if last_payment:
-            return last_payment.invoice_hash
+        if last_hash:
+            return last_hash
 
         # First invoice: use empty string as previous hash
         return ''
 
     @staticmethod
-    def generate_iud(payment):
+    def generate_iud(payment, company_settings=None):
         """
         Generate IUD (Identificador Único do Documento) - 45 characters
         Format: País + Data + NIF + Tipo + Série/Número
 
         Args:
             payment: Payment instance
+            company_settings: CompanySettings instance (loaded when omitted)
 
         Returns:
             str: IUD (45 characters)
         """
-        company_settings = CompanySettings.get_instance()
+        if company_settings is None:
+            company_settings = CompanySettings.get_instance()
 
         # Components
         country = 'CV'  # Cabo Verde
@@ -159,31 +225,35 @@ class FiscalService:
 
         return iud
 
-    @staticmethod
-    @transaction.atomic
-    def sign_invoice(payment):
-        """
-        Sign an invoice (generate all fiscal fields and mark as signed).
-        This makes the invoice legally valid and immutable.
+    # Fields written when an invoice is signed
+    SIGNATURE_FIELDS = [
+        'invoice_no', 'invoice_date', 'previous_invoice_hash', 'invoice_hash', 'hash_algorithm',
+        'iud', 'software_certificate_number', 'is_signed', 'signed_at', 'updated_at',
+    ]
 
-        Args:
-            payment: Payment instance
+    @staticmethod
+    def _invoice_date(payment, signed_at):
+        """Invoice date of a payment being signed: its own, else the local date of signing."""
+        return payment.invoice_date or timezone.localdate(signed_at)
 
-        Returns:
-            Payment: Updated payment with fiscal fields
+    @staticmethod
+    def _apply_signature(payment, sequence, chain, company_settings, signed_at):
+        """
+        Fill in the fiscal fields of payment (in memory) and advance the locked
+        sequence's number and chain head accordingly.
         """
-        company_settings = CompanySettings.get_instance()
-
         # 1. Generate invoice number
         if not payment.invoice_no:
-            payment.invoice_no = FiscalService.generate_invoice_number(payment.invoice_type)
+            sequence.last_number += 1
+            payment.invoice_no = FiscalService.format_invoice_number(
+                sequence.series, sequence.year, sequence.last_number
+            )
 
-        # 2. Set invoice date
-        if not payment.invoice_date:
-            payment.invoice_date = date.today()
+        # 2. Set invoice date (its year is the sequence's year)
+        payment.invoice_date = FiscalService._invoice_date(payment, signed_at)
 
-        # 3. Get previous invoice hash (for chain)
-        payment.previous_invoice_hash = FiscalService.get_previous_invoice_hash(payment.invoice_type)
+        # 3. Previous invoice hash (for chain) is the current chain head
+        payment.previous_invoice_hash = chain.last_hash
 
         # 4. Calculate invoice hash
         payment.invoice_hash = FiscalService.calculate_invoice_hash(payment)
@@ -192,24 +262,128 @@ class FiscalService:
         payment.hash_algorithm = 'SHA256'
 
         # 6. Generate IUD
-        payment.iud = FiscalService.generate_iud(payment)
+        payment.iud = FiscalService.generate_iud(payment, company_settings)
 
         # 7. Set software certificate number
         payment.software_certificate_number = company_settings.software_certificate_number
 
         # 8. Mark as signed
         payment.is_signed = True
-        payment.signed_at = datetime.now()
+        payment.signed_at = signed_at
+        payment.updated_at = signed_at
+
+        chain.last_hash = payment.invoice_hash
+
+    @staticmethod
+    @transaction.atomic
+    def sign_invoice(payment):
+        """
+        Sign an invoice (generate all fiscal fields and mark as signed).
+        This makes the invoice legally valid and immutable.
+
+        Args:
+            payment: Payment instance
+
+        Returns:
+            Payment: Updated payment with fiscal fields
+        """
+        company_settings = CompanySettings.get_instance()
+
+        # Lock the chain head, then the sequence: signing is serialized per document type
+        chain = FiscalService.lock_chain(payment.invoice_type)
+        # Taken under the lock so signing time follows chain order (see HashChainService.chain_order)
+        signed_at = timezone.now()
+
+        # Numbered in the year of the invoice date
+        series = FiscalService.get_series(payment.invoice_type, company_settings)
+        year = FiscalService._invoice_date(payment, signed_at).year
+        sequence = FiscalService.lock_sequence(series, year, payment.invoice_type)
+
+        FiscalService._apply_signature(payment, sequence, chain, company_settings, signed_at)
 
-        # 9. Save payment
+        # Save payment and advance the sequence and chain head
         payment.save()
+        sequence.save(update_fields=['last_number', 'updated_at'])
+        chain.save(update_fields=['last_hash', 'updated_at'])
+
+        # Queue the e-Fatura submission (committed together with the signature)
+        from apps.payments.services.efatura_submission_service import EFaturaSubmissionService
+        EFaturaSubmissionService.enqueue([payment])
 
         return payment
 
+    @staticmethod
+    @transaction.atomic
+    def sign_invoices(queryset):
+        """
+        Sign many invoices in one transaction (e.g. end-of-day closing).
+
+        Settings are loaded once, each document type's sequence is locked once
+        and its chain head is carried in memory, and the fiscal fields are
+        written with a single bulk_update.
+
+        Args:
+            queryset: Payments to sign (already signed payments are skipped)
+
+        Returns:
+            list: Signed payments, in chain order (paymentID)
+        """
+        from apps.payments.models import Payment
+
+        # Lock the payments themselves so nobody signs or edits them meanwhile
+        payments = list(
+            queryset.filter(is_signed=False)
+            .select_for_update(of=('self',))
+            .select_related('order')
+            .order_by('paymentID')
+        )
+        if not payments:
+            return []
+
+        company_settings = CompanySettings.get_instance()
+
+        # Lock chain heads, then sequences, in a fixed order so concurrent batches cannot deadlock
+        chains = {
+            invoice_type: FiscalService.lock_chain(invoice_type)
+            for invoice_type in sorted({payment.invoice_type for payment in payments})
+        }
+
+        # Taken under the locks so signing time follows chain order (see HashChainService.chain_order)
+        signed_at = timezone.now()
+
+        # Each invoice is numbered in the year of its invoice date
+        sequences = {}
+        for invoice_type, year in sorted({
+            (payment.invoice_type, FiscalService._invoice_date(payment, signed_at).year)
+            for payment in payments
+        }):
+            series = FiscalService.get_series(invoice_type, company_settings)
+            sequences[invoice_type, year] = FiscalService.lock_sequence(series, year, invoice_type)
+
+        for payment in payments:
+            sequence = sequences[payment.invoice_type, FiscalService._invoice_date(payment, signed_at).year]
+            FiscalService._apply_signature(payment, sequence, chains[payment.invoice_type], company_settings, signed_at)
+
+        Payment.objects.bulk_update(payments, FiscalService.SIGNATURE_FIELDS, batch_size=500)
+        for sequence in sequences.values():
+            sequence.save(update_fields=['last_number', 'updated_at'])
+        for chain in chains.values():
+            chain.save(update_fields=['last_hash', 'updated_at'])
+
+        # Queue the e-Fatura submissions (committed together with the signatures)
+        from apps.payments.services.efatura_submission_service import EFaturaSubmissionService
+        EFaturaSubmissionService.enqueue(payments)
+
+        return payments
+
     @staticmethod
     def validate_hash_chain(payment):
         """
-        Validate that the invoice hash chain is intact.
+        Validate that the invoice hash chain is intact around one invoice.
+
+        Checks the invoice's own hash and that its previous_invoice_hash is the
+        hash of the invoice signed just before it (same document type).
+        Use HashChainService.verify_chain() for a whole chain.
 
         Args:
             payment: Payment instance
@@ -217,8 +391,12 @@ class FiscalService:
         Returns:
             bool: True if hash chain is valid
         """
-        # Recalculate hash
-        calculated_hash = FiscalService.calculate_invoice_hash(payment)
+        from apps.payments.services.hash_chain_service import HashChainService
+
+        # Recalculate hash and compare with stored hash
+        if FiscalService.calculate_invoice_hash(payment) != payment.invoice_hash:
+            return False
 
-        # Compare with stored hash
-        return calculated_hash == payment.invoice_hash
+        # Link to the predecessor in the chain
+        predecessor_hash = HashChainService.predecessor_hash(payment)
+        return (payment.previous_invoice_hash or '') == (predecessor_hash or '')
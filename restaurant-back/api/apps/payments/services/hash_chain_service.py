@@ -0,0 +1,186 @@
+"""
+Hash Chain Verification Service
+
+Walks the SAF-T CV hash chain of each document type and checks, for every
+signed invoice, that:
+- its stored hash matches the hash recomputed from its data, and
+- its previous_invoice_hash is the hash of the invoice signed before it.
+
+Rows are streamed with iterator(chunk_size) from a single values_list()
+query (order grand total joined in), so memory stays bounded however long
+the chain is.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.db.models import F, Q
+
+from .fiscal_service import FiscalService
+
+
+# Columns streamed per invoice (order matters: see _recompute)
+CHAIN_FIELDS = (
+    'paymentID',
+    'invoice_no',
+    'invoice_date',
+    'order__grandTotal',
+    'previous_invoice_hash',
+    'invoice_hash',
+)
+
+
+def _recompute(row):
+    """Whether a streamed row's stored hash matches its data (top-level so worker processes can run it)."""
+    _, invoice_no, invoice_date, grand_total, previous_hash, invoice_hash = row
+    return FiscalService.compute_hash(invoice_date, invoice_no, grand_total, previous_hash) == invoice_hash
+
+
+class HashChainService:
+    """
+    Service for verifying invoice hash chains.
+    """
+
+    DEFAULT_CHUNK_SIZE = 2000
+
+    @staticmethod
+    def chain_order():
+        """
+        Order in which invoices of one document type were chained.
+
+        FiscalService.sign_invoice chains each invoice onto the last one signed
+        (under the FiscalChain lock), so the chain follows signing time; paymentID
+        breaks ties. Invoices signed before signed_at existed come first.
+        """
+        return [F('signed_at').asc(nulls_first=True), 'paymentID']
+
+    @staticmethod
+    def signed_invoices(invoice_type):
+        """Signed invoices of one document type, in chain order."""
+        from apps.payments.models import Payment
+
+        return Payment.objects.filter(
+            invoice_type=invoice_type,
+            is_signed=True
+        ).order_by(*HashChainService.chain_order())
+
+    @staticmethod
+    def predecessor_hash(payment):
+        """
+        Hash of the invoice chained just before payment (None for the first invoice).
+        """
+        predecessors = HashChainService.signed_invoices(payment.invoice_type)
+        if payment.signed_at is None:
+            predecessors = predecessors.filter(signed_at__isnull=True, paymentID__lt=payment.pk)
+        else:
+            predecessors = predecessors.filter(
+                Q(signed_at__isnull=True) |
+                Q(signed_at__lt=payment.signed_at) |
+                Q(signed_at=payment.signed_at, paymentID__lt=payment.pk)
+            )
+        return predecessors.reverse().values_list('invoice_hash', flat=True).first()
+
+    @staticmethod
+    def _chunks(rows, chunk_size):
+        """Split an iterator into lists of at most chunk_size rows."""
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def _verify_type(invoice_type, chunk_size, executor, filters=None):
+        """Stream one document type's chain (or the window selected by filters) and collect its stats."""
+        stats = {
+            'invoice_type': invoice_type,
+            'invoices': 0,
+            'first_invoice_no': None,
+            'last_invoice_no': None,
+            'hash_mismatches': 0,
+            'broken_links': 0,
+            'first_broken': None,
+        }
+
+        invoices = HashChainService.signed_invoices(invoice_type)
+        expected_previous = ''
+        if filters:
+            invoices = invoices.filter(**filters)
+            # The window's first invoice links to its predecessor outside the window
+            first = invoices.only('paymentID', 'invoice_type', 'signed_at').first()
+            if first:
+                expected_previous = HashChainService.predecessor_hash(first) or ''
+
+        rows = invoices.values_list(*CHAIN_FIELDS).iterator(chunk_size=chunk_size)
+
+        for chunk in HashChainService._chunks(rows, chunk_size):
+            if executor:
+                hashes_ok = executor.map(_recompute, chunk, chunksize=max(1, chunk_size // 8))
+            else:
+                hashes_ok = map(_recompute, chunk)
+
+            for row, hash_ok in zip(chunk, hashes_ok):
+                payment_id, invoice_no, _, _, previous_hash, invoice_hash = row
+                link_ok = (previous_hash or '') == expected_previous
+
+                if not hash_ok:
+                    stats['hash_mismatches'] += 1
+                if not link_ok:
+                    stats['broken_links'] += 1
+                if (not hash_ok or not link_ok) and stats['first_broken'] is None:
+                    stats['first_broken'] = {
+                        'paymentID': payment_id,
+                        'invoice_no': invoice_no,
+                        'reason': 'hash mismatch' if not hash_ok else 'previous hash does not match predecessor',
+                        'position': stats['invoices'] + 1,
+                    }
+
+                if stats['first_invoice_no'] is None:
+                    stats['first_invoice_no'] = invoice_no
+                stats['last_invoice_no'] = invoice_no
+                stats['invoices'] += 1
+                expected_previous = invoice_hash or ''
+
+        stats['is_valid'] = stats['first_broken'] is None
+        return stats
+
+    @staticmethod
+    def verify_chain(invoice_types=None, chunk_size=None, workers=0, filters=None):
+        """
+        Verify the full hash chain of each document type.
+
+        Args:
+            invoice_types: Document types to verify (default: every type with signed invoices)
+            chunk_size: Rows fetched and hashed per batch (default: 2000)
+            workers: Worker processes for recomputing hashes (0: hash in this process).
+                     SHA-256 over a short string is cheap, so workers only pay
+                     off on very large chains.
+            filters: Payment lookups narrowing each chain to a window, e.g. a
+                     signed_at range (default: the whole chain)
+
+        Returns:
+            dict: {"is_valid": bool, "chains": [per-type stats, ...]}
+        """
+        from apps.payments.models import Payment
+
+        chunk_size = chunk_size or HashChainService.DEFAULT_CHUNK_SIZE
+        if invoice_types is None:
+            invoice_types = list(
+                Payment.objects.filter(is_signed=True)
+                .order_by('invoice_type')
+                .values_list('invoice_type', flat=True)
+                .distinct()
+            )
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+        try:
+            chains = [
+                HashChainService._verify_type(invoice_type, chunk_size, executor, filters)
+                for invoice_type in invoice_types
+            ]
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return {
+            'is_valid': all(chain['is_valid'] for chain in chains),
+            'chains': chains,
+        }
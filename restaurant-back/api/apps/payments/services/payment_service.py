@@ -0,0 +1,244 @@
+"""
+Payment Service
+
+Processes order payments as a single transaction:
+- Row locks on the order and the cash register (no concurrent overpayment)
+- Idempotency keys (retried requests return the original payment)
+- Bulk insert of the paid items
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from apps.cash_register.models import CashRegister
+from apps.common.feature_flags import FeatureFlags, Modules
+from apps.common.utils import IVA_RATE
+from apps.orders.models import Order
+from apps.tables.models import Table
+
+
+class PaymentError(Exception):
+    """
+    A payment request that cannot be processed.
+
+    Attributes:
+        payload: Error body for the API response ({'error': ..., 'hint': ...})
+    """
+
+    def __init__(self, error, **extra):
+        super().__init__(error)
+        self.payload = {'error': error, **extra}
+
+
+class IdempotencyConflict(PaymentError):
+    """The idempotency key was already used for a different payment request."""
+
+
+class PaymentService:
+    """
+    Service for processing order payments.
+    """
+
+    IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+    @staticmethod
+    def find_replay(idempotency_key, order_id, amount, payment_method):
+        """
+        Find the payment already created for an idempotency key.
+
+        Args:
+            idempotency_key: Client-supplied key (or None)
+            order_id, amount, payment_method: The retried request
+
+        Returns:
+            Payment or None
+
+        Raises:
+            IdempotencyConflict: If the key belongs to a different payment request
+        """
+        from apps.payments.models import Payment
+
+        if not idempotency_key:
+            return None
+
+        payment = Payment.objects.filter(idempotency_key=idempotency_key).first()
+        if payment is None:
+            return None
+
+        if (payment.order_id, payment.amount, payment.payment_method) != (int(order_id), amount, payment_method):
+            raise IdempotencyConflict(
+                'Idempotency key already used for a different payment.',
+                hint='Generate a new key for each new payment.'
+            )
+        return payment
+
+    @staticmethod
+    def _paid_items(payment, order, selected_items):
+        """
+        Build (unsaved) PaymentItems for the selected menu items.
+
+        Quantities are capped at what is still unpaid on each order line.
+
+        Returns:
+            tuple: (list of PaymentItem, dict of order_item_id -> quantity paid)
+        """
+        from apps.payments.models import PaymentItem
+
+        try:
+            # Map of menu_item_id -> quantity to pay
+            items_to_pay = {
+                int(item_data['menu_item_id']): int(item_data['quantity'])
+                for item_data in selected_items
+            }
+        except (KeyError, TypeError, ValueError):
+            raise PaymentError(
+                'Invalid selected_items.',
+                hint='Expected a list of {"menu_item_id": id, "quantity": n}.'
+            )
+
+        paid_items = []
+        quantity_deltas = {}
+        for item in order.items.filter(menu_item_id__in=items_to_pay.keys()).order_by('id'):
+            # Don't allow paying more than what's remaining (invalid quantities are skipped)
+            quantity_to_pay = min(items_to_pay[item.menu_item_id], item.remaining_quantity())
+            if quantity_to_pay <= 0:
+                continue
+
+            # Amount for the specific quantity (with IVA)
+            paid_items.append(PaymentItem(
+                payment=payment,
+                order_item=item,
+                quantity_paid=quantity_to_pay,
+                amount_paid=item.price * quantity_to_pay * (1 + IVA_RATE)
+            ))
+            quantity_deltas[item.pk] = quantity_to_pay
+
+        return paid_items, quantity_deltas
+
+    @staticmethod
+    def _release_inventory(order):
+        """
+        Release reserved inventory after the order is fully paid.
+        Only works if inventory module is enabled (Premium feature).
+        """
+        if not FeatureFlags.is_module_enabled(Modules.INVENTORY):
+            return
+
+        # Import here to avoid circular imports
+        from apps.inventory.services import InventoryService
+
+        quantities = {}
+        for menu_item_id, quantity in order.items.filter(
+            menu_item__is_quantifiable=True
+        ).values_list('menu_item_id', 'quantity'):
+            quantities[menu_item_id] = quantities.get(menu_item_id, 0) + quantity
+
+        InventoryService.release_reserved_stock_batch(quantities)
+
+    @staticmethod
+    @transaction.atomic
+    def process_payment(user, order_id, amount, payment_method, selected_items=None, idempotency_key=None):
+        """
+        Take a payment for an order.
+
+        The order and the user's open cash register are locked for the whole
+        transaction, so concurrent payments for the same order are serialized
+        and each one sees the amount already paid by the others.
+
+        Args:
+            user: User processing the payment
+            order_id: ID of the order being paid
+            amount: Decimal amount (partial payments allowed)
+            payment_method: Payment method code
+            selected_items: Optional [{"menu_item_id": id, "quantity": n}] being paid
+            idempotency_key: Optional client key; a retry with the same key
+                             returns the original payment instead of charging again
+
+        Returns:
+            tuple: (Payment, replayed) where replayed is True for a retried request
+
+        Raises:
+            Order.DoesNotExist: If the order does not exist
+            PaymentError: If the payment is rejected
+        """
+        from apps.payments.models import Payment, PaymentItem
+        from apps.orders.services import PaidStateService
+
+        # Lock the order first: retries with the same key wait here for the original request
+        order = Order.objects.select_for_update(of=('self',)).select_related('customer').get(pk=order_id)
+
+        payment = PaymentService.find_replay(idempotency_key, order_id, amount, payment_method)
+        if payment:
+            return payment, True
+
+        if amount <= 0:
+            raise PaymentError('Invalid payment amount.', hint='Amount must be greater than zero.')
+
+        # Check how much is still owed (prevent overpayment)
+        remaining = order.remaining_amount()
+        if amount > remaining:
+            raise PaymentError(
+                'Payment amount exceeds remaining balance.',
+                remaining=str(remaining),
+                attempted=str(amount),
+                hint=f'This order only needs €{remaining}. Please adjust the payment amount.'
+            )
+
+        # Verify user has an open cash register
+        cash_register = CashRegister.objects.select_for_update().filter(user=user, is_open=True).first()
+        if not cash_register:
+            raise PaymentError(
+                'No open cash register found for this user.',
+                hint='Please open a cash register before processing payments.'
+            )
+
+        payment = Payment(
+            order=order,
+            amount=amount,
+            payment_method=payment_method,
+            payment_status='COMPLETED',
+            processed_by=user,
+            cash_register=cash_register,
+            idempotency_key=idempotency_key or None
+        )
+
+        # Auto-copy customer from order (if exists)
+        if order.customer:
+            payment.customer = order.customer
+            payment.customer_name = order.customer.full_name
+            payment.customer_tax_id = order.customer.tax_id
+
+        try:
+            with transaction.atomic():
+                payment.save()
+        except (IntegrityError, ValidationError) as e:
+            # Duplicate keys fail Payment.save()'s unique check, or the INSERT if the other row committed after it
+            duplicate_key = isinstance(e, IntegrityError) or 'idempotency_key' in getattr(e, 'error_dict', {})
+            if not (idempotency_key and duplicate_key):
+                raise
+            # Only a request for another order (not holding this order's lock) can race us to the key
+            raise IdempotencyConflict(
+                'Idempotency key already used for a different payment.',
+                hint='Generate a new key for each new payment.'
+            )
+
+        # Track which items were paid (if specified)
+        if selected_items:
+            paid_items, quantity_deltas = PaymentService._paid_items(payment, order, selected_items)
+            PaymentItem.objects.bulk_create(paid_items)
+            PaidStateService.apply_quantity_deltas(quantity_deltas)
+
+        # Add transaction to cash register
+        cash_register.add_transaction(amount, payment_method)
+
+        # Update order payment status based on the amount paid AFTER this payment
+        PaidStateService.refresh_payment_status(order)
+        if order.paymentStatus == 'PAID':
+            # Release reserved inventory after successful payment
+            PaymentService._release_inventory(order)
+
+        # Update table status if order has a table
+        Table.objects.filter(order_details__order=order).update(
+            status=Table.StatusChoices.AVAILABLE if order.paymentStatus == 'PAID' else Table.StatusChoices.OCCUPIED
+        )
+
+        return payment, False
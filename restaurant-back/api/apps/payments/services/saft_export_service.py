@@ -4,16 +4,25 @@ SAF-T CV Export Service
 Generates XML file compliant with SAF-T CV (Standard Audit File for Tax - Cabo Verde)
 According to Portaria n.º 47/2021 and Decreto-Lei n.º 79/2020
 """
-from datetime import datetime, date
+import hashlib
+import logging
+import multiprocessing
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, timedelta
 from decimal import Decimal
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+from xml.etree.ElementTree import Element, SubElement, indent, tostring
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Count, Max, Prefetch, Sum
 from apps.common.models import CompanySettings
 from apps.payments.models import Payment
-from apps.orders.models import Order
+from apps.orders.models import Order, OrderItem
 from apps.menu.models import MenuItem
 from apps.inventory.models import InventoryItem
+from .saft_workers import init_partition_worker, render_invoice_partition
 
 # Import new models (with try/except for backwards compatibility)
 try:
@@ -26,51 +35,261 @@ try:
 except ImportError:
     Supplier = None
 
+logger = logging.getLogger(__name__)
+
+# Pre-rendered master file fragments (see SAFTExportService._master_file_fragment)
+SAFT_MASTER_FILE_CACHE_DIR = getattr(
+    settings,
+    'SAFT_MASTER_FILE_CACHE_DIR',
+    os.path.join(settings.BASE_DIR, 'saft_cache')
+)
+
 
 class SAFTExportService:
     """
     Service to export data in SAF-T CV format.
     """
 
-    def __init__(self, start_date: date, end_date: date):
+    NAMESPACE = 'urn:OECD:Standard:AuditFile-CV:PT_1.04_01'
+    INDENT = '  '
+    # Rows fetched per round-trip while streaming invoices
+    CHUNK_SIZE = 500
+    # Size of the byte chunks handed to the response/file
+    BUFFER_SIZE = 64 * 1024
+    # Bump when the Customer/Supplier/Product markup changes (invalidates cached fragments)
+    MASTER_FILE_FORMAT = 1
+
+    def __init__(self, start_date: date, end_date: date, workers: int = 0, progress=None):
         """
         Initialize SAF-T export for a date range.
 
         Args:
             start_date: Start date for export
             end_date: End date for export
+            workers: Worker processes rendering invoices month by month
+                     (0: render everything in this process)
+            progress: Optional callable, called with the number of invoices
+                      written so far (about every CHUNK_SIZE invoices)
         """
         self.start_date = start_date
         self.end_date = end_date
+        self.workers = workers
+        self.progress = progress
+        self.invoices_done = 0
         self.company_settings = CompanySettings.get_instance()
 
+    def data_version(self) -> str:
+        """
+        Fingerprint of the data an export of this range is built from.
+
+        Covers the range's signed invoices, the orders and order lines they
+        render, the master files and the company settings, so two exports with
+        the same version have the same content (apart from DateCreated).
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        invoices = self._invoices_queryset()
+        order_ids = invoices.order_by().values('order_id')
+        parts = [
+            self._watermark(invoices.order_by()),
+            self._watermark(Order.objects.filter(pk__in=order_ids)),
+            self._watermark(OrderItem.objects.filter(order_id__in=order_ids)),
+            self.company_settings.updated_at,
+        ]
+        parts.extend(
+            self._watermark(source) for _, source, _ in self._master_file_sections()
+        )
+
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
     def generate_saft_xml(self) -> str:
         """
         Generate complete SAF-T CV XML.
 
+        Holds the whole document in memory; prefer iter_saft_xml() (or
+        export_to_file) for large date ranges.
+
         Returns:
             str: XML string
         """
-        # Create root element
-        audit_file = Element('AuditFile')
-        audit_file.set('xmlns', 'urn:OECD:Standard:AuditFile-CV:PT_1.04_01')
+        return ''.join(self.iter_saft_xml())
+
+    def iter_saft_xml(self):
+        """
+        Generate the SAF-T CV XML incrementally.
+
+        Each record (header, customer, product, invoice...) is built as a small
+        Element, rendered and released before the next one is read from the
+        database, so memory use does not depend on the date range.
+
+        Yields:
+            str: Consecutive fragments of the XML document
+        """
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield f'<AuditFile xmlns="{self.NAMESPACE}">\n'
 
         # Add Header
-        self._add_header(audit_file)
+        header = Element('AuditFile')
+        self._add_header(header)
+        yield from self._render_children(header, level=1)
 
         # Add Master Files
-        master_files = SubElement(audit_file, 'MasterFiles')
-        self._add_customers(master_files)
-        self._add_suppliers(master_files)
-        self._add_products(master_files)
+        yield self._open_tag('MasterFiles', level=1)
+        for name, source, builder in self._master_file_sections():
+            yield self._master_file_fragment(name, source, builder, level=2)
+        master_files = Element('MasterFiles')
         self._add_tax_table(master_files)
+        yield from self._render_children(master_files, level=2)
+        yield self._close_tag('MasterFiles', level=1)
 
         # Add Source Documents
-        source_documents = SubElement(audit_file, 'SourceDocuments')
-        self._add_sales_invoices(source_documents)
+        yield self._open_tag('SourceDocuments', level=1)
+        yield from self._iter_sales_invoices(level=2)
+        yield self._close_tag('SourceDocuments', level=1)
+
+        yield '</AuditFile>\n'
+
+    def iter_saft_bytes(self, compress=False):
+        """
+        UTF-8 encoded SAF-T XML in chunks of about BUFFER_SIZE bytes.
+
+        Args:
+            compress: Gzip the output
+
+        Yields:
+            bytes: Consecutive chunks of the (optionally gzipped) file
+        """
+        # wbits=31: zlib stream with a gzip header/trailer
+        compressor = zlib.compressobj(wbits=31) if compress else None
+
+        buffer, size = [], 0
+        for fragment in self.iter_saft_xml():
+            data = fragment.encode('utf-8')
+            buffer.append(data)
+            size += len(data)
+            if size >= self.BUFFER_SIZE:
+                chunk = b''.join(buffer)
+                buffer, size = [], 0
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+
+        chunk = b''.join(buffer)
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+
+    def _open_tag(self, tag: str, level: int) -> str:
+        return f'{self.INDENT * level}<{tag}>\n'
+
+    def _close_tag(self, tag: str, level: int) -> str:
+        return f'{self.INDENT * level}</{tag}>\n'
+
+    def _render(self, elem: Element, level: int) -> str:
+        """Pretty-print one element (and its subtree) at the given nesting level."""
+        indent(elem, space=self.INDENT, level=level)
+        elem.tail = None
+        return f'{self.INDENT * level}{tostring(elem, encoding="unicode")}\n'
+
+    def _render_children(self, parent: Element, level: int):
+        """Render parent's children one by one, releasing each once rendered."""
+        for child in list(parent):
+            parent.remove(child)
+            yield self._render(child, level)
+
+    def _master_file_sections(self):
+        """
+        Master files built from the database, in document order.
+
+        Returns:
+            list: (name, source queryset or None, builder) tuples. The source
+                  is the queryset the builder renders; None means the section
+                  is not cached.
+        """
+        return [
+            (
+                'customers',
+                Customer.objects.filter(is_active=True) if Customer else None,
+                self._add_customers,
+            ),
+            (
+                'suppliers',
+                Supplier.objects.filter(is_active=True) if Supplier else None,
+                self._add_suppliers,
+            ),
+            ('products', MenuItem.objects.all(), self._add_products),
+        ]
+
+    @staticmethod
+    def _watermark(source):
+        """
+        Watermark of a set of rows: count, highest id and latest updated_at.
 
-        # Convert to pretty XML string
-        return self._prettify_xml(audit_file)
+        Any save() of a row bumps updated_at; adding or removing rows changes
+        the count or the highest id. (Queryset update() calls bypass auto_now
+        and must set updated_at themselves.)
+        """
+        if source is None:
+            return None
+        return source.aggregate(count=Count('pk'), last_id=Max('pk'), last_update=Max('updated_at'))
+
+    def _master_file_fragment(self, name, source, builder, level):
+        """
+        Rendered XML of one master file, reused from disk while its rows are unchanged.
+
+        Fragments are stored as <name>-<key>.xml, where the key hashes the
+        rows' watermark, so a stale fragment is never read; it is replaced
+        (and the old file removed) on the next export after a change.
+
+        Args:
+            name: Section name ('customers', 'suppliers', 'products')
+            source: Queryset of the rows the section renders (None: no caching)
+            builder: Method adding the section's elements to a parent element
+            level: Nesting level of the section's elements
+
+        Returns:
+            str: Pretty-printed XML of the section
+        """
+        def render():
+            container = Element('MasterFiles')
+            builder(container)
+            return ''.join(self._render_children(container, level))
+
+        watermark = self._watermark(source)
+        if watermark is None:
+            return render()
+
+        key = hashlib.sha256(
+            repr((self.MASTER_FILE_FORMAT, level, watermark)).encode('utf-8')
+        ).hexdigest()
+        file_path = os.path.join(SAFT_MASTER_FILE_CACHE_DIR, f'{name}-{key}.xml')
+
+        try:
+            with open(file_path, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        fragment = render()
+
+        # The cache is an optimization: a failed write must not fail the export
+        try:
+            os.makedirs(SAFT_MASTER_FILE_CACHE_DIR, exist_ok=True)
+            temp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(fragment)
+            os.replace(temp_path, file_path)
+
+            # Drop fragments of older versions of this section
+            for entry in os.scandir(SAFT_MASTER_FILE_CACHE_DIR):
+                if entry.name.startswith(f'{name}-') and entry.name.endswith('.xml') and entry.path != file_path:
+                    os.remove(entry.path)
+        except OSError:
+            logger.warning('Could not cache SAF-T %s fragment', name, exc_info=True)
+
+        return fragment
 
     def _add_header(self, parent: Element):
         """Add Header section"""
@@ -202,28 +421,130 @@ class SAFTExportService:
         SubElement(tax_entry, 'Description').text = 'IVA Normal'
         SubElement(tax_entry, 'TaxPercentage').text = '15.00'
 
-    def _add_sales_invoices(self, parent: Element):
-        """Add Sales Invoices"""
-        sales_invoices = SubElement(parent, 'SalesInvoices')
-
-        # Get all signed payments (invoices) in the date range
-        payments = Payment.objects.filter(
+    def _invoices_queryset(self):
+        """Signed payments (invoices) in the date range, in document order."""
+        return Payment.objects.filter(
             is_signed=True,
             invoice_date__gte=self.start_date,
             invoice_date__lte=self.end_date
-        ).select_related('order').order_by('invoice_date', 'invoice_no')
+        ).order_by('invoice_date', 'invoice_no')
 
-        # Number of entries
-        SubElement(sales_invoices, 'NumberOfEntries').text = str(payments.count())
+    def _invoices_with_lines(self, payments):
+        """
+        Load everything _add_invoice reads alongside the invoices.
 
-        # Total Debit and Credit
-        total_debit = sum(p.order.grandTotal for p in payments)
-        SubElement(sales_invoices, 'TotalDebit').text = f"{float(total_debit):.2f}"
-        SubElement(sales_invoices, 'TotalCredit').text = '0.00'
+        Order, customer and referenced document are joined in; order lines and
+        their menu items come from one prefetch query per chunk of invoices.
+        """
+        return payments.select_related(
+            'order__customer',
+            'referenced_document',
+        ).prefetch_related(
+            Prefetch(
+                'order__items',
+                queryset=OrderItem.objects.select_related('menu_item').order_by('id')
+            )
+        )
+
+    def _iter_sales_invoices(self, level: int):
+        """Stream the SalesInvoices section, one Invoice element at a time."""
+        yield self._open_tag('SalesInvoices', level)
+
+        payments = self._invoices_queryset()
+
+        # Number of entries and Total Debit in one query
+        totals = payments.aggregate(entries=Count('pk'), total_debit=Sum('order__grandTotal'))
+        total_debit = totals['total_debit'] or Decimal('0.00')
+
+        summary = Element('SalesInvoices')
+        SubElement(summary, 'NumberOfEntries').text = str(totals['entries'])
+        SubElement(summary, 'TotalDebit').text = f"{float(total_debit):.2f}"
+        SubElement(summary, 'TotalCredit').text = '0.00'
+        yield from self._render_children(summary, level + 1)
 
         # Add each invoice
-        for payment in payments:
-            self._add_invoice(sales_invoices, payment)
+        partitions = self._month_partitions()
+        if self.workers and len(partitions) > 1:
+            yield from self._iter_invoices_parallel(partitions, level + 1)
+        else:
+            yield from self._iter_invoices(level + 1)
+
+        yield self._close_tag('SalesInvoices', level)
+
+    def _iter_invoices(self, level: int):
+        """Stream the Invoice elements of the date range, one at a time."""
+        # Two queries per chunk: invoices, then their lines
+        payments = self._invoices_with_lines(self._invoices_queryset())
+        written = 0
+        for payment in payments.iterator(chunk_size=self.CHUNK_SIZE):
+            container = Element('SalesInvoices')
+            self._add_invoice(container, payment)
+            yield from self._render_children(container, level)
+
+            written += 1
+            if written == self.CHUNK_SIZE:
+                self._advance(written)
+                written = 0
+
+        if written:
+            self._advance(written)
+
+    def _advance(self, invoices: int):
+        """Count written invoices and report progress."""
+        self.invoices_done += invoices
+        if self.progress:
+            self.progress(self.invoices_done)
+
+    def _month_partitions(self):
+        """
+        Split the date range into calendar months.
+
+        Returns:
+            list: (first day, last day) pairs, in date order
+        """
+        partitions = []
+        start = self.start_date
+        while start <= self.end_date:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = min(next_month - timedelta(days=1), self.end_date)
+            partitions.append((start, end))
+            start = next_month
+        return partitions
+
+    def _iter_invoices_parallel(self, partitions, level: int):
+        """
+        Render each month's invoices in a worker process.
+
+        Invoices are ordered by date first, so concatenating the months in
+        order gives the same bytes as a serial run. At most two partitions
+        per worker are in flight, which bounds memory to a few months of XML.
+        Workers read through their own connections, so run parallel exports
+        on closed periods (no invoices being signed in the range).
+        """
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_partition_worker
+        )
+        try:
+            pending = deque()
+            remaining = iter(partitions)
+
+            def submit_next():
+                partition = next(remaining, None)
+                if partition:
+                    pending.append(executor.submit(render_invoice_partition, *partition, level))
+
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while pending:
+                fragment, invoices = pending.popleft().result()
+                submit_next()
+                yield fragment
+                self._advance(invoices)
+        finally:
+            executor.shutdown(cancel_futures=True)
 
     def _add_invoice(self, parent: Element, payment: Payment):
         """Add individual invoice (SAF-T CV compliant)"""
@@ -313,30 +634,26 @@ class SAFTExportService:
             if payment.previous_invoice_hash:
                 SubElement(invoice, 'PreviousHash').text = payment.previous_invoice_hash
 
-    def _prettify_xml(self, elem: Element) -> str:
-        """Return a pretty-printed XML string"""
-        rough_string = tostring(elem, encoding='utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ", encoding='UTF-8').decode('utf-8')
-
     @staticmethod
-    def export_to_file(start_date: date, end_date: date, file_path: str):
+    def export_to_file(start_date: date, end_date: date, file_path: str, compress: bool = False, workers: int = 0):
         """
-        Export SAF-T to file.
+        Export SAF-T to file, streaming it to disk.
 
         Args:
             start_date: Start date
             end_date: End date
             file_path: Output file path
+            compress: Write a gzip file
+            workers: Worker processes rendering invoices (0: serial)
 
         Returns:
             str: File path
         """
-        service = SAFTExportService(start_date, end_date)
-        xml_content = service.generate_saft_xml()
+        service = SAFTExportService(start_date, end_date, workers=workers)
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(xml_content)
+        with open(file_path, 'wb') as f:
+            for chunk in service.iter_saft_bytes(compress=compress):
+                f.write(chunk)
 
         return file_path
 
@@ -0,0 +1,209 @@
+"""
+SAF-T Export Job Service
+
+Runs SAF-T CV exports in the background instead of inside the request:
+- A job row records the range, status and progress (invoices written / total)
+- A worker thread streams the file to disk, then renames it into place
+- Finished exports of a closed period are reused while their data version
+  (SAFTExportService.data_version) still matches
+- Jobs whose thread died with the process (e.g. a restart) stop making
+  progress; once stale they are marked FAILED so the export can be requested again
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from apps.payments.models import SAFTExportJob
+from .saft_export_service import SAFTExportService
+
+logger = logging.getLogger(__name__)
+
+
+# Configuration
+SAFT_EXPORT_DIR = getattr(settings, 'SAFT_EXPORT_DIR', os.path.join(settings.BASE_DIR, 'saft_exports'))
+# Worker processes per export (see SAFTExportService); 0 renders in the job thread
+SAFT_EXPORT_WORKERS = getattr(settings, 'SAFT_EXPORT_WORKERS', 0)
+# Seconds a PENDING/RUNNING job may go without progress before it is considered dead
+SAFT_EXPORT_STALE_AFTER = getattr(settings, 'SAFT_EXPORT_STALE_AFTER', 15 * 60)
+
+
+class SAFTExportJobService:
+    """
+    Service for background SAF-T exports.
+    """
+
+    @staticmethod
+    def is_closed_period(end_date):
+        """Whether the range is over (no more invoices can be dated in it)."""
+        return end_date < timezone.localdate()
+
+    @staticmethod
+    def expire_stale_jobs():
+        """
+        Fail PENDING/RUNNING jobs that made no progress for SAFT_EXPORT_STALE_AFTER seconds.
+
+        Jobs run in a thread of the web process, so a restart leaves them in
+        that state for good; a running job reports progress about every
+        SAFTExportService.CHUNK_SIZE invoices.
+
+        Returns:
+            int: Number of jobs marked FAILED
+        """
+        now = timezone.now()
+        return SAFTExportJob.objects.filter(
+            status__in=['PENDING', 'RUNNING'],
+            updated_at__lt=now - timedelta(seconds=SAFT_EXPORT_STALE_AFTER)
+        ).update(
+            status='FAILED',
+            error='Export interrupted (no progress); start a new export job.',
+            finished_at=now,
+            updated_at=now
+        )
+
+    @staticmethod
+    def find_cached(start_date, end_date, compress, data_version):
+        """
+        Finished export of the same range and data version whose file is still on disk.
+
+        Returns:
+            SAFTExportJob or None
+        """
+        jobs = SAFTExportJob.objects.filter(
+            start_date=start_date,
+            end_date=end_date,
+            compress=compress,
+            data_version=data_version,
+            status='DONE'
+        ).order_by('-finished_at')
+
+        for job in jobs[:5]:
+            if os.path.exists(job.file_path):
+                return job
+        return None
+
+    @staticmethod
+    def create_job(user, start_date, end_date, compress=False):
+        """
+        Start a background export, or reuse a finished one.
+
+        Exports of a closed period are reused when nothing they contain has
+        changed since; open periods are always exported again.
+
+        Args:
+            user: User requesting the export
+            start_date: Start date
+            end_date: End date
+            compress: Produce a gzip file
+
+        Returns:
+            tuple: (SAFTExportJob, cached) where cached is True for a reused export
+        """
+        SAFTExportJobService.expire_stale_jobs()
+        data_version = SAFTExportService(start_date, end_date).data_version()
+
+        if SAFTExportJobService.is_closed_period(end_date):
+            job = SAFTExportJobService.find_cached(start_date, end_date, compress, data_version)
+            if job:
+                return job, True
+
+        job = SAFTExportJob.objects.create(
+            start_date=start_date,
+            end_date=end_date,
+            compress=compress,
+            data_version=data_version,
+            requested_by=user
+        )
+
+        # Start only once the job row is visible to the worker's connection
+        transaction.on_commit(lambda: SAFTExportJobService.start(job.pk))
+        return job, False
+
+    @staticmethod
+    def start(job_id):
+        """Run a job in a daemon thread."""
+        thread = threading.Thread(
+            target=SAFTExportJobService.run_job,
+            args=(job_id,),
+            name=f'saft-export-{job_id}',
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    @staticmethod
+    def run_job(job_id):
+        """
+        Generate a job's file.
+
+        The file is written as <name>.part and renamed when complete, so a
+        DONE job always points at a whole file. Progress and the final status
+        are only written while the job is still RUNNING (not expired meanwhile).
+
+        Args:
+            job_id: ID of a PENDING job
+        """
+        temp_path = None
+        try:
+            # Claim the job (a job is never run twice)
+            claimed = SAFTExportJob.objects.filter(pk=job_id, status='PENDING').update(
+                status='RUNNING',
+                started_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+            if not claimed:
+                return
+
+            job = SAFTExportJob.objects.get(pk=job_id)
+            running = SAFTExportJob.objects.filter(pk=job_id, status='RUNNING')
+
+            def report_progress(rows_done):
+                running.update(rows_done=rows_done, updated_at=timezone.now())
+
+            service = SAFTExportService(
+                job.start_date,
+                job.end_date,
+                workers=SAFT_EXPORT_WORKERS,
+                progress=report_progress
+            )
+            rows_total = service._invoices_queryset().count()
+            running.update(rows_total=rows_total, updated_at=timezone.now())
+
+            os.makedirs(SAFT_EXPORT_DIR, exist_ok=True)
+            file_path = os.path.join(SAFT_EXPORT_DIR, f'{job_id}_{job.filename}')
+            temp_path = f'{file_path}.part'
+
+            with open(temp_path, 'wb') as f:
+                for chunk in service.iter_saft_bytes(compress=job.compress):
+                    f.write(chunk)
+            os.replace(temp_path, file_path)
+
+            finished = running.update(
+                status='DONE',
+                rows_done=service.invoices_done,
+                file_path=file_path,
+                file_size=os.path.getsize(file_path),
+                finished_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+            if not finished:
+                # Expired as stale meanwhile: nothing points at the file
+                os.remove(file_path)
+
+        except Exception as e:
+            logger.exception('SAF-T export job %s failed', job_id)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            SAFTExportJob.objects.filter(pk=job_id, status='RUNNING').update(
+                status='FAILED',
+                error=str(e),
+                finished_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+
+        finally:
+            # This thread's DB connections are not managed by a request cycle
+            connections.close_all()
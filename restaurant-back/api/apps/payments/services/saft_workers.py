@@ -0,0 +1,36 @@
+"""
+SAF-T Export Worker Processes
+
+Entry points run by the worker processes of a parallel SAF-T export
+(SAFTExportService with workers > 0).
+
+Workers are spawned rather than forked, so they never share the parent's
+open DB connection. A spawned worker imports this module before Django is
+set up, which is why models and services are only imported inside the
+functions.
+"""
+
+
+def init_partition_worker():
+    """Set up Django in a freshly spawned worker (it opens its own DB connection)."""
+    import django
+    django.setup()
+
+
+def render_invoice_partition(start_date, end_date, level):
+    """
+    Render the Invoice elements of one date partition.
+
+    Args:
+        start_date: First day of the partition
+        end_date: Last day of the partition
+        level: Nesting level of the Invoice elements
+
+    Returns:
+        tuple: (the partition's Invoice elements pretty-printed, number of invoices)
+    """
+    from .saft_export_service import SAFTExportService
+
+    service = SAFTExportService(start_date, end_date)
+    fragment = ''.join(service._iter_invoices(level))
+    return fragment, service.invoices_done
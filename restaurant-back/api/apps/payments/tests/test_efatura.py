@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.menu.models import MenuCategory, MenuItem
+from apps.payments.management.commands.benchmark_efatura import ReferenceRenderer
+from apps.orders.models import Order
+from apps.orders.services import OrderService
+from apps.payments.models import EFaturaSubmission, Payment
+from apps.payments.services import efatura_service, efatura_storage
+from apps.payments.services.efatura_service import EFaturaService
+from apps.payments.services.efatura_storage import EFaturaStorage
+from apps.payments.services.efatura_submission_service import EFaturaSubmissionService
+from apps.payments.services.efatura_validator import EFaturaValidationError
+from apps.payments.services.fiscal_service import FiscalService
+
+
+class EFaturaTestCase(TestCase):
+    """A signed invoice for a two-line order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = MenuCategory.objects.create(name='Pratos', prepared_in='1')
+        soup = MenuItem.objects.create(name='Sopa', description='', price=Decimal('3.00'), categoryID=category)
+        steak = MenuItem.objects.create(name='Bife & Batatas', description='', price=Decimal('12.00'), categoryID=category)
+
+        order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(order, [
+            {'menu_item': soup, 'quantity': 2},
+            {'menu_item': steak, 'quantity': 1},
+        ])
+        order.refresh_from_db()
+
+        payment = Payment.objects.create(
+            order=order,
+            amount=order.grandTotal,
+            payment_method='CASH',
+            payment_status='COMPLETED'
+        )
+        cls.payment = FiscalService.sign_invoice(payment)
+
+
+class RenderXMLTests(EFaturaTestCase):
+
+    def assertMatchesReference(self, payment):
+        service = EFaturaService(payment)
+        self.assertEqual(service.render_xml(), ReferenceRenderer(service).render().encode('utf-8'))
+
+    def test_consumidor_final_matches_reference(self):
+        self.assertMatchesReference(self.payment)
+
+    def test_named_customer_matches_reference(self):
+        Payment.objects.filter(pk=self.payment.pk).update(
+            customer_tax_id='123456789',
+            customer_name='Cliente "A" <Lda> & Filhos'
+        )
+        self.assertMatchesReference(Payment.objects.get(pk=self.payment.pk))
+
+    def test_submission_mode_matches_reference(self):
+        with mock.patch.object(efatura_service, 'DNRE_API_ENABLED', True):
+            self.assertMatchesReference(self.payment)
+
+
+class SpecimenFlagTests(EFaturaTestCase):
+
+    def test_specimen_without_dnre_url(self):
+        with mock.patch.object(efatura_service, 'DNRE_API_ENABLED', False):
+            xml = EFaturaService(self.payment).render_xml()
+        self.assertIn(b'<IsSpecimen>true</IsSpecimen>', xml)
+
+    def test_not_specimen_when_submitting_to_dnre(self):
+        with mock.patch.object(efatura_service, 'DNRE_API_ENABLED', True):
+            xml = EFaturaService(self.payment).render_xml()
+        self.assertIn(b'<IsSpecimen>false</IsSpecimen>', xml)
+
+
+class SubmissionLeaseTests(EFaturaTestCase):
+
+    def test_expired_lease_does_not_overwrite_new_claim(self):
+        [slow] = EFaturaSubmissionService.claim_batch()
+
+        # The slow worker's lease runs out and another worker reclaims the row
+        EFaturaSubmission.objects.filter(pk=slow.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        [fast] = EFaturaSubmissionService.claim_batch()
+        self.assertTrue(EFaturaSubmissionService.record_success(fast, {'receipt': 'R-2'}))
+
+        self.assertFalse(EFaturaSubmissionService.record_failure(slow, 'timeout'))
+        self.assertFalse(EFaturaSubmissionService.record_success(slow, {'receipt': 'R-1'}))
+
+        submission = EFaturaSubmission.objects.get(pk=slow.pk)
+        self.assertEqual((submission.status, submission.receipt, submission.attempts), ('SUBMITTED', 'R-2', 1))
+
+
+class SubmissionRenderFailureTests(EFaturaTestCase):
+
+    def process_with_render_error(self, error):
+        with mock.patch.object(EFaturaService, 'document_xml', side_effect=error):
+            self.stats = EFaturaSubmissionService.process_batch()
+        return EFaturaSubmission.objects.get(payment=self.payment)
+
+    def test_transient_error_is_retried(self):
+        submission = self.process_with_render_error(OSError('disk full'))
+        self.assertEqual((submission.status, submission.attempts), ('PENDING', 1))
+        self.assertGreater(submission.next_attempt_at, timezone.now())
+
+    def test_xsd_rejection_is_final(self):
+        submission = self.process_with_render_error(EFaturaValidationError(['line 1: invalid']))
+        self.assertEqual((submission.status, submission.attempts), ('FAILED', 1))
+        self.assertEqual((self.stats['failed'], self.stats['expired']), (1, 0))
+
+    def test_error_after_lease_expired_is_not_counted_as_failed(self):
+        def render_slowly():
+            # Another worker reclaims the row while this one is still rendering
+            EFaturaSubmission.objects.filter(payment=self.payment).update(locked_until=timezone.now() + timedelta(minutes=5))
+            raise OSError('disk full')
+
+        submission = self.process_with_render_error(render_slowly)
+        self.assertEqual((self.stats['failed'], self.stats['expired']), (0, 1))
+        self.assertEqual((submission.status, submission.attempts), ('PROCESSING', 0))
+
+
+class StorageTests(EFaturaTestCase):
+
+    def setUp(self):
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir)
+        patcher = mock.patch.object(efatura_storage, 'EFATURA_STORAGE_DIR', storage_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load(self):
+        return Payment.objects.get(pk=self.payment.pk)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_first_document_is_recorded(self):
+        payment = self.load()
+        path = EFaturaStorage.store(payment, b'<Dfe>1</Dfe>')
+
+        self.assertEqual(self.read(path), b'<Dfe>1</Dfe>')
+        stored = self.load()
+        self.assertEqual(
+            (stored.efatura_xml_path, stored.efatura_xml_sha256),
+            (payment.efatura_xml_path, payment.efatura_xml_sha256)
+        )
+        self.assertEqual(EFaturaStorage.full_path(stored.efatura_xml_path), path)
+
+    def test_stored_document_is_kept(self):
+        first = EFaturaStorage.store(self.load(), b'<Dfe>1</Dfe>')
+        payment = self.load()
+
+        self.assertEqual(EFaturaStorage.store(payment, b'<Dfe>2</Dfe>'), first)
+        self.assertEqual(EFaturaStorage.read(self.load()), b'<Dfe>1</Dfe>')
+
+    def test_stale_instance_keeps_other_process_document(self):
+        stale = self.load()
+        # Another process stores its rendering after this instance was loaded
+        other = EFaturaStorage.store(self.load(), b'<Dfe>1</Dfe>')
+
+        self.assertEqual(EFaturaStorage.store(stale, b'<Dfe>2</Dfe>'), other)
+        self.assertEqual(stale.efatura_xml_sha256, self.load().efatura_xml_sha256)
+        self.assertEqual(EFaturaStorage.read(self.load()), b'<Dfe>1</Dfe>')
+
+    def test_missing_file_is_replaced(self):
+        payment = self.load()
+        os.remove(EFaturaStorage.store(payment, b'<Dfe>1</Dfe>'))
+        self.assertIsNone(EFaturaStorage.read(payment))
+
+        path = EFaturaStorage.store(payment, b'<Dfe>2</Dfe>')
+        self.assertEqual(self.read(path), b'<Dfe>2</Dfe>')
+        self.assertEqual(EFaturaStorage.read(self.load()), b'<Dfe>2</Dfe>')
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from apps.payments.services import efatura_validator
+from apps.payments.services.efatura_validator import EFaturaValidationError, EFaturaValidator
+
+
+@skipUnless(EFaturaValidator.is_available(), 'lxml or the DNRE XSD set is not available')
+class EFaturaValidatorTests(SimpleTestCase):
+    """Checks against the DNRE XSD set and its sample documents."""
+
+    def setUp(self):
+        with open(os.path.join(efatura_validator.EFATURA_XSD_DIR, '3 SalesReceipt.xml'), 'rb') as f:
+            self.valid = f.read()
+        # The series pattern allows no spaces
+        self.invalid = self.valid.replace(b'<Serie>A2020</Serie>', b'<Serie>FT A</Serie>')
+
+    def test_sample_document_is_valid(self):
+        self.assertEqual(EFaturaValidator.validate(self.valid), [])
+        self.assertEqual(EFaturaValidator.validate(self.valid.decode('utf-8')), [])
+
+    def test_invalid_document_reports_errors(self):
+        [error] = EFaturaValidator.validate(self.invalid)
+        self.assertTrue(error.startswith('line 9: '), error)
+        self.assertIn('Serie', error)
+
+    def test_unparseable_and_unknown_documents(self):
+        self.assertEqual(len(EFaturaValidator.validate(b'<Dfe>')), 1)
+        self.assertEqual(
+            EFaturaValidator.validate(b'<Unknown xmlns="urn:cv:efatura:xsd:v1.0"/>'),
+            ['line 1: no schema for root element Unknown']
+        )
+
+    def test_check_follows_mode(self):
+        self.assertEqual(EFaturaValidator.check(self.invalid, mode='off'), [])
+
+        with self.assertLogs(efatura_validator.logger, 'WARNING'):
+            self.assertEqual(len(EFaturaValidator.check(self.invalid, mode='warn')), 1)
+
+        with self.assertRaises(EFaturaValidationError) as raised:
+            EFaturaValidator.check(self.invalid, mode='strict')
+        self.assertEqual(len(raised.exception.errors), 1)
+        self.assertEqual(EFaturaValidator.check(self.valid, mode='strict'), [])
+
+    def test_validate_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.makedirs(os.path.join(directory, '2025'))
+        for name, content in [('valid.xml', self.valid), ('2025/invalid.xml', self.invalid), ('notes.txt', b'')]:
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(content)
+
+        results = {
+            os.path.relpath(path, directory): len(errors)
+            for path, errors in EFaturaValidator.validate_directory(directory)
+        }
+        self.assertEqual(results, {'valid.xml': 0, os.path.join('2025', 'invalid.xml'): 1})
+        self.assertEqual(
+            list(EFaturaValidator.validate_directory(directory, workers=2)),
+            list(EFaturaValidator.validate_directory(directory))
+        )
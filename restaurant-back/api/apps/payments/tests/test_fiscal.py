@@ -0,0 +1,162 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.common.models import CompanySettings
+from apps.orders.models import Order
+from apps.payments.models import EFaturaSubmission, FiscalChain, FiscalSequence, Payment
+from apps.payments.services.fiscal_service import FiscalService
+from apps.payments.services.hash_chain_service import HashChainService
+
+
+class FiscalTestCase(TestCase):
+    """Unsigned payments, each for its own order."""
+
+    def create_payment(self, amount='10.00', invoice_type='FT'):
+        order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal(amount))
+        return Payment.objects.create(
+            order=order,
+            amount=order.grandTotal,
+            payment_method='CASH',
+            payment_status='COMPLETED',
+            invoice_type=invoice_type
+        )
+
+    def set_invoice_series(self, series):
+        company_settings = CompanySettings.get_instance()
+        company_settings.invoice_series = series
+        company_settings.save()
+
+
+class InvoiceNumberingTests(FiscalTestCase):
+
+    def test_numbers_are_sequential(self):
+        year = timezone.localdate().year
+        numbers = [FiscalService.sign_invoice(self.create_payment()).invoice_no for _ in range(3)]
+
+        self.assertEqual(numbers, [f'FT A/{year}/0000{n}' for n in (1, 2, 3)])
+        self.assertEqual(FiscalSequence.objects.get(series='FT A', year=year, invoice_type='FT').last_number, 3)
+
+    def test_sequence_is_seeded_from_issued_invoices(self):
+        year = timezone.localdate().year
+        Payment.objects.filter(pk=self.create_payment().pk).update(invoice_no=f'FT A/{year}/00041')
+        # Same number in another document type is not counted
+        Payment.objects.filter(pk=self.create_payment(invoice_type='FR').pk).update(invoice_no=f'FT A/{year}/00077')
+
+        self.assertEqual(FiscalService.sign_invoice(self.create_payment()).invoice_no, f'FT A/{year}/00042')
+
+    @override_settings(TIME_ZONE='Atlantic/Cape_Verde')
+    def test_year_follows_local_invoice_date(self):
+        # 00:30 UTC on New Year's Day is still 31 December in Cabo Verde (UTC-1)
+        signed_at = datetime(2026, 1, 1, 0, 30, tzinfo=dt_timezone.utc)
+        with mock.patch('apps.payments.services.fiscal_service.timezone.now', return_value=signed_at):
+            payment = FiscalService.sign_invoice(self.create_payment())
+
+        self.assertEqual(payment.invoice_date, date(2025, 12, 31))
+        self.assertEqual(payment.invoice_no, 'FT A/2025/00001')
+
+
+class HashChainTests(FiscalTestCase):
+
+    def test_chain_stays_linear_across_series(self):
+        signed = []
+        for series in ['FT A', 'FT B', 'FT A']:
+            self.set_invoice_series(series)
+            signed.append(FiscalService.sign_invoice(self.create_payment()))
+
+        self.assertEqual(
+            [payment.invoice_no.split('/')[0] for payment in signed],
+            ['FT A', 'FT B', 'FT A']
+        )
+        # Back in series A, the invoice chains onto B's, not onto A's old head
+        self.assertEqual(signed[2].previous_invoice_hash, signed[1].invoice_hash)
+        for payment in signed:
+            self.assertTrue(FiscalService.validate_hash_chain(Payment.objects.get(pk=payment.pk)))
+        self.assertTrue(HashChainService.verify_chain(['FT'])['is_valid'])
+        self.assertEqual(FiscalChain.objects.get(invoice_type='FT').last_hash, signed[2].invoice_hash)
+
+    def test_chain_head_is_seeded_from_signed_invoices(self):
+        first = FiscalService.sign_invoice(self.create_payment())
+        FiscalChain.objects.all().delete()
+
+        second = FiscalService.sign_invoice(self.create_payment())
+        self.assertEqual(second.previous_invoice_hash, first.invoice_hash)
+
+    def test_window_links_to_invoice_before_it(self):
+        signed = [FiscalService.sign_invoice(self.create_payment()) for _ in range(3)]
+
+        result = HashChainService.verify_chain(['FT'], filters={'signed_at__gt': signed[0].signed_at})
+        [chain] = result['chains']
+        self.assertTrue(result['is_valid'])
+        self.assertEqual((chain['invoices'], chain['first_invoice_no']), (2, signed[1].invoice_no))
+
+        # A broken link at the start of the window is still found
+        Payment.objects.filter(pk=signed[1].pk).update(previous_invoice_hash='0' * 64)
+        result = HashChainService.verify_chain(['FT'], filters={'signed_at__gt': signed[0].signed_at})
+        self.assertEqual(result['chains'][0]['first_broken']['paymentID'], signed[1].pk)
+
+
+class BatchSigningTests(FiscalTestCase):
+
+    def test_batch_continues_numbering_and_chain(self):
+        first = FiscalService.sign_invoice(self.create_payment())
+        batch = [self.create_payment(invoice_type=invoice_type) for invoice_type in ['FT', 'TV', 'FT']]
+
+        signed = FiscalService.sign_invoices(Payment.objects.filter(pk__in=[payment.pk for payment in batch]))
+
+        self.assertEqual([payment.pk for payment in signed], [payment.pk for payment in batch])
+        numbers = {payment.pk: payment.invoice_no.rsplit('/', 1)[1] for payment in Payment.objects.filter(is_signed=True)}
+        # TV has its own series; the batch's FT invoices follow the one signed before
+        self.assertEqual([numbers[payment.pk] for payment in [first] + batch], ['00001', '00002', '00001', '00003'])
+        self.assertTrue(HashChainService.verify_chain()['is_valid'])
+        self.assertEqual(EFaturaSubmission.objects.filter(payment__in=batch).count(), 3)
+
+    def test_signed_payments_are_skipped(self):
+        signed = FiscalService.sign_invoice(self.create_payment())
+        invoice_hash = signed.invoice_hash
+
+        self.assertEqual(FiscalService.sign_invoices(Payment.objects.filter(pk=signed.pk)), [])
+        self.assertEqual(Payment.objects.get(pk=signed.pk).invoice_hash, invoice_hash)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def sign_batch(size):
+            payments = [self.create_payment() for _ in range(size)]
+            queryset = Payment.objects.filter(pk__in=[payment.pk for payment in payments])
+            with CaptureQueriesContext(connection) as queries:
+                FiscalService.sign_invoices(queryset)
+            return len(queries)
+
+        sign_batch(1)  # Creates the chain and sequence rows
+        self.assertEqual(sign_batch(2), sign_batch(10))
+
+
+class VerifyHashChainViewTests(FiscalTestCase):
+
+    def setUp(self):
+        manager = User.objects.create_user(username='manager')
+        manager.groups.add(Group.objects.create(name='manager'))
+        self.client = APIClient()
+        self.client.force_authenticate(manager)
+
+    def get(self, **params):
+        return self.client.get('/api/invoices/verify-hash-chain/', params)
+
+    def test_verifies_one_type_over_a_period(self):
+        FiscalService.sign_invoice(self.create_payment())
+        today = timezone.localdate().isoformat()
+
+        response = self.get(invoice_type='FT', start_date=today, end_date=today)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['is_valid'])
+        self.assertEqual(response.json()['chains'][0]['invoices'], 1)
+
+    def test_full_chains_are_left_to_the_command(self):
+        self.assertEqual(self.get().status_code, 400)
+        self.assertEqual(self.get(invoice_type='FT', start_date='2025-01-01', end_date='2025-03-01').status_code, 400)
@@ -0,0 +1,119 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.cash_register.models import CashRegister
+from apps.menu.models import MenuCategory, MenuItem
+from apps.orders.models import Order
+from apps.orders.services import OrderService
+from apps.payments.models import Payment
+from apps.payments.services.payment_service import IdempotencyConflict, PaymentError, PaymentService
+
+
+class PaymentServiceTestCase(TestCase):
+    """An open cash register and a 30.00 order (plus IVA) to pay."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cashier')
+        cls.cash_register = CashRegister.objects.create(user=cls.user, initial_amount=Decimal('0.00'))
+        category = MenuCategory.objects.create(name='Pratos', prepared_in='1')
+        cls.steak = MenuItem.objects.create(name='Bife', description='', price=Decimal('15.00'), categoryID=category)
+
+    def setUp(self):
+        self.order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(self.order, [{'menu_item': self.steak, 'quantity': 2}])
+
+    def pay(self, amount, idempotency_key=None, order=None):
+        return PaymentService.process_payment(
+            self.user, (order or self.order).pk, Decimal(amount), 'CASH', idempotency_key=idempotency_key
+        )
+
+
+class IdempotencyTests(PaymentServiceTestCase):
+
+    def test_retry_returns_original_payment(self):
+        payment, replayed = self.pay('10.00', idempotency_key='key-1')
+        retried, retried_replayed = self.pay('10.00', idempotency_key='key-1')
+
+        self.assertEqual((replayed, retried_replayed), (False, True))
+        self.assertEqual(retried.pk, payment.pk)
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+        # The register was only charged once
+        self.cash_register.refresh_from_db()
+        self.assertEqual(self.cash_register.operations_cash, Decimal('10.00'))
+
+    def test_key_reused_for_other_amount_conflicts(self):
+        self.pay('10.00', idempotency_key='key-1')
+        with self.assertRaises(IdempotencyConflict):
+            self.pay('12.00', idempotency_key='key-1')
+
+    def test_key_reused_for_other_order_conflicts(self):
+        other = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(other, [{'menu_item': self.steak, 'quantity': 1}])
+
+        self.pay('10.00', idempotency_key='key-1')
+        with self.assertRaises(IdempotencyConflict):
+            self.pay('10.00', idempotency_key='key-1', order=other)
+
+    def test_key_taken_concurrently_conflicts(self):
+        self.pay('10.00', idempotency_key='key-1')
+        # Another order's request stored the key after this one looked it up
+        with mock.patch.object(PaymentService, 'find_replay', return_value=None):
+            with self.assertRaises(IdempotencyConflict):
+                self.pay('10.00', idempotency_key='key-1')
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class PaymentSaveTests(PaymentServiceTestCase):
+
+    def test_duplicate_idempotency_key_fails_validation(self):
+        payment, _ = self.pay('10.00', idempotency_key='key-1')
+        duplicate = Payment(order=self.order, amount=Decimal('5.00'), payment_method='CASH', idempotency_key='key-1')
+        with self.assertRaises(ValidationError) as raised:
+            duplicate.save()
+        self.assertIn('idempotency_key', raised.exception.message_dict)
+
+        # Saving the original again does not collide with itself
+        payment.amount = Decimal('11.00')
+        payment.save()
+
+
+class LockingTests(PaymentServiceTestCase):
+
+    def test_order_and_cash_register_are_locked(self):
+        locked = []
+        select_for_update = QuerySet.select_for_update
+
+        def spy(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=spy):
+            self.pay('10.00')
+        self.assertEqual(locked[:2], [Order, CashRegister])
+
+    def test_payment_beyond_remaining_balance_is_rejected(self):
+        self.pay(str(self.order.grandTotal - Decimal('1.00')))
+        with self.assertRaises(PaymentError):
+            self.pay('2.00')
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+
+
+class ProcessPaymentViewTests(PaymentServiceTestCase):
+
+    def test_invalid_order_id(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/payment/process/',
+            {'orderID': 'abc', 'amount': '10.00', 'payment_method': 'CASH'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid order ID.'})
@@ -0,0 +1,300 @@
+import gzip
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.menu.models import MenuCategory, MenuItem
+from apps.orders.models import Order
+from apps.orders.services import OrderService
+from apps.payments.models import Payment, SAFTExportJob
+from apps.payments.services import saft_export_service, saft_job_service
+from apps.payments.services.fiscal_service import FiscalService
+from apps.payments.services.saft_export_service import SAFTExportService
+from apps.payments.services.saft_job_service import SAFTExportJobService
+
+
+NS = {'saft': SAFTExportService.NAMESPACE}
+
+
+class InlineExecutor:
+    """
+    Runs partitions in this process, in place of the worker pool.
+
+    Spawned workers open their own connections and cannot see the test
+    database, while what makes parallel output match serial output (the
+    partitioning and the order fragments are joined in) is all in the parent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        pass
+
+
+class SAFTTestCase(TestCase):
+    """Signed invoices dated in January, February and March 2025."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = MenuCategory.objects.create(name='Pratos', prepared_in='1')
+        cls.soup = MenuItem.objects.create(name='Sopa', description='', price=Decimal('3.00'), categoryID=category)
+        cls.steak = MenuItem.objects.create(name='Bife & Batatas', description='', price=Decimal('12.00'), categoryID=category)
+
+        for invoice_date in [date(2025, 1, 10), date(2025, 1, 20), date(2025, 2, 5), date(2025, 3, 31)]:
+            cls.create_invoice(invoice_date)
+
+    @classmethod
+    def create_invoice(cls, invoice_date, lines=2):
+        order = Order.objects.create(orderType='RESTAURANT', totalAmount=Decimal('0.00'))
+        OrderService.apply_item_changes(order, [
+            {'menu_item': menu_item, 'quantity': 1} for menu_item in [cls.soup, cls.steak][:lines]
+        ])
+        order.refresh_from_db()
+        payment = Payment.objects.create(
+            order=order,
+            amount=order.grandTotal,
+            payment_method='CASH',
+            payment_status='COMPLETED',
+            invoice_date=invoice_date
+        )
+        return FiscalService.sign_invoice(payment)
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        patcher = mock.patch.object(saft_export_service, 'SAFT_MASTER_FILE_CACHE_DIR', cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_dir = cache_dir
+
+    def service(self, **kwargs):
+        return SAFTExportService(date(2025, 1, 1), date(2025, 3, 31), **kwargs)
+
+
+class StreamingTests(SAFTTestCase):
+
+    def test_chunks_add_up_to_the_document(self):
+        xml = self.service().generate_saft_xml()
+
+        with mock.patch.object(SAFTExportService, 'BUFFER_SIZE', 256):
+            chunks = list(self.service().iter_saft_bytes())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), xml.encode('utf-8'))
+
+        root = ElementTree.fromstring(xml.encode('utf-8'))
+        invoices = root.findall('saft:SourceDocuments/saft:SalesInvoices/saft:Invoice', NS)
+        self.assertEqual(len(invoices), 4)
+        self.assertEqual(root.findtext('saft:SourceDocuments/saft:SalesInvoices/saft:NumberOfEntries', namespaces=NS), '4')
+        self.assertEqual(
+            [invoice.findtext('saft:InvoiceDate', namespaces=NS) for invoice in invoices],
+            ['2025-01-10', '2025-01-20', '2025-02-05', '2025-03-31']
+        )
+
+    def test_export_to_file_compressed(self):
+        xml = self.service().generate_saft_xml()
+        fd, file_path = tempfile.mkstemp(suffix='.xml.gz')
+        os.close(fd)
+        self.addCleanup(os.remove, file_path)
+
+        SAFTExportService.export_to_file(date(2025, 1, 1), date(2025, 3, 31), file_path, compress=True)
+        with gzip.open(file_path, 'rb') as f:
+            self.assertEqual(f.read(), xml.encode('utf-8'))
+
+    def test_progress_is_reported(self):
+        reported = []
+        with mock.patch.object(SAFTExportService, 'CHUNK_SIZE', 3):
+            service = self.service(progress=reported.append)
+            service.generate_saft_xml()
+        self.assertEqual(reported, [3, 4])
+
+
+class InvoiceLoadingTests(SAFTTestCase):
+
+    def count_invoice_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            ''.join(self.service()._iter_invoices(level=3))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_invoices(self):
+        before = self.count_invoice_queries()
+        for day in range(1, 11):
+            self.create_invoice(date(2025, 2, day), lines=1 + day % 2)
+        self.assertEqual(self.count_invoice_queries(), before)
+
+
+class ParallelExportTests(SAFTTestCase):
+
+    def test_parallel_output_is_identical_to_serial(self):
+        serial = b''.join(self.service().iter_saft_bytes())
+
+        with mock.patch.object(saft_export_service, 'ProcessPoolExecutor', side_effect=InlineExecutor) as pool:
+            service = self.service(workers=2)
+            parallel = b''.join(service.iter_saft_bytes())
+
+        self.assertTrue(pool.called)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(service.invoices_done, 4)
+
+    def test_months_are_partitions(self):
+        service = SAFTExportService(date(2025, 1, 15), date(2025, 3, 10))
+        self.assertEqual(service._month_partitions(), [
+            (date(2025, 1, 15), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 2, 28)),
+            (date(2025, 3, 1), date(2025, 3, 10)),
+        ])
+
+
+class DataVersionTests(SAFTTestCase):
+
+    def test_version_follows_rendered_orders_and_lines(self):
+        version = self.service().data_version()
+        self.assertEqual(self.service().data_version(), version)
+
+        line = Payment.objects.order_by('pk').first().order.items.order_by('id').first()
+        line.save()
+        self.assertNotEqual(self.service().data_version(), version)
+
+        version = self.service().data_version()
+        Order.objects.get(pk=line.order_id).save(update_fields=['updated_at'])
+        self.assertNotEqual(self.service().data_version(), version)
+
+    def test_orders_outside_the_range_do_not_count(self):
+        version = self.service().data_version()
+        self.create_invoice(date(2025, 4, 1))
+        self.assertEqual(self.service().data_version(), version)
+
+
+class ExportJobTests(SAFTTestCase):
+
+    def setUp(self):
+        super().setUp()
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        for name, value in [('SAFT_EXPORT_DIR', export_dir), ('connections', mock.Mock())]:
+            # The job thread closes its DB connections when done; the test's own must stay open
+            patcher = mock.patch.object(saft_job_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='manager')
+        self.user.groups.add(Group.objects.get_or_create(name='manager')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, compress=False):
+        with self.captureOnCommitCallbacks(execute=False):
+            job, cached = SAFTExportJobService.create_job(self.user, date(2025, 1, 1), date(2025, 3, 31), compress)
+        if not cached:
+            SAFTExportJobService.run_job(job.pk)
+        job.refresh_from_db()
+        return job, cached
+
+    def test_closed_period_export_is_reused_until_data_changes(self):
+        job, cached = self.export()
+        self.assertFalse(cached)
+        self.assertEqual((job.status, job.rows_total, job.rows_done), ('DONE', 4, 4))
+
+        again, cached = self.export()
+        self.assertTrue(cached)
+        self.assertEqual(again.pk, job.pk)
+
+        Payment.objects.order_by('pk').first().order.items.first().save()
+        changed, cached = self.export()
+        self.assertFalse(cached)
+        self.assertNotEqual(changed.pk, job.pk)
+
+    def test_download_resumes_with_range(self):
+        job, _ = self.export(compress=True)
+        with open(job.file_path, 'rb') as f:
+            content = f.read()
+        url = f'/api/saft/export-jobs/{job.pk}/download/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-{len(content) - 1}/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[10:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_stale_job_is_failed(self):
+        job = SAFTExportJob.objects.create(start_date=date(2025, 1, 1), end_date=date(2025, 3, 31), status='RUNNING')
+        SAFTExportJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=saft_job_service.SAFT_EXPORT_STALE_AFTER + 1)
+        )
+
+        response = self.client.get(f'/api/saft/export-jobs/{job.pk}/')
+        self.assertEqual(response.json()['status'], 'FAILED')
+
+        # A worker still running it cannot mark it DONE afterwards
+        SAFTExportJobService.run_job(job.pk)
+        self.assertEqual(SAFTExportJob.objects.get(pk=job.pk).status, 'FAILED')
+
+
+class MasterFileCacheTests(SAFTTestCase):
+
+    def cached_fragments(self, name):
+        return sorted(entry for entry in os.listdir(self.cache_dir) if entry.startswith(f'{name}-'))
+
+    def test_fragment_is_reused_while_rows_are_unchanged(self):
+        xml = self.service().generate_saft_xml()
+        [fragment] = self.cached_fragments('products')
+
+        with mock.patch.object(SAFTExportService, '_add_products', side_effect=AssertionError('rendered again')):
+            self.assertEqual(self.service().generate_saft_xml(), xml)
+        self.assertEqual(self.cached_fragments('products'), [fragment])
+
+    def test_changed_row_replaces_the_fragment(self):
+        self.service().generate_saft_xml()
+        [old_fragment] = self.cached_fragments('products')
+
+        self.soup.name = 'Sopa do Dia'
+        self.soup.save()
+        xml = self.service().generate_saft_xml()
+
+        self.assertIn('<ProductDescription>Sopa do Dia</ProductDescription>', xml)
+        [new_fragment] = self.cached_fragments('products')
+        self.assertNotEqual(new_fragment, old_fragment)
+
+    def test_new_and_deleted_rows_replace_the_fragment(self):
+        self.service().generate_saft_xml()
+        [first] = self.cached_fragments('products')
+
+        extra = MenuItem.objects.create(name='Pudim', description='', price=Decimal('2.50'), categoryID=self.soup.categoryID)
+        self.service().generate_saft_xml()
+        [second] = self.cached_fragments('products')
+
+        extra.delete()
+        self.service().generate_saft_xml()
+        self.assertNotIn(second, self.cached_fragments('products'))
+        self.assertNotEqual(first, second)
+
+    def test_format_change_replaces_the_fragment(self):
+        self.service().generate_saft_xml()
+        [fragment] = self.cached_fragments('products')
+
+        with mock.patch.object(SAFTExportService, 'MASTER_FILE_FORMAT', SAFTExportService.MASTER_FILE_FORMAT + 1):
+            self.service().generate_saft_xml()
+        self.assertNotEqual(self.cached_fragments('products'), [fragment])
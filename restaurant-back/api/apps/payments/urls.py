@@ -8,10 +8,16 @@ from .views import (
     ProcessPaymentView,
     DeletePaymentView,
     SignInvoiceView,
+    SignInvoicesBatchView,
     ExportSAFTView,
+    SAFTExportJobCreateView,
+    SAFTExportJobDetailView,
+    DownloadSAFTExportView,
     ValidateInvoiceHashView,
+    VerifyHashChainView,
     GenerateEFaturaView,
     DownloadEFaturaXMLView,
+    EFaturaStatusView,
     SignAndSubmitEFaturaView,
     ListInvoicesView,
     IssueCreditNoteView,
@@ -42,23 +48,37 @@ urlpatterns = [
     # Sign invoice (generate fiscal fields)
     path('payment/<int:pk>/sign/', SignInvoiceView.as_view(), name='sign-invoice'),
 
+    # Sign many invoices at once (end-of-day closing)
+    path('invoices/sign-batch/', SignInvoicesBatchView.as_view(), name='sign-invoices-batch'),
+
     # Issue Credit Note (NC)
     path('credit-note/issue/', IssueCreditNoteView.as_view(), name='issue-credit-note'),
 
     # Export SAF-T CV
     path('saft/export/', ExportSAFTView.as_view(), name='export-saft'),
 
+    # Background SAF-T export jobs (start, poll progress, download)
+    path('saft/export-jobs/', SAFTExportJobCreateView.as_view(), name='saft-export-job-create'),
+    path('saft/export-jobs/<int:pk>/', SAFTExportJobDetailView.as_view(), name='saft-export-job-detail'),
+    path('saft/export-jobs/<int:pk>/download/', DownloadSAFTExportView.as_view(), name='saft-export-job-download'),
+
     # Validate invoice hash
     path('payment/<int:pk>/validate-hash/', ValidateInvoiceHashView.as_view(), name='validate-hash'),
 
+    # Verify the full hash chain of each document type
+    path('invoices/verify-hash-chain/', VerifyHashChainView.as_view(), name='verify-hash-chain'),
+
     # ===== E-FATURA CV ENDPOINTS (Real-time Electronic Invoicing) =====
 
     # Sign and submit e-Fatura (recommended - all in one)
     path('payment/<int:pk>/efatura/submit/', SignAndSubmitEFaturaView.as_view(), name='efatura-sign-submit'),
 
-    # Generate e-Fatura XML (requires already signed invoice)
+    # Queue e-Fatura XML for submission (requires already signed invoice)
     path('payment/<int:pk>/efatura/generate/', GenerateEFaturaView.as_view(), name='efatura-generate'),
 
+    # e-Fatura submission status / receipt
+    path('payment/<int:pk>/efatura/status/', EFaturaStatusView.as_view(), name='efatura-status'),
+
     # Download e-Fatura XML
     path('payment/<int:pk>/efatura/download/', DownloadEFaturaXMLView.as_view(), name='efatura-download'),
 
@@ -7,19 +7,30 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import AnonymousUser
-from django.http import HttpResponse
-from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from decimal import Decimal, InvalidOperation
 from datetime import datetime, date
 
-from .models import Payment
-from .serializers import PaymentSerializer, IssueCreditNoteSerializer
+from .models import EFaturaSubmission, Payment, SAFTExportJob
+from .serializers import (
+    EFaturaSubmissionSerializer,
+    IssueCreditNoteSerializer,
+    PaymentSerializer,
+    SAFTExportJobSerializer,
+)
 from apps.common.permissions import IsManager
-from apps.common.feature_flags import FeatureFlags, Modules
+from apps.common.downloads import ranged_file_response
+from apps.common.filters import date_range_filter, parse_choice, parse_date, parse_int
 from apps.orders.models import Order
 from apps.cash_register.models import CashRegister
 from .services.fiscal_service import FiscalService
 from .services.saft_export_service import SAFTExportService
+from .services.saft_job_service import SAFTExportJobService
 from .services.efatura_service import EFaturaService
+from .services.efatura_submission_service import EFaturaSubmissionService
+from .services.hash_chain_service import HashChainService
+from .services.payment_service import IdempotencyConflict, PaymentError, PaymentService
 
 
 class ListPaymentsView(APIView):
@@ -49,8 +60,8 @@ class PaymentDetailView(APIView):
 
         Query parameters:
         - order: Filter by order ID
-        - payment_method: Filter by payment method
-        - payment_status: Filter by payment status
+        - payment_method: Filter by payment method (e.g. CASH)
+        - payment_status: Filter by payment status (e.g. COMPLETED)
         - processed_by: Filter by user who processed the payment
         """
         if pk:
@@ -60,21 +71,24 @@ class PaymentDetailView(APIView):
             return Response(serializer.data)
         else:
             # Search payments by filters
-            order_id = request.query_params.get('order')
-            payment_method = request.query_params.get('payment_method')
-            payment_status = request.query_params.get('payment_status')
-            processed_by = request.query_params.get('processed_by')
-
+            params = request.query_params
             queryset = Payment.objects.all()
 
-            if order_id:
-                queryset = queryset.filter(order__orderID=order_id)
-            if payment_method:
-                queryset = queryset.filter(payment_method__icontains=payment_method)
-            if payment_status:
-                queryset = queryset.filter(payment_status__icontains=payment_status)
-            if processed_by:
-                queryset = queryset.filter(processed_by__username__icontains=processed_by)
+            try:
+                if params.get('order'):
+                    queryset = queryset.filter(order_id=parse_int(params['order'], 'order'))
+                if params.get('payment_method'):
+                    queryset = queryset.filter(payment_method=parse_choice(
+                        params['payment_method'], Payment.PAYMENT_METHOD_CHOICES, 'payment_method'
+                    ))
+                if params.get('payment_status'):
+                    queryset = queryset.filter(payment_status=parse_choice(
+                        params['payment_status'], Payment.PAYMENT_STATUS_CHOICES, 'payment_status'
+                    ))
+                if params.get('processed_by'):
+                    queryset = queryset.filter(processed_by__username__icontains=params['processed_by'])
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             serializer = PaymentSerializer(queryset, many=True)
             return Response(serializer.data)
@@ -97,8 +111,12 @@ class ProcessPaymentView(APIView):
             "amount": 150.00,
             "payment_method": "CASH" | "CREDIT_CARD" | "DEBIT_CARD" | "ONLINE",
             "selected_item_ids": [1, 2, 3]  // Optional: specific order item IDs being paid
+            "idempotency_key": "..."  // Optional, or the Idempotency-Key header
         }
 
+        Retrying a request with the same idempotency key returns the original
+        payment (200, "replayed": true) instead of charging the order again.
+
         Returns:
         {
             "detail": "Payment processed successfully.",
@@ -118,6 +136,7 @@ class ProcessPaymentView(APIView):
         amount = request.data.get('amount')
         payment_method = request.data.get('payment_method')
         selected_items = request.data.get('selected_items', [])  # Optional: [{"menu_item_id": 1, "quantity": 2}]
+        idempotency_key = request.headers.get('Idempotency-Key') or request.data.get('idempotency_key')
 
         # Validate required fields
         if not all([order_id, amount, payment_method]):
@@ -125,159 +144,54 @@ class ProcessPaymentView(APIView):
                 'error': 'orderID, amount, and payment_method are required.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get order
-        order = get_object_or_404(Order, pk=order_id)
-
-        # Convert to Decimal for accurate calculations
-        try:
-            amount = Decimal(str(amount))
-        except (ValueError, TypeError):
-            return Response({
-                'error': 'Invalid amount format.'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        grand_total = Decimal(order.grandTotal)
-
-        # Validate payment amount (allow partial payments)
-        if amount <= 0:
+        if idempotency_key and len(str(idempotency_key)) > PaymentService.IDEMPOTENCY_KEY_MAX_LENGTH:
             return Response({
-                'error': 'Invalid payment amount.',
-                'hint': 'Amount must be greater than zero.'
+                'error': f'Idempotency key must be at most {PaymentService.IDEMPOTENCY_KEY_MAX_LENGTH} characters.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check how much is still owed (prevent overpayment)
-        remaining = order.remaining_amount()
-        if amount > remaining:
+        try:
+            order_id = int(order_id)
+        except (ValueError, TypeError):
             return Response({
-                'error': 'Payment amount exceeds remaining balance.',
-                'remaining': str(remaining),
-                'attempted': str(amount),
-                'hint': f'This order only needs €{remaining}. Please adjust the payment amount.'
+                'error': 'Invalid order ID.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Verify user has an open cash register
-        cash_register = CashRegister.objects.filter(
-            user=request.user,
-            is_open=True
-        ).first()
-
-        if not cash_register:
+        # Convert to Decimal for accurate calculations
+        try:
+            amount = Decimal(str(amount))
+        except (ValueError, TypeError, InvalidOperation):
             return Response({
-                'error': 'No open cash register found for this user.',
-                'hint': 'Please open a cash register before processing payments.'
+                'error': 'Invalid amount format.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create payment record
-        payment = Payment.objects.create(
-            order=order,
-            amount=amount,
-            payment_method=payment_method,
-            payment_status='COMPLETED',
-            processed_by=request.user,
-            cash_register=cash_register
-        )
-
-        # Auto-copy customer from order (if exists)
-        if order.customer:
-            payment.customer = order.customer
-            payment.customer_name = order.customer.full_name
-            payment.customer_tax_id = order.customer.tax_id
-            payment.save()
-
-        # Track which items were paid (if specified)
-        if selected_items:
-            from .models import PaymentItem
-
-            # Build a map of menu_item_id -> quantity to pay
-            items_to_pay = {
-                item_data['menu_item_id']: item_data['quantity']
-                for item_data in selected_items
-            }
-
-            for item in order.items.all():
-                menu_item_id = item.menu_item.itemID
-
-                # Check if this item should be paid
-                if menu_item_id in items_to_pay:
-                    quantity_to_pay = items_to_pay[menu_item_id]
-
-                    # Validate quantity
-                    if quantity_to_pay <= 0:
-                        continue  # Skip invalid quantities
-
-                    # Don't allow paying more than what's remaining
-                    remaining_qty = item.remaining_quantity()
-                    if quantity_to_pay > remaining_qty:
-                        quantity_to_pay = remaining_qty
-
-                    if quantity_to_pay > 0:
-                        # Calculate amount for the specific quantity (with IVA)
-                        item_unit_price = item.price  # Price per unit
-                        item_subtotal = item_unit_price * quantity_to_pay
-                        item_with_iva = item_subtotal * Decimal('1.15')  # Add 15% IVA
-
-                        PaymentItem.objects.create(
-                            payment=payment,
-                            order_item=item,
-                            quantity_paid=quantity_to_pay,
-                            amount_paid=item_with_iva
-                        )
-
-        # Add transaction to cash register
-        cash_register.add_transaction(amount, payment_method)
-
-        # Update order payment status based on remaining amount AFTER this payment
-        # Note: remaining_amount() already accounts for the payment we just created above
-        new_remaining = order.remaining_amount()
-        if new_remaining <= Decimal('0.01'):  # Account for rounding errors
-            order.paymentStatus = 'PAID'
-            # Release reserved inventory after successful payment
-            self._release_inventory(order)
-        else:
-            order.paymentStatus = 'PARTIALLY_PAID'
-        order.save()
-
-        # Update table status if order has a table
-        if hasattr(order, 'details') and order.details.table:
-            table = order.details.table
-            if order.paymentStatus == 'PAID':
-                table.status = 'AV'  # Available
-            else:
-                table.status = 'OC'  # Occupied
-            table.save()
+        # Lock, validate and record the payment in one transaction
+        try:
+            payment, replayed = PaymentService.process_payment(
+                request.user,
+                order_id,
+                amount,
+                payment_method,
+                selected_items=selected_items,
+                idempotency_key=str(idempotency_key) if idempotency_key else None
+            )
+        except Order.DoesNotExist:
+            raise Http404('No Order matches the given query.')
+        except IdempotencyConflict as e:
+            return Response(e.payload, status=status.HTTP_409_CONFLICT)
+        except PaymentError as e:
+            return Response(e.payload, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
 
         # Calculate change due
-        change_due = max(Decimal('0.00'), amount - order.grandTotal)
+        change_due = max(Decimal('0.00'), payment.amount - payment.order.grandTotal)
 
         return Response({
             'detail': 'Payment processed successfully.',
             'change_due': str(change_due),
-            'payment': PaymentSerializer(payment).data
-        }, status=status.HTTP_201_CREATED)
-
-    def _release_inventory(self, order):
-        """
-        Release reserved inventory after successful payment.
-        Only works if inventory module is enabled (Premium feature).
-        """
-        # Only manage inventory if the inventory module is enabled (Premium feature)
-        if not FeatureFlags.is_module_enabled(Modules.INVENTORY):
-            return
-
-        # Import here to avoid circular imports
-        from apps.inventory.services import InventoryService
-
-        for order_item in order.items.all():
-            menu_item = order_item.menu_item
-            if menu_item.is_quantifiable:
-                try:
-                    InventoryService.release_reserved_stock(
-                        menu_item,
-                        order_item.quantity
-                    )
-                except Exception as e:
-                    # Log error but don't fail the payment
-                    print(f"Warning: Failed to release inventory for {menu_item.name}: {e}")
+            'payment': PaymentSerializer(payment).data,
+            'replayed': replayed
+        }, status=status.HTTP_200_OK if replayed else status.HTTP_201_CREATED)
 
 
 class DeletePaymentView(APIView):
@@ -344,6 +258,81 @@ class SignInvoiceView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class SignInvoicesBatchView(APIView):
+    """
+    Sign many invoices at once (end-of-day closing).
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    MAX_BATCH_SIZE = 5000
+
+    def post(self, request):
+        """
+        Sign unsigned, completed payments in chain order inside one transaction.
+
+        Request body (either payment_ids or filters):
+        {
+            "payment_ids": [1, 2, 3],
+            "date": "2025-01-31",           // Payments created on this day
+            "start_date": "2025-01-01",     // Payments created in this range (both days included)
+            "end_date": "2025-01-31",
+            "cash_register": 5,             // Payments of this cash register
+            "invoice_type": "TV"            // Only this document type
+        }
+        """
+        data = request.data
+        queryset = Payment.objects.filter(is_signed=False, payment_status='COMPLETED')
+
+        try:
+            if data.get('payment_ids') is not None:
+                payment_ids = [parse_int(payment_id, 'payment_ids') for payment_id in data['payment_ids']]
+                queryset = queryset.filter(pk__in=payment_ids)
+            else:
+                date_filter = date_range_filter(
+                    'created_at',
+                    on=data.get('date'),
+                    start=data.get('start_date'),
+                    end=data.get('end_date')
+                )
+                if not date_filter and not data.get('cash_register'):
+                    return Response({
+                        'error': 'Provide payment_ids, a date range or a cash_register.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**date_filter)
+
+            if data.get('cash_register'):
+                queryset = queryset.filter(cash_register_id=parse_int(data['cash_register'], 'cash_register'))
+            if data.get('invoice_type'):
+                queryset = queryset.filter(invoice_type=parse_choice(
+                    data['invoice_type'], Payment.INVOICE_TYPE_CHOICES, 'invoice_type'
+                ))
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if queryset.count() > self.MAX_BATCH_SIZE:
+            return Response({
+                'error': f'Too many invoices to sign at once (max {self.MAX_BATCH_SIZE}).',
+                'hint': 'Narrow the date range or sign per cash register.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        signed = FiscalService.sign_invoices(queryset)
+
+        return Response({
+            'detail': f'{len(signed)} invoice(s) signed successfully.',
+            'signed': len(signed),
+            'invoices': [
+                {
+                    'paymentID': payment.paymentID,
+                    'invoice_type': payment.invoice_type,
+                    'invoice_no': payment.invoice_no,
+                    'invoice_hash': payment.invoice_hash,
+                }
+                for payment in signed
+            ]
+        }, status=status.HTTP_200_OK)
+
+
 class ExportSAFTView(APIView):
     """
     Export SAF-T CV (Standard Audit File for Tax - Cabo Verde).
@@ -358,9 +347,10 @@ class ExportSAFTView(APIView):
         Query parameters:
         - start_date: Start date (YYYY-MM-DD)
         - end_date: End date (YYYY-MM-DD)
+        - compress: "gzip" to download a gzipped file (.xml.gz)
 
         Returns:
-            XML file download
+            XML file download (streamed)
         """
         # Get date parameters
         start_date_str = request.query_params.get('start_date')
@@ -386,22 +376,134 @@ class ExportSAFTView(APIView):
                 'error': 'start_date must be before or equal to end_date'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        compress = request.query_params.get('compress', '').lower()
+        if compress not in ('', 'gzip'):
+            return Response({
+                'error': 'Invalid compress value. Use "gzip"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stream the SAF-T XML as it is generated (memory use does not grow with the date range)
+        service = SAFTExportService(start_date, end_date)
+        filename = f'SAFT-CV_{start_date}_{end_date}.xml'
+
+        if compress:
+            response = StreamingHttpResponse(
+                service.iter_saft_bytes(compress=True),
+                content_type='application/gzip'
+            )
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(
+                service.iter_saft_bytes(),
+                content_type='application/xml'
+            )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+        return response
+
+
+class SAFTExportJobCreateView(APIView):
+    """
+    Start a background SAF-T CV export.
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def post(self, request):
+        """
+        Create an export job; the file is generated in the background.
+
+        Request body:
+        {
+            "start_date": "2025-01-01",
+            "end_date": "2025-12-31",
+            "compress": "gzip"      // Optional: gzipped file
+        }
+
+        Returns:
+            202 with the new job (poll it for progress), or 200 with a finished
+            export of the same closed period and unchanged data (cached: true)
+        """
+        start_date_str = request.data.get('start_date')
+        end_date_str = request.data.get('end_date')
+
+        if not start_date_str or not end_date_str:
+            return Response({
+                'error': 'Both start_date and end_date are required (format: YYYY-MM-DD)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            # Generate SAF-T XML
-            service = SAFTExportService(start_date, end_date)
-            xml_content = service.generate_saft_xml()
+            start_date = parse_date(start_date_str, 'start_date')
+            end_date = parse_date(end_date_str, 'end_date')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Prepare HTTP response with XML file
-            filename = f'SAFT-CV_{start_date}_{end_date}.xml'
-            response = HttpResponse(xml_content, content_type='application/xml')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        if start_date > end_date:
+            return Response({
+                'error': 'start_date must be before or equal to end_date'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            return response
+        compress = request.data.get('compress')
+        if compress not in (None, '', False, True, 'gzip'):
+            return Response({
+                'error': 'Invalid compress value. Use "gzip"'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
+        job, cached = SAFTExportJobService.create_job(
+            request.user,
+            start_date,
+            end_date,
+            compress=bool(compress)
+        )
+
+        data = SAFTExportJobSerializer(job).data
+        data['cached'] = cached
+        return Response(data, status=status.HTTP_200_OK if cached else status.HTTP_202_ACCEPTED)
+
+
+class SAFTExportJobDetailView(APIView):
+    """
+    Status and progress of a background SAF-T CV export.
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request, pk):
+        SAFTExportJobService.expire_stale_jobs()
+        job = get_object_or_404(SAFTExportJob, pk=pk)
+        return Response(SAFTExportJobSerializer(job).data)
+
+
+class DownloadSAFTExportView(APIView):
+    """
+    Download the file of a finished SAF-T CV export.
+    Supports HTTP Range requests, so interrupted downloads can be resumed.
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request, pk):
+        job = get_object_or_404(SAFTExportJob, pk=pk)
+
+        if job.status != 'DONE':
             return Response({
-                'error': f'Failed to generate SAF-T: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'Export is not finished.',
+                'status': job.status,
+                'hint': 'Poll the export job until its status is DONE.'
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            return ranged_file_response(
+                request,
+                job.file_path,
+                job.filename,
+                'application/gzip' if job.compress else 'application/xml'
+            )
+        except FileNotFoundError:
+            return Response({
+                'error': 'Export file no longer exists.',
+                'hint': 'Start a new export job.'
+            }, status=status.HTTP_410_GONE)
 
 
 class ValidateInvoiceHashView(APIView):
@@ -438,21 +540,72 @@ class ValidateInvoiceHashView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class VerifyHashChainView(APIView):
+    """
+    Verify the invoice hash chain of one document type over a signing period.
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    # Longest period verified within a request
+    MAX_DAYS = 31
+
+    def get(self, request):
+        """
+        Walk the hash chain of one document type for the invoices signed in a
+        period and report its stats. The first invoice of the period is linked
+        against the last one signed before it.
+
+        Query parameters:
+        - invoice_type: Document type (FT, NC, TV or FR)
+        - start_date / end_date: Signing period, both days included (YYYY-MM-DD, at most 31 days)
+
+        Full chains are verified offline with the verify_hash_chain management command.
+        """
+        params = request.query_params
+        if not all(params.get(param) for param in ('invoice_type', 'start_date', 'end_date')):
+            return Response({
+                'error': 'invoice_type, start_date and end_date are required.',
+                'hint': 'Use the verify_hash_chain management command to verify full chains.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            invoice_type = parse_choice(params['invoice_type'], Payment.INVOICE_TYPE_CHOICES, 'invoice_type')
+            start_date = parse_date(params['start_date'], 'start_date')
+            end_date = parse_date(params['end_date'], 'end_date')
+            filters = date_range_filter('signed_at', start=params['start_date'], end=params['end_date'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if (end_date - start_date).days >= self.MAX_DAYS:
+            return Response({
+                'error': f'The period can span at most {self.MAX_DAYS} days.',
+                'hint': 'Use the verify_hash_chain management command to verify full chains.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = HashChainService.verify_chain(invoice_types=[invoice_type], filters=filters)
+        return Response(result, status=status.HTTP_200_OK)
+
+
 # ===== E-FATURA CV VIEWS (Real-time Electronic Invoicing) =====
 
 class GenerateEFaturaView(APIView):
     """
-    Generate e-Fatura XML for individual invoice.
+    Queue e-Fatura XML generation and submission for an individual invoice.
     Requires: payments module + authentication + manager permission
     """
     permission_classes = [IsAuthenticated, IsManager]
 
     def post(self, request, pk):
         """
-        Generate and submit e-Fatura XML for a payment/invoice.
+        Queue e-Fatura submission for a payment/invoice.
+
+        Signing already queues the submission; this endpoint re-queues an
+        invoice whose submission FAILED (or that was signed before the queue
+        existed). The XML is rendered and submitted by the
+        process_efatura_queue worker.
 
-        SIMULATION MODE: Saves XML locally instead of sending to DNRE.
-        When DNRE credentials available, will submit to real API.
+        SIMULATION MODE: The worker saves XML locally instead of sending to DNRE.
         """
         payment = get_object_or_404(Payment, pk=pk)
 
@@ -462,28 +615,32 @@ class GenerateEFaturaView(APIView):
                 'error': 'Payment must be signed before generating e-Fatura. Use /sign/ endpoint first.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Generate and submit e-Fatura
-            service = EFaturaService(payment)
-            result = service.submit_to_dnre()
+        submission = EFaturaSubmissionService.requeue(payment)
 
-            return Response({
-                'detail': 'e-Fatura XML generated successfully',
-                'mode': result['mode'],
-                'invoice_no': result['invoice_no'],
-                'iud': result['iud'],
-                'file_path': result.get('file_path'),
-                'message': result['message']
-            }, status=status.HTTP_200_OK)
+        return Response({
+            'detail': 'e-Fatura queued for submission',
+            'efatura': EFaturaSubmissionSerializer(submission).data
+        }, status=status.HTTP_202_ACCEPTED)
 
-        except ValueError as e:
-            return Response({
-                'error': str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
+
+class EFaturaStatusView(APIView):
+    """
+    e-Fatura submission status (and DNRE receipt) of an invoice.
+    Requires: payments module + authentication + manager permission
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request, pk):
+        payment = get_object_or_404(Payment, pk=pk)
+
+        submission = EFaturaSubmission.objects.filter(payment=payment).select_related('payment').first()
+        if submission is None:
             return Response({
-                'error': f'Failed to generate e-Fatura: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'No e-Fatura submission for this payment.',
+                'hint': 'Sign the invoice first.' if not payment.is_signed else 'Use the /efatura/generate/ endpoint to queue it.'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(EFaturaSubmissionSerializer(submission).data)
 
 
 class DownloadEFaturaXMLView(APIView):
@@ -505,16 +662,12 @@ class DownloadEFaturaXMLView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Generate XML
+            # Serve the stored document (stored on first download if missing)
             service = EFaturaService(payment)
-            xml_content = service.generate_xml()
+            file_path = service.xml_file_path()
 
-            # Prepare HTTP response with XML file
             filename = f'efatura_{payment.invoice_type}_{payment.invoice_no.replace("/", "_")}_{payment.invoice_date}.xml'
-            response = HttpResponse(xml_content, content_type='application/xml')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            return response
+            return ranged_file_response(request, file_path, filename, 'application/xml')
 
         except Exception as e:
             return Response({
@@ -532,7 +685,7 @@ class SignAndSubmitEFaturaView(APIView):
     def post(self, request, pk):
         """
         1. Sign the invoice (if not already signed)
-        2. Generate and submit e-Fatura XML
+        2. Queue the e-Fatura XML for submission (the response does not wait on DNRE)
 
         This is the recommended endpoint for normal workflow.
 
@@ -559,25 +712,18 @@ class SignAndSubmitEFaturaView(APIView):
                 payment.customer_name = payment.order.customer.full_name
                 payment.save(update_fields=['customer', 'customer_tax_id', 'customer_name'])
 
-            # Step 1: Sign if not signed
+            # Step 1: Sign if not signed (this queues the e-Fatura submission)
             if not payment.is_signed:
                 payment = FiscalService.sign_invoice(payment)
 
-            # Step 2: Generate and submit e-Fatura
-            service = EFaturaService(payment)
-            result = service.submit_to_dnre()
+            # Step 2: Make sure the e-Fatura is queued (submitted by the process_efatura_queue worker)
+            submission = EFaturaSubmissionService.requeue(payment)
 
             return Response({
-                'detail': 'Invoice signed and e-Fatura generated successfully',
+                'detail': 'Invoice signed and e-Fatura queued for submission',
                 'payment': PaymentSerializer(payment).data,
-                'efatura': {
-                    'mode': result['mode'],
-                    'invoice_no': result['invoice_no'],
-                    'iud': result['iud'],
-                    'file_path': result.get('file_path'),
-                    'message': result['message']
-                }
-            }, status=status.HTTP_200_OK)
+                'efatura': EFaturaSubmissionSerializer(submission).data
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             return Response({
@@ -10,6 +10,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.http import Http404
 
 from apps.common.permissions import IsManager
+from apps.common.filters import parse_choice, parse_int
 from apps.audit.models import OperationLog
 from .models import Table
 from .serializers import TableSerializer
@@ -70,10 +71,15 @@ class TableDetailView(APIView):
         
         queryset = Table.objects.all()
         
-        if table_status:
-            queryset = queryset.filter(status__icontains=table_status)
-        if capacity:
-            queryset = queryset.filter(capacity=capacity)
+        try:
+            if table_status:
+                queryset = queryset.filter(
+                    status=parse_choice(table_status, Table.StatusChoices.choices, 'status')
+                )
+            if capacity:
+                queryset = queryset.filter(capacity=parse_int(capacity, 'capacity'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         if not queryset.exists():
             raise Http404